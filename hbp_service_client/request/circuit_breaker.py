@@ -0,0 +1,177 @@
+# pylint: disable=too-many-instance-attributes, too-few-public-methods
+
+'''Circuit breakers failing fast the requests to a degraded endpoint'''
+
+import collections
+import logging
+import re
+import threading
+import time
+
+from hbp_service_client.storage_service.exceptions import (
+    StorageCircuitOpenException, StorageTimeoutException)
+
+L = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+# the path segments varying between the requests to an endpoint: UUIDs,
+# numbers and long tokens, e.g. of the signed urls
+VARIABLE_SEGMENT = re.compile(
+    r'^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+|.{32,})$')
+
+
+def endpoint_template(endpoint):
+    '''Get the template of an endpoint, e.g. 'file/{}/content/upload/'.
+
+    Args:
+        endpoint (str): The endpoint or url of a request.
+
+    Returns:
+        The endpoint, without its query, whose variable segments are replaced by '{}'.
+    '''
+    path = endpoint.split('?', 1)[0]
+    return '/'.join('{}' if VARIABLE_SEGMENT.match(segment) else segment
+                    for segment in path.split('/'))
+
+
+class CircuitBreaker(object):
+    '''Fail fast the requests to the endpoints which keep failing.
+
+    The outcomes of the recent requests are recorded for each endpoint
+    template. A request fails when it raises an error, e.g. a connection
+    error, when the service answers with a 5xx status code, or when it is
+    slower than `slow_call_duration`. Once the share of failed requests
+    reaches `failure_rate`, the circuit of the endpoint opens: its requests
+    raise a StorageCircuitOpenException without being sent. After
+    `open_duration` the circuit half-opens and lets a probe request through,
+    which closes the circuit if it succeeds and opens it again otherwise.
+
+        Example:
+            >>> from hbp_service_client.request.circuit_breaker import CircuitBreaker
+            >>> breaker = CircuitBreaker(failure_rate=0.5, open_duration=30)
+            >>> api_client = ApiClient.new(my_access_token, circuit_breaker=breaker)
+            >>> breaker.states
+            {'entity/': 'closed', 'file/{}/content/upload/': 'open'}
+    '''
+
+    def __init__(self, failure_rate=0.5, slow_call_duration=None, window=20, min_calls=10,
+                 open_duration=30):
+        # pylint: disable=too-many-arguments
+        '''
+        Args:
+            failure_rate (float): The share of failed requests opening the circuit.
+            slow_call_duration (float): The duration in seconds after which a
+                request is counted as failed, even if it succeeds. The duration
+                is not considered by default.
+            window (int): The number of recent requests considered.
+            min_calls (int): The minimum number of recent requests before the
+                circuit may open.
+            open_duration (float): The time in seconds before an open circuit
+                lets a probe request through.
+        '''
+        self.__failure_rate = failure_rate
+        self.__slow_call_duration = slow_call_duration
+        self.__window = window
+        self.__min_calls = min_calls
+        self.__open_duration = open_duration
+        self.__lock = threading.Lock()
+        self.__circuits = {}
+
+    @property
+    def states(self):
+        '''The state of the circuit of each endpoint template: 'closed', 'open' or 'half-open'.'''
+        with self.__lock:
+            return {endpoint: circuit.state for endpoint, circuit in self.__circuits.items()}
+
+    def call(self, endpoint, function):
+        '''Send a request, unless the circuit of its endpoint is open.
+
+        Args:
+            endpoint (str): The endpoint template of the request.
+            function (function): The function sending the request, returning the response.
+
+        Returns:
+            The response
+
+        Raises:
+            StorageCircuitOpenException: The circuit of the endpoint is open
+            Any exception raised by the function, a StorageTimeoutException
+            not being counted as a failure
+        '''
+        self.__acquire(endpoint)
+        start = time.time()
+        try:
+            response = function()
+        except StorageTimeoutException:
+            # the deadline of the caller was exceeded before the request was sent
+            self.__release(endpoint)
+            raise
+        except Exception:
+            self.__record(endpoint, False)
+            raise
+        failed = getattr(response, 'status_code', 200) >= 500 or (
+            self.__slow_call_duration is not None and
+            time.time() - start > self.__slow_call_duration)
+        self.__record(endpoint, not failed)
+        return response
+
+    def __acquire(self, endpoint):
+        '''Check that a request may be sent to an endpoint'''
+        with self.__lock:
+            circuit = self.__circuits.get(endpoint)
+            if circuit is None:
+                circuit = self.__circuits[endpoint] = _Circuit(self.__window)
+            if circuit.state == OPEN and time.time() >= circuit.opened_at + self.__open_duration:
+                L.info('Probing the recovery of %s', endpoint)
+                circuit.state = HALF_OPEN
+                circuit.probing = False
+            if circuit.state == OPEN or (circuit.state == HALF_OPEN and circuit.probing):
+                raise StorageCircuitOpenException(
+                    'The circuit of {0} is open after repeated failures'.format(endpoint))
+            if circuit.state == HALF_OPEN:
+                circuit.probing = True
+
+    def __release(self, endpoint):
+        '''Let another probe through after a request which was not sent'''
+        with self.__lock:
+            self.__circuits[endpoint].probing = False
+
+    def __record(self, endpoint, succeeded):
+        '''Record the outcome of a request, opening or closing the circuit'''
+        with self.__lock:
+            circuit = self.__circuits[endpoint]
+            if circuit.state == HALF_OPEN:
+                circuit.probing = False
+                if succeeded:
+                    L.info('Closing the circuit of %s', endpoint)
+                    circuit.state = CLOSED
+                    circuit.outcomes.clear()
+                else:
+                    circuit.open()
+                return
+            circuit.outcomes.append(succeeded)
+            failures = circuit.outcomes.count(False)
+            if circuit.state == CLOSED and len(circuit.outcomes) >= self.__min_calls and \
+                    failures >= self.__failure_rate * len(circuit.outcomes):
+                L.warning('Opening the circuit of %s after %s failures in %s requests',
+                          endpoint, failures, len(circuit.outcomes))
+                circuit.open()
+
+
+class _Circuit(object):
+    '''The state and the recent outcomes of an endpoint'''
+
+    def __init__(self, window):
+        self.state = CLOSED
+        self.outcomes = collections.deque(maxlen=window)
+        self.opened_at = None
+        self.probing = False
+
+    def open(self):
+        '''Open the circuit'''
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.outcomes.clear()
@@ -0,0 +1,108 @@
+# pylint: disable=too-few-public-methods
+
+'''Coalescing of the concurrent identical requests'''
+
+import copy
+import logging
+import threading
+
+from hbp_service_client.request.deadline import remaining_time
+from hbp_service_client.storage_service.exceptions import StorageTimeoutException
+
+L = logging.getLogger(__name__)
+
+
+class SingleFlight(object):
+    '''Collapse the concurrent identical calls into a single one.
+
+    While a call is in flight, the identical calls wait for it and share its
+    result, or its exception, instead of being made again. Each caller gets
+    its own copy of a shared result, so that the callers may modify it. The
+    callers wait no longer than their own deadline, and make the call again
+    when the deadline of the one in flight was exceeded.
+
+        Example:
+            >>> from hbp_service_client.request.coalescing import SingleFlight
+            >>> single_flight = SingleFlight()
+            >>> api_client = ApiClient.new(my_access_token, single_flight=single_flight)
+            >>> single_flight.stats
+            {'sent': 12, 'coalesced': 30}
+    '''
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+        self.__sent = 0
+        self.__coalesced = 0
+
+    @property
+    def stats(self):
+        '''The number of calls which were made, and which were saved by waiting for another'''
+        with self.__lock:
+            return {'sent': self.__sent, 'coalesced': self.__coalesced}
+
+    def call(self, key, function):
+        '''Call a function, unless an identical call is in flight.
+
+        Args:
+            key: The hashable key of the call, equal for identical calls.
+            function (function): The function making the call.
+
+        Returns:
+            The result of the function
+
+        Raises:
+            StorageTimeoutException: The deadline was exceeded while waiting
+                for the call in flight
+            Any exception raised by the function
+        '''
+        while True:
+            with self.__lock:
+                flight = self.__calls.get(key)
+                if flight is None:
+                    flight = self.__calls[key] = _Flight()
+                    self.__sent += 1
+                    break
+                flight.waiters += 1
+                self.__coalesced += 1
+            L.debug('Coalescing the call %s', key)
+            try:
+                return flight.wait(remaining_time())
+            except StorageTimeoutException as error:
+                if error is not flight.error:
+                    raise
+            # the deadline of the call in flight is not the one of this caller
+            L.debug('The call %s in flight exceeded its deadline, calling again', key)
+            with self.__lock:
+                self.__coalesced -= 1
+
+        try:
+            flight.result = function()
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            flight.done.set()
+        # no new waiter once the call is removed, the others share the result
+        return copy.deepcopy(flight.result) if flight.waiters else flight.result
+
+
+class _Flight(object):
+    '''A call in flight'''
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        '''Wait for the call, at most timeout seconds, and get a copy of its result'''
+        if not self.done.wait(timeout):
+            raise StorageTimeoutException(
+                'The deadline was exceeded while waiting for an identical request')
+        if self.error is not None:
+            raise self.error
+        return copy.deepcopy(self.result)
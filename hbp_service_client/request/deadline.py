@@ -0,0 +1,136 @@
+'''Timeouts of the requests and deadlines of the operations sending them.
+
+A deadline bounds the time of all the requests sent within its context, in
+the current thread and in the threads of `map_concurrently`. Each request is
+given at most the remaining time as its timeouts, and is not sent at all once
+the deadline is exceeded.
+'''
+
+import threading
+import time
+
+from hbp_service_client.storage_service.exceptions import StorageTimeoutException
+
+# the default (connect, read) timeouts in seconds of the requests
+DEFAULT_TIMEOUT = (10, 60)
+
+_CONTEXT = threading.local()
+
+
+class Deadline(object):
+    '''A context bounding the time of the requests sent within it.
+
+    The deadlines can be nested, the earliest one applies.
+
+        Example:
+            >>> from hbp_service_client.request.deadline import Deadline
+            >>> with Deadline(30):
+            ...     # the three requests of the upload share the 30 seconds
+            ...     storage_client.upload_file('my_file', '/my_project/my_file', 'text/plain')
+            >>> with Deadline(timeout=(1, 5)):
+            ...     storage_client.exists('/my_project/my_file')
+    '''
+
+    def __init__(self, seconds=None, timeout=None):
+        '''
+        Args:
+            seconds (float): The time in seconds left to the requests sent
+                within the context, unbounded by default.
+            timeout: The (connect, read) timeouts in seconds, or a single
+                timeout for both, of each request sent within the context,
+                instead of the timeouts of the client.
+        '''
+        self.__seconds = seconds
+        self.__expiry = None
+        self.__timeout = timeout
+        self.__previous = []
+
+    def remaining(self):
+        '''The time in seconds left before the deadline, None if unbounded or not entered'''
+        return None if self.__expiry is None else self.__expiry - time.time()
+
+    def __enter__(self):
+        frame = current()
+        self.__previous.append(frame)
+        expiry = self.__expiry = None if self.__seconds is None else time.time() + self.__seconds
+        if frame.expiry is not None:
+            expiry = frame.expiry if expiry is None else min(expiry, frame.expiry)
+        _CONTEXT.frame = _Frame(
+            expiry, self.__timeout if self.__timeout is not None else frame.timeout)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _CONTEXT.frame = self.__previous.pop()
+
+
+class _Frame(object):
+    '''The deadline and timeouts in effect'''
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, expiry=None, timeout=None):
+        self.expiry = expiry
+        self.timeout = timeout
+
+
+def current():
+    '''Get the deadline and timeouts in effect in the current thread'''
+    return getattr(_CONTEXT, 'frame', None) or _Frame()
+
+
+def remaining_time():
+    '''Get the time in seconds left before the deadline in effect.
+
+    Returns:
+        The remaining time, which is negative once the deadline is exceeded,
+        None if there is no deadline.
+    '''
+    expiry = current().expiry
+    return None if expiry is None else expiry - time.time()
+
+
+def bind(function):
+    '''Bind a function to the deadline in effect, to be called in another thread.
+
+    Args:
+        function: The function to be bound.
+
+    Returns:
+        A function calling the given one within the current deadline.
+    '''
+    frame = current()
+
+    def bound(*args, **kwargs):
+        '''Call the function within the bound deadline'''
+        previous = getattr(_CONTEXT, 'frame', None)
+        _CONTEXT.frame = frame
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _CONTEXT.frame = previous
+    return bound
+
+
+def request_timeout(default):
+    '''Get the timeouts of a request sent now.
+
+    Args:
+        default: The (connect, read) timeouts of the client, or a single
+            timeout for both, None for no timeout.
+
+    Returns:
+        The (connect, read) timeouts, bounded by the remaining time, or None.
+
+    Raises:
+        StorageTimeoutException: The deadline is exceeded
+    '''
+    frame = current()
+    timeout = frame.timeout if frame.timeout is not None else default
+    if frame.expiry is None:
+        return timeout
+    remaining = frame.expiry - time.time()
+    if remaining <= 0:
+        raise StorageTimeoutException(
+            'The deadline was exceeded by {0:.3f}s'.format(-remaining))
+    if not isinstance(timeout, tuple):
+        timeout = (timeout, timeout)
+    return tuple(remaining if value is None else min(value, remaining) for value in timeout)
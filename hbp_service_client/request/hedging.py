@@ -0,0 +1,173 @@
+# pylint: disable=too-many-instance-attributes
+
+'''Hedging of the idempotent requests against slow responses'''
+
+import collections
+import logging
+import threading
+import time
+
+try:
+    from queue import Queue, Empty
+except ImportError:  # python 2
+    from Queue import Queue, Empty
+
+from hbp_service_client.request import tracing
+from hbp_service_client.request.deadline import bind
+
+L = logging.getLogger(__name__)
+
+
+class HedgingPolicy(object):
+    '''Send a duplicate of the requests which are slower than usual.
+
+    When a request has not answered after the given percentile of the recent
+    latencies, a duplicate is sent and the first response is used. The other
+    one is discarded, and its connection released, once it arrives. The
+    duplicates are capped to a share of the requests, so that the hedging
+    cannot overload a struggling service.
+
+        Example:
+            >>> from hbp_service_client.request.hedging import HedgingPolicy
+            >>> hedging = HedgingPolicy(percentile=95, max_extra_load=0.05)
+            >>> api_client = ApiClient.new(my_access_token, hedging=hedging)
+            >>> hedging.stats
+            {'requests': 1000, 'hedged': 48, 'wins': 41, 'hedge_rate': 0.048}
+    '''
+
+    # the number of latencies needed to derive the delay from them
+    MIN_SAMPLES = 20
+
+    def __init__(self, percentile=95, max_extra_load=0.05, min_delay=0.01,
+                 initial_delay=1.0, window=1000):
+        # pylint: disable=too-many-arguments
+        '''
+        Args:
+            percentile (float): The percentile of the recent latencies after
+                which a duplicate is sent.
+            max_extra_load (float): The maximum number of duplicates, as a
+                share of the requests.
+            min_delay (float): The minimum delay in seconds before a duplicate
+                is sent.
+            initial_delay (float): The delay in seconds until enough latencies
+                are known.
+            window (int): The number of recent latencies which are kept.
+        '''
+        self.__percentile = percentile
+        self.__max_extra_load = max_extra_load
+        self.__min_delay = min_delay
+        self.__initial_delay = initial_delay
+        self.__latencies = collections.deque(maxlen=window)
+        self.__lock = threading.Lock()
+        self.__requests = 0
+        self.__hedged = 0
+        self.__wins = 0
+
+    @property
+    def stats(self):
+        '''The number of requests, of duplicates sent and of duplicates which answered first'''
+        with self.__lock:
+            return {
+                'requests': self.__requests,
+                'hedged': self.__hedged,
+                'wins': self.__wins,
+                'hedge_rate': float(self.__hedged) / self.__requests if self.__requests else 0.0,
+            }
+
+    def delay(self):
+        '''Get the delay in seconds after which a duplicate is sent'''
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+        if len(latencies) < self.MIN_SAMPLES:
+            return self.__initial_delay
+        index = min(len(latencies) - 1, int(len(latencies) * self.__percentile / 100.0))
+        return max(self.__min_delay, latencies[index])
+
+    def call(self, function):
+        '''Call a function, calling it again if it is slower than usual.
+
+        Args:
+            function (function): The function sending an idempotent request.
+
+        Returns:
+            The first result of the function
+
+        Raises:
+            The exception of the first call, unless the duplicate succeeds
+        '''
+        with self.__lock:
+            self.__requests += 1
+        outcomes = Queue()
+        self.__start(function, outcomes, False)
+        try:
+            outcome = outcomes.get(timeout=self.delay())
+        except Empty:
+            outcome = None
+        if outcome is not None:
+            return self.__result(outcome)
+
+        pending = 1
+        if self.__may_hedge():
+            L.debug('Sending a duplicate of a slow request')
+            self.__start(function, outcomes, True)
+            pending = 2
+        first_error = None
+        while pending:
+            outcome = outcomes.get()
+            pending -= 1
+            if outcome[1] is None:
+                if outcome[0]:
+                    with self.__lock:
+                        self.__wins += 1
+                if pending:
+                    self.__discard_later(outcomes)
+                return outcome[2]
+            first_error = first_error or outcome[1]
+        raise first_error
+
+    def __may_hedge(self):
+        '''Count a duplicate, unless it would exceed the maximum extra load'''
+        with self.__lock:
+            if self.__hedged + 1 > self.__max_extra_load * self.__requests:
+                return False
+            self.__hedged += 1
+            return True
+
+    def __start(self, function, outcomes, hedge):
+        '''Call the function in a thread, putting its (hedge, error, result) in the queue'''
+
+        def run():
+            '''Call the function and record its latency'''
+            start = time.time()
+            try:
+                result = function()
+            except Exception as error:  # pylint: disable=broad-except
+                outcomes.put((hedge, error, None))
+                return
+            with self.__lock:
+                self.__latencies.append(time.time() - start)
+            outcomes.put((hedge, None, result))
+
+        thread = threading.Thread(target=bind(tracing.bind(run)))
+        thread.daemon = True
+        thread.start()
+
+    @staticmethod
+    def __result(outcome):
+        if outcome[1] is not None:
+            raise outcome[1]
+        return outcome[2]
+
+    @staticmethod
+    def __discard_later(outcomes):
+        '''Release the response of the losing request once it arrives'''
+
+        def discard():
+            '''Wait for the losing request and close its response'''
+            _, _, result = outcomes.get()
+            if hasattr(result, 'close'):
+                result.close()
+
+        thread = threading.Thread(target=discard)
+        thread.daemon = True
+        thread.start()
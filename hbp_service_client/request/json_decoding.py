@@ -0,0 +1,161 @@
+# pylint: disable=too-many-instance-attributes, too-few-public-methods
+
+'''Decoding of the json bodies of the responses.
+
+The whole bodies are decoded with the optional `orjson` package when it is
+installed, which is several times faster than the standard library. The pages
+of results are parsed incrementally with the standard library decoder, so that
+their entities are yielded while the rest of the page is still being received.
+'''
+
+import codecs
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_DECODER = json.JSONDecoder()
+
+
+def loads(content):
+    '''Decode a json document.
+
+    Args:
+        content (bytes): The utf-8 encoded document.
+
+    Returns:
+        The decoded object
+
+    Raises:
+        ValueError: The document is not valid json
+    '''
+    if orjson is not None:
+        return orjson.loads(content)  # pylint: disable=no-member
+    return json.loads(content.decode('utf-8'))
+
+
+class StreamedPage(object):
+    '''A page of results parsed while its body is received.
+
+    Iterating over the page yields the elements of its `results` array as soon
+    as each of them is complete. The other fields of the page, e.g. `next`,
+    are in `fields` once the iteration is over. A page can be iterated once.
+
+        Example:
+            >>> page = api_client.stream_folder_content(folder_uuid, page_size=10000)
+            >>> for entity in page:
+            ...     print(entity['name'])
+            >>> page.fields['next']
+    '''
+
+    def __init__(self, chunks, key='results', close=None):
+        '''
+        Args:
+            chunks (iterable): The chunks of bytes of the utf-8 encoded body.
+            key (str): The key of the array whose elements are yielded.
+            close (function): Called once the body is parsed, or the iteration
+                is abandoned, e.g. to release the connection of the response.
+        '''
+        self.fields = {}
+        self.__key = key
+        self.__chunks = iter(chunks)
+        self.__decoder = codecs.getincrementaldecoder('utf-8')()
+        self.__buffer = u''
+        self.__position = 0
+        self.__eof = False
+        self.__close = close
+
+    def __iter__(self):
+        try:
+            for element in self.__parse():
+                yield element
+        finally:
+            if self.__close is not None:
+                self.__close()
+
+    def __parse(self):
+        '''Parse the top level object, yielding the elements of the array of the key'''
+        self.__expect('{')
+        if self.__peek() == '}':
+            return
+        while True:
+            key = self.__value()
+            self.__expect(':')
+            if key == self.__key and self.__peek() == '[':
+                self.__position += 1
+                for element in self.__elements():
+                    yield element
+            else:
+                self.fields[key] = self.__value()
+            if self.__next_char() == '}':
+                return
+            self.__check(',')
+
+    def __elements(self):
+        '''Parse the elements of an array whose opening bracket was consumed'''
+        if self.__peek() == ']':
+            self.__position += 1
+            return
+        while True:
+            yield self.__value()
+            if self.__next_char() == ']':
+                return
+            self.__check(',')
+
+    def __more(self):
+        '''Append the next chunk to the buffer, returning False once the body is consumed'''
+        if self.__eof:
+            return False
+        chunk = next(self.__chunks, None)
+        if chunk is None:
+            self.__eof = True
+            text = self.__decoder.decode(b'', True)
+        else:
+            text = self.__decoder.decode(chunk)
+        # the parsed text is dropped
+        self.__buffer = self.__buffer[self.__position:] + text
+        self.__position = 0
+        return True
+
+    def __peek(self):
+        '''Skip the whitespaces and get the next character, empty at the end'''
+        while True:
+            self.__position = WHITESPACE.match(self.__buffer, self.__position).end()
+            if self.__position < len(self.__buffer) or not self.__more():
+                return self.__buffer[self.__position:self.__position + 1]
+
+    def __next_char(self):
+        char = self.__peek()
+        self.__position += 1
+        return char
+
+    def __expect(self, expected):
+        self.__next_char()
+        self.__check(expected)
+
+    def __check(self, expected):
+        '''Raise an error unless the last consumed character is the expected one'''
+        if self.__buffer[self.__position - 1:self.__position] != expected:
+            raise ValueError('Expecting "{0}" at {1!r}'.format(
+                expected, self.__buffer[self.__position - 1:self.__position + 20]))
+
+    def __value(self):
+        '''Decode the next json value, reading more chunks until it is complete'''
+        self.__peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.__buffer, self.__position)
+            except ValueError:
+                if not self.__more():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.__buffer) and self.__more():
+                continue
+            self.__position = end
+            return value
@@ -0,0 +1,311 @@
+# pylint: disable=too-many-arguments, too-few-public-methods
+
+'''Recording of the traffic of the clients, and its replay for load tests.
+
+The requests are recorded by a transport wrapping the one of the clients, in
+a trace file of one json object per line, compressed with gzip when its name
+ends with '.gz'. The headers are not recorded and the tokens of the signed
+urls are scrubbed, so that the trace holds no credential.
+
+The trace can be replayed against a stand-in of the service, at its original
+or an accelerated pace, to measure the latencies of the same workload.
+'''
+
+import gzip
+import io
+import json
+import logging
+import re
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # python 2
+    from urlparse import urlsplit
+
+from hbp_service_client.request.circuit_breaker import endpoint_template
+from hbp_service_client.request.transport import RequestsTransport, Transport
+
+L = logging.getLogger(__name__)
+
+# the path segments which may be credentials, e.g. the tokens of the signed
+# urls, but not the UUIDs of the entities
+TOKEN_SEGMENT = re.compile(
+    r'^(?![0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$).{32,}$')
+SENSITIVE_PARAM = re.compile(r'token|key|secret|signature', re.IGNORECASE)
+SCRUBBED = '{token}'
+
+
+def scrub_path(path):
+    '''Replace the tokens in the segments of a url path.
+
+    Args:
+        path (str): The path of a url.
+
+    Returns:
+        The path, whose segments which may be tokens are replaced by '{token}'.
+    '''
+    return '/'.join(SCRUBBED if TOKEN_SEGMENT.match(segment) else segment
+                    for segment in path.split('/'))
+
+
+def scrub_params(params):
+    '''Replace the values of the query parameters which may be tokens.
+
+    Args:
+        params (dict): The query parameters of a request.
+
+    Returns:
+        A copy of the parameters, whose values are replaced by '{token}' when
+        their name contains 'token', 'key', 'secret' or 'signature'.
+    '''
+    return {name: SCRUBBED if SENSITIVE_PARAM.search(name) else value
+            for name, value in (params or {}).items()}
+
+
+def _open_trace(path, mode):
+    '''Open a trace file as text, compressed if its name ends with .gz'''
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, mode + 'b'), encoding='utf-8')
+    return io.open(path, mode, encoding='utf-8')
+
+
+class RecordingTransport(Transport):
+    '''A transport recording the requests sent by another one.
+
+    Each request is recorded with its start time, method, path, endpoint
+    template, query parameters, status code, latency and sizes. The bytes of
+    the streamed request bodies, file objects or iterables, are counted while
+    they are sent.
+
+        Example:
+            >>> from hbp_service_client.request.recording import RecordingTransport
+            >>> recorder = RecordingTransport('traffic.jsonl.gz')
+            >>> storage_client = Client.new(my_access_token, transport=recorder)
+            >>> storage_client.upload_file('my_file', '/my_project/my_file', 'text/plain')
+            >>> recorder.close()
+    '''
+
+    def __init__(self, path, transport=None):
+        '''
+        Args:
+            path (str): The path of the trace file, compressed with gzip if it
+                ends with '.gz'.
+            transport: The request.transport.Transport sending the requests,
+                a RequestsTransport by default.
+        '''
+        self.__transport = transport if transport is not None else RequestsTransport()
+        self.__trace = _open_trace(path, 'w')
+        self.__lock = threading.Lock()
+        self.__start = time.time()
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        path = urlsplit(url).path
+        size = _body_size(body, json_body)
+        counted = None
+        if size is None and not isinstance(body, dict):
+            # the streamed bodies are counted while they are sent
+            counted = _CountedFile(body) if hasattr(body, 'read') else _CountedChunks(body)
+            body = counted
+        start = time.time()
+        status = None
+        response = None
+        try:
+            response = self.__transport.send(
+                method, url, headers=headers, params=params, body=body, json_body=json_body,
+                stream=stream, timeout=timeout)
+            status = response.status_code
+            return response
+        finally:
+            self.__record({
+                't': round(start - self.__start, 6),
+                'method': method,
+                'path': scrub_path(path),
+                'endpoint': endpoint_template(path),
+                'params': scrub_params(params),
+                'status': status,
+                'latency': round(time.time() - start, 6),
+                'request_size': size if counted is None else counted.size,
+                'response_size': _response_size(response, stream),
+            })
+
+    def close(self):
+        '''Close the trace file and the wrapped transport.'''
+        with self.__lock:
+            self.__trace.close()
+        self.__transport.close()
+
+    def __record(self, record):
+        line = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+        with self.__lock:
+            self.__trace.write(line + u'\n')
+
+
+class _CountedFile(object):
+    '''A file object sent as a request body, counting the bytes read from it'''
+
+    def __init__(self, source):
+        self.size = 0
+        self.__source = source
+
+    def read(self, *args):
+        '''Read from the file, counting the bytes'''
+        chunk = self.__source.read(*args)
+        self.size += len(chunk)
+        return chunk
+
+    def __iter__(self):
+        for line in self.__source:
+            self.size += len(line)
+            yield line
+
+    def __getattr__(self, name):
+        # e.g. fileno and tell, from which requests gets the Content-Length
+        return getattr(self.__source, name)
+
+
+class _CountedChunks(object):
+    '''The chunks of a request body, counting their bytes while they are sent'''
+
+    def __init__(self, chunks):
+        self.size = 0
+        self.__chunks = chunks
+
+    def __iter__(self):
+        for chunk in self.__chunks:
+            self.size += len(chunk)
+            yield chunk
+
+
+def _body_size(body, json_body):
+    '''Get the size of a request body, None if it is streamed'''
+    if json_body is not None:
+        return len(json.dumps(json_body).encode('utf-8'))
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if hasattr(body, 'encode'):
+        return len(body.encode('utf-8'))
+    return None
+
+
+def _response_size(response, stream):
+    '''Get the size of a response body, None if it is streamed without a length'''
+    if response is None:
+        return None
+    if not stream:
+        return len(response.content)
+    size = response.headers.get('Content-Length')
+    return int(size) if size is not None and size.isdigit() else None
+
+
+def load_trace(path):
+    '''Load the records of a trace file.
+
+    Args:
+        path (str): The path of the trace file.
+
+    Returns:
+        The list of records, ordered by start time.
+    '''
+    with _open_trace(path, 'r') as trace:
+        records = [json.loads(line) for line in trace if line.strip()]
+    return sorted(records, key=lambda record: record['t'])
+
+
+def replay(path, base_url, transport=None, speed=1.0, workers=8):
+    '''Send the requests of a trace again, and measure their latencies.
+
+    The request bodies are replaced by as many zero bytes. The latency of a request
+    includes the download of its response body.
+
+        Example:
+            >>> from hbp_service_client.request.recording import replay
+            >>> report = replay('traffic.jsonl.gz', 'http://localhost:8000', speed=10)
+            >>> report['file/{}/content/upload/']['p99']
+
+    Args:
+        path (str): The path of the trace file.
+        base_url (str): The url of the stand-in service, e.g. 'http://localhost:8000'.
+        transport: The request.transport.Transport sending the requests, a
+            RequestsTransport by default, or e.g. a WsgiTransport calling the
+            stand-in in process.
+        speed (float): The acceleration of the pace of the requests, or None to
+            send them as fast as possible.
+        workers (int): The maximum number of concurrent requests.
+
+    Returns:
+        A dictionary of the latency statistics of each endpoint template, and
+        of all of them under '*', e.g.::
+
+            {'*': {'count': 120, 'errors': 0, 'mean': 0.012, 'p50': 0.009,
+                   'p90': 0.021, 'p99': 0.048, 'max': 0.051}, ...}
+    '''
+    transport = transport if transport is not None else RequestsTransport(pool_maxsize=workers)
+    records = load_trace(path)
+    pool = ThreadPool(workers)
+    results = []
+    start = time.time()
+    try:
+        for record in records:
+            if speed:
+                delay = start + record['t'] / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            results.append(pool.apply_async(_replay_one, (transport, base_url, record)))
+        outcomes = [result.get() for result in results]
+    finally:
+        pool.close()
+        pool.join()
+    return _report(outcomes)
+
+
+def _replay_one(transport, base_url, record):
+    '''Send a recorded request, returning its endpoint, latency and success'''
+    body = None
+    if record['method'] in ('POST', 'PUT', 'PATCH'):
+        body = b'\0' * (record.get('request_size') or 0)
+    start = time.time()
+    try:
+        response = transport.send(
+            record['method'], base_url.rstrip('/') + record['path'],
+            params=record['params'], body=body)
+        succeeded = response.status_code < 500
+    except Exception as error:  # pylint: disable=broad-except
+        L.debug('Replayed request failed: %s', error)
+        succeeded = False
+    return record['endpoint'], time.time() - start, succeeded
+
+
+def _report(outcomes):
+    '''Compute the latency statistics of each endpoint'''
+    groups = {'*': []}
+    for endpoint, latency, succeeded in outcomes:
+        groups.setdefault(endpoint, []).append((latency, succeeded))
+        groups['*'].append((latency, succeeded))
+    report = {}
+    for endpoint, group in groups.items():
+        latencies = sorted(latency for latency, _ in group)
+        if not latencies:
+            report[endpoint] = {'count': 0, 'errors': 0}
+            continue
+        report[endpoint] = {
+            'count': len(latencies),
+            'errors': len([succeeded for _, succeeded in group if not succeeded]),
+            'mean': sum(latencies) / len(latencies),
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1],
+        }
+    return report
+
+
+def _percentile(latencies, percentile):
+    '''Get the nearest-rank percentile of sorted latencies'''
+    rank = int(-(-percentile * len(latencies) // 100))
+    return latencies[max(0, rank - 1)]
@@ -1,8 +1,20 @@
-# pylint: disable=too-many-instance-attributes, too-many-arguments
+# pylint: disable=too-many-instance-attributes, too-many-arguments, too-many-locals
 
 '''A request builder to generate http requests in a fluent manner '''
 
-import requests
+import hashlib
+import json
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # python 2
+    from urlparse import urlsplit
+
+from hbp_service_client.request import tracing
+from hbp_service_client.request.circuit_breaker import endpoint_template
+from hbp_service_client.request.deadline import DEFAULT_TIMEOUT, request_timeout
+from hbp_service_client.request.json_decoding import loads
+from hbp_service_client.request.transport import RequestsTransport
 from hbp_service_client.storage_service.service_locator import ServiceLocator
 
 
@@ -12,7 +24,8 @@ class RequestBuilder(object):
     def __init__(
             self, service_locator=None, url=None, service_url=None, endpoint=None,
             headers=None, return_body=False, params=None, body=None, json_body=None,
-            stream=False, throws=None):
+            stream=False, throws=None, transport=None, single_flight=None,
+            timeout=DEFAULT_TIMEOUT, hedging=None, circuit_breaker=None):
         '''
         Args:
            service_locator: collaborator which gets the collab services urls
@@ -28,6 +41,15 @@ class RequestBuilder(object):
            body: the body of the request
            json_body: the body of the request as a json object
            stream: stream the response if True
+           transport: the request.transport.Transport sending the request,
+                      a new RequestsTransport by default
+           single_flight: the request.coalescing.SingleFlight coalescing the
+                          identical GET requests returning their body
+           timeout: the (connect, read) timeouts in seconds, None for no timeout
+           hedging: the request.hedging.HedgingPolicy duplicating the slow GET
+                    requests which are not streamed
+           circuit_breaker: the request.circuit_breaker.CircuitBreaker failing fast
+                            the requests to the endpoints which keep failing
         '''
         self._service_locator = service_locator
         self._url = url
@@ -40,19 +62,27 @@ class RequestBuilder(object):
         self._json_body = json_body
         self._stream = stream
         self._throws = throws if throws is not None else []
+        self._transport = transport if transport is not None else RequestsTransport()
+        self._single_flight = single_flight
+        self._timeout = timeout
+        self._hedging = hedging
+        self._circuit_breaker = circuit_breaker
 
     @classmethod
-    def request(cls, environment='prod'):
+    def request(cls, environment='prod', transport=None):
         '''Create new request builder
 
             Arguments:
                 environment: The service environment to be used for the request
+                transport: The request.transport.Transport sending the requests,
+                    shared by the builders derived from this one. By default a
+                    RequestsTransport pooling the connections.
 
             Returns:
                 A request builder instance
 
         '''
-        return cls(service_locator=ServiceLocator.new(environment))
+        return cls(service_locator=ServiceLocator.new(environment), transport=transport)
 
     def __copy_and_set(self, attribute, value):
         params = {
@@ -66,7 +96,12 @@ class RequestBuilder(object):
             'body': self._body,
             'json_body': self._json_body,
             'stream': self._stream,
-            'throws': self._throws
+            'throws': self._throws,
+            'transport': self._transport,
+            'single_flight': self._single_flight,
+            'timeout': self._timeout,
+            'hedging': self._hedging,
+            'circuit_breaker': self._circuit_breaker
         }
         params[attribute] = value
         return RequestBuilder(**params)
@@ -188,6 +223,57 @@ class RequestBuilder(object):
         '''
         return self.__copy_and_set('stream', True)
 
+    def with_timeout(self, timeout):
+        '''Sets the timeouts of the request, which are bounded by the deadline in effect
+
+        Args:
+            timeout: The (connect, read) timeouts in seconds, or a single timeout
+                for both, None for no timeout
+
+        Returns:
+            The request builder instance in order to chain calls
+        '''
+        return self.__copy_and_set('timeout', timeout)
+
+    def coalesce_with(self, single_flight):
+        '''Coalesces the concurrent identical GET requests returning their body,
+           which are sent once and whose body is shared
+
+        Args:
+            single_flight: The request.coalescing.SingleFlight coalescing the
+                requests, which may be shared by several request builders
+
+        Returns:
+            The request builder instance in order to chain calls
+        '''
+        return self.__copy_and_set('single_flight', single_flight)
+
+    def hedge_with(self, hedging):
+        '''Duplicates the GET requests which are slower than usual, unless they
+           are streamed, and returns the first response
+
+        Args:
+            hedging: The request.hedging.HedgingPolicy deciding when to send a
+                duplicate, which may be shared by several request builders
+
+        Returns:
+            The request builder instance in order to chain calls
+        '''
+        return self.__copy_and_set('hedging', hedging)
+
+    def with_circuit_breaker(self, circuit_breaker):
+        '''Fails fast the request while its endpoint keeps failing
+
+        Args:
+            circuit_breaker: The request.circuit_breaker.CircuitBreaker tracking
+                the failures of the endpoints, which may be shared by several
+                request builders
+
+        Returns:
+            The request builder instance in order to chain calls
+        '''
+        return self.__copy_and_set('circuit_breaker', circuit_breaker)
+
     def throw(self, exception_class, should_throw):
         '''Defines if the an exception should be thrown after the request is sent
 
@@ -210,7 +296,15 @@ class RequestBuilder(object):
         Raises:
             Any exception parametrized with the `throw` method
         '''
-        return self.__send('GET')
+        def send():
+            '''Send the request, hedged unless it is streamed'''
+            if self._hedging is not None and not self._stream:
+                return self._hedging.call(lambda: self.__send('GET'))
+            return self.__send('GET')
+
+        if self._single_flight is not None and self._return_body and not self._stream:
+            return self._single_flight.call(self.__key(), send)
+        return send()
 
     def post(self):
         '''Sends the request as parametrized with the POST verb
@@ -247,23 +341,57 @@ class RequestBuilder(object):
 
     def __send(self, method):
         url = self._url if self._url else '{}/{}'.format(self._service_url, self._endpoint)
-        response = requests.request(
-            method,
-            url,
-            headers=self._headers,
-            params=self._params,
-            data=self._body,
-            json=self._json_body,
-            stream=self._stream
-        )
-
-        self.__throw_if_necessary(response, self._throws)
-
-        if self._return_body:
-            return self.__extract_body(response)
+        # before the circuit breaker, an exceeded deadline is not a failure of the endpoint
+        timeout = request_timeout(self._timeout)
+
+        def send():
+            '''Send the request with the transport'''
+            return self._transport.send(
+                method,
+                url,
+                headers=self._headers,
+                params=self._params,
+                body=self._body,
+                json_body=self._json_body,
+                stream=self._stream,
+                timeout=timeout
+            )
+
+        template = endpoint_template(self._endpoint if not self._url else urlsplit(url).path)
+        with tracing.span('{0} {1}'.format(method, template), client=True, attributes={
+                'http.request.method': method,
+                'http.route': template,
+                'server.address': urlsplit(url).hostname or ''}) as span:
+            if self._circuit_breaker is not None:
+                response = self._circuit_breaker.call(template, send)
+            else:
+                response = send()
+            if span is not None:
+                self.__annotate(span, response)
+
+            self.__throw_if_necessary(response, self._throws)
+
+            if self._return_body:
+                return self.__extract_body(response)
 
         return response
 
+    def __annotate(self, span, response):
+        '''Record the status and the sizes of the request in its span'''
+        span.set_attribute('http.response.status_code', response.status_code)
+        if isinstance(self._body, bytes):
+            span.set_attribute('http.request.body.size', len(self._body))
+        size = response.headers.get('Content-Length')
+        if size is not None and size.isdigit():
+            span.set_attribute('http.response.body.size', int(size))
+
+    def __key(self):
+        '''The key identifying the identical requests, with the same url, params and headers'''
+        # hashed, so that the token in the headers is not kept in the key
+        return hashlib.sha256(json.dumps(
+            [self._url, self._service_url, self._endpoint, self._params, self._headers],
+            sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
     @staticmethod
     def __throw_if_necessary(response, throws):
         for (exception_class, should_throw) in throws:
@@ -274,5 +402,5 @@ class RequestBuilder(object):
     @staticmethod
     def __extract_body(response):
         if response.headers.get('Content-Type', None) == 'application/json':
-            return response.json()
+            return loads(response.content)
         return response.text
@@ -0,0 +1,126 @@
+'''Tracing of the operations of the clients and of the requests they send.
+
+The spans are reported through OpenTelemetry when the optional
+`opentelemetry-api` package is installed, and are not recorded otherwise.
+Each high-level operation of the storage client is a parent span, and each
+request it sends is a child span with its endpoint template, status code and
+sizes.
+'''
+
+import contextlib
+import functools
+import inspect
+
+try:
+    from opentelemetry import context as otel_context, trace
+except ImportError:
+    otel_context = trace = None
+
+TRACER_NAME = 'hbp_service_client'
+
+
+def is_enabled():
+    '''Check whether the spans are reported, i.e. OpenTelemetry is installed'''
+    return trace is not None
+
+
+@contextlib.contextmanager
+def span(name, attributes=None, client=False):
+    '''Open a span, current within the context.
+
+    Args:
+        name (str): The name of the span.
+        attributes (dict): The initial attributes of the span.
+        client (bool): The span is a request sent to a service.
+
+    Returns:
+        A context manager giving the span, None if the spans are not reported.
+    '''
+    if trace is None:
+        yield None
+        return
+    kind = trace.SpanKind.CLIENT if client else trace.SpanKind.INTERNAL
+    with trace.get_tracer(TRACER_NAME).start_as_current_span(
+            name, kind=kind, attributes=attributes) as current:
+        yield current
+
+
+def traced(function):
+    '''Decorate a method of a client, so that each call is a span.
+
+    The span of a generator covers its whole iteration, and is current while
+    each element is produced.
+
+    Args:
+        function: The method to be traced.
+
+    Returns:
+        The decorated method.
+    '''
+    name = 'Client.{0}'.format(function.__name__)
+
+    if inspect.isgeneratorfunction(function):
+        @functools.wraps(function)
+        def trace_generator(*args, **kwargs):
+            '''Iterate over the generator, within its span'''
+            if trace is None:
+                for element in function(*args, **kwargs):
+                    yield element
+                return
+            current = trace.get_tracer(TRACER_NAME).start_span(name)
+            try:
+                elements = function(*args, **kwargs)
+                while True:
+                    with trace.use_span(current, record_exception=True):
+                        try:
+                            element = next(elements)
+                        except StopIteration:
+                            return
+                    yield element
+            finally:
+                current.end()
+        return trace_generator
+
+    @functools.wraps(function)
+    def trace_call(*args, **kwargs):
+        '''Call the method within its span'''
+        with span(name):
+            return function(*args, **kwargs)
+    return trace_call
+
+
+def record_retry(attempt, error):
+    '''Record a retry in the current span.
+
+    Args:
+        attempt (int): The number of the failed attempt, from 0.
+        error (Exception): The error of the failed attempt.
+    '''
+    if trace is None:
+        return
+    current = trace.get_current_span()
+    current.add_event('retry', {'attempt': attempt, 'error': repr(error)})
+    current.set_attribute('hbp.retries', attempt + 1)
+
+
+def bind(function):
+    '''Bind a function to the current span, to be called in another thread.
+
+    Args:
+        function: The function to be bound.
+
+    Returns:
+        A function calling the given one within the current span.
+    '''
+    if trace is None:
+        return function
+    parent = otel_context.get_current()
+
+    def bound(*args, **kwargs):
+        '''Call the function within the bound span'''
+        token = otel_context.attach(parent)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            otel_context.detach(token)
+    return bound
@@ -0,0 +1,359 @@
+# pylint: disable=too-many-arguments, too-many-locals
+
+'''The HTTP stacks sending the requests of a RequestBuilder.
+
+A transport sends a request and returns a response object with the interface
+of `requests.Response` which is used by the clients: `status_code`, `ok`,
+`headers`, `content`, `text`, `json()`, `iter_content()`, `raw` and `close()`.
+
+The httpx transport requires the optional `httpx` package.
+'''
+
+import io
+import itertools
+import json
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from http.cookiejar import DefaultCookiePolicy
+    from urllib.parse import urlsplit, urlencode
+except ImportError:  # python 2
+    from cookielib import DefaultCookiePolicy
+    from urlparse import urlsplit
+    from urllib import urlencode
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# the size in bytes of the chunks read from the file objects sent as bodies
+BODY_CHUNK_SIZE = 1024 * 1024
+
+
+class Transport(object):
+    '''The interface of the transports.
+
+        Example:
+            >>> from hbp_service_client.storage_service.api import ApiClient
+            >>> from hbp_service_client.request.transport import HttpxTransport
+            >>> api_client = ApiClient.new(my_access_token, transport=HttpxTransport())
+    '''
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        '''Send a request.
+
+        Args:
+            method (str): The http method (GET, POST...).
+            url (str): The url to send the request to.
+            headers (dict): The headers of the request.
+            params (dict): The query parameters of the request.
+            body: The body of the request, as bytes, a file object or an
+                iterable of bytes which is sent chunked.
+            json_body: The body of the request as a json object.
+            stream (bool): Read the body of the response only once it is
+                consumed, instead of before returning.
+            timeout: The (connect, read) timeouts in seconds, None for no timeout.
+
+        Returns:
+            The response object
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''Release the connections of the transport.'''
+        pass
+
+
+class RequestsTransport(Transport):
+    '''A transport sending the requests with a requests session.
+
+    The session keeps a pool of connections for each host, so that the
+    connections are reused across requests instead of being opened, and the
+    TLS handshake done, for each of them.
+    '''
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, session=None, cookies=True):
+        '''
+        Args:
+            pool_connections (int): The number of hosts whose connections are pooled.
+            pool_maxsize (int): The maximum number of connections kept for a host,
+                which should be at least the number of concurrent requests.
+            session: The requests.Session to send the requests with, a new one
+                by default.
+            cookies (bool): Keep the cookies set by the servers and send them
+                back. They must be refused when the transport is shared by
+                several users, so that a user is never sent the cookies of another.
+        '''
+        self.__session = session if session is not None else requests.Session()
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            self.__session.mount('https://', adapter)
+            self.__session.mount('http://', adapter)
+        if not cookies:
+            # no domain is allowed to set or to be sent cookies
+            self.__session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        return self.__session.request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            data=body,
+            json=json_body,
+            stream=stream,
+            timeout=timeout
+        )
+
+    def close(self):
+        self.__session.close()
+
+
+class HttpxTransport(Transport):
+    '''A transport sending the requests with httpx.
+
+    With `http2` the concurrent requests to a host are multiplexed over a
+    single connection, which requires the `h2` package.
+    '''
+
+    def __init__(self, http2=False, max_connections=10, client=None):
+        '''
+        Args:
+            http2 (bool): Negotiate HTTP/2 with the servers supporting it.
+            max_connections (int): The maximum number of open connections.
+            client: The httpx.Client to send the requests with, a new one by default.
+
+        Raises:
+            ImportError: The httpx package is not installed
+        '''
+        if httpx is None:
+            raise ImportError('The httpx transport requires the httpx package')
+        self.__client = client if client is not None else httpx.Client(
+            http2=http2, limits=httpx.Limits(max_connections=max_connections))
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        if hasattr(body, 'read'):
+            body = _iter_file(body)
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        request = self.__client.build_request(
+            method, url, headers=headers, params=params, content=body, json=json_body,
+            timeout=timeout)
+        response = self.__client.send(request, stream=stream)
+        if not stream:
+            return TransportResponse(response.status_code, response.headers,
+                                     [response.content], response.url)
+        return TransportResponse(response.status_code, response.headers,
+                                 response.iter_bytes(), response.url, response.close)
+
+    def close(self):
+        self.__client.close()
+
+
+class WsgiTransport(Transport):
+    '''A transport calling a WSGI application in process.
+
+    No socket is opened, which makes it suited to load tests of the clients
+    against a fake service.
+
+        Example:
+            >>> api_client = ApiClient.new('token', transport=WsgiTransport(fake_service))
+    '''
+
+    def __init__(self, app):
+        '''
+        Args:
+            app: The WSGI application handling the requests.
+        '''
+        self.__app = app
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        body = _read_body(body)
+
+        parts = urlsplit(url)
+        query = '&'.join(
+            part for part in (parts.query, urlencode(params or {}, doseq=True)) if part)
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': parts.path or '/',
+            'QUERY_STRING': query,
+            'SERVER_NAME': parts.hostname,
+            'SERVER_PORT': str(parts.port or (443 if parts.scheme == 'https' else 80)),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': parts.scheme,
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = 'HTTP_' + key
+            environ[key] = value
+
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            '''Record the status and the headers of the response'''
+            # pylint: disable=unused-argument
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = response_headers
+
+        result = self.__app(environ, start_response)
+        if stream:
+            # the generator applications call start_response on their first
+            # iteration, so their first chunks are pulled before the status is read
+            chunks = iter(result)
+            pulled = []
+            while 'status' not in started:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pulled.append(chunk)
+            if 'status' not in started:
+                getattr(result, 'close', lambda: None)()
+                raise RuntimeError('The WSGI application did not call start_response')
+            return TransportResponse(started['status'], started['headers'],
+                                     itertools.chain(pulled, chunks), url,
+                                     getattr(result, 'close', None))
+        try:
+            content = b''.join(result)
+        finally:
+            getattr(result, 'close', lambda: None)()
+        if 'status' not in started:
+            raise RuntimeError('The WSGI application did not call start_response')
+        return TransportResponse(started['status'], started['headers'], [content], url)
+
+
+class BodyStream(io.RawIOBase):
+    '''A file object reading the chunks of a response body.
+
+    It is the `raw` attribute of the responses of the transports other than
+    requests, whose bodies are always decoded, so `decode_content` is ignored.
+    '''
+
+    decode_content = True
+
+    def __init__(self, chunks):
+        super(BodyStream, self).__init__()
+        self.__chunks = iter(chunks)
+        self.__pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        while not self.__pending:
+            chunk = next(self.__chunks, None)
+            if chunk is None:
+                return 0
+            self.__pending = bytes(chunk)
+        count = min(len(view), len(self.__pending))
+        view[:count] = self.__pending[:count]
+        self.__pending = self.__pending[count:]
+        return count
+
+
+class TransportResponse(object):
+    '''A response with the interface of requests.Response used by the clients'''
+
+    def __init__(self, status_code, headers, chunks, url=None, close=None):
+        '''
+        Args:
+            status_code (int): The status code of the response.
+            headers: The headers of the response, as a mapping or a list of pairs.
+            chunks (iterable): The chunks of bytes of the body.
+            url (str): The url the request was sent to.
+            close (function): Called when the response is closed.
+        '''
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.url = str(url)
+        self.raw = BodyStream(chunks)
+        self.__content = None
+        self.__close = close
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        '''True if the status code is lower than 400'''
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        '''The whole body of the response, as bytes'''
+        if self.__content is None:
+            self.__content = self.raw.read()
+        return self.__content
+
+    @property
+    def text(self):
+        '''The whole body of the response, decoded'''
+        content_type = self.headers.get('Content-Type', '')
+        charset = 'utf-8'
+        for param in content_type.split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'charset' and value:
+                charset = value.strip('"')
+        return self.content.decode(charset, 'replace')
+
+    def json(self):
+        '''Decode the json body of the response'''
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        '''Iterate over the body of the response by chunks.
+
+        Args:
+            chunk_size (int): The maximum size in bytes of the chunks.
+
+        Returns:
+            A generator of the chunks.
+        '''
+        if self.__content is not None:
+            for start in range(0, len(self.__content), chunk_size):
+                yield self.__content[start:start + chunk_size]
+            return
+        for chunk in iter(lambda: self.raw.read(chunk_size), b''):
+            yield chunk
+
+    def close(self):
+        '''Release the connection of the response.'''
+        if self.__close is not None:
+            self.__close()
+
+
+def _iter_file(source):
+    '''Read a file object by chunks'''
+    for chunk in iter(lambda: source.read(BODY_CHUNK_SIZE), b''):
+        yield chunk
+
+
+def _read_body(body):
+    '''Read a request body into bytes'''
+    if body is None:
+        return b''
+    if isinstance(body, bytes):
+        return body
+    if hasattr(body, 'read'):
+        return body.read()
+    if isinstance(body, type(u'')):
+        return body.encode('utf-8')
+    return b''.join(body)
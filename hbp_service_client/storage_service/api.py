@@ -12,10 +12,12 @@
 
 import logging
 from validators import uuid as is_valid_uuid
+from hbp_service_client.request.deadline import DEFAULT_TIMEOUT
+from hbp_service_client.request.json_decoding import StreamedPage
 from hbp_service_client.request.request_builder import RequestBuilder
 from hbp_service_client.storage_service.exceptions import (
     StorageException, StorageArgumentException, StorageForbiddenException,
-    StorageNotFoundException)
+    StorageNotFoundException, StorageRangeException)
 
 L = logging.getLogger(__name__)
 
@@ -31,6 +33,8 @@ class ApiClient(object):
     '''
 
     DEFAULT_PAGE_SIZE = None
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+    LISTING_CHUNK_SIZE = 64 * 1024
     SERVICE_NAME = 'document'
     SERVICE_VERSION = 'v1'
 
@@ -43,13 +47,26 @@ class ApiClient(object):
         self._authenticated_request = authenticated_request
 
     @classmethod
-    def new(cls, access_token, environment='prod'):
+    def new(cls, access_token, environment='prod', transport=None, single_flight=None,
+            timeout=DEFAULT_TIMEOUT, hedging=None, circuit_breaker=None):
         '''Create a new storage service REST client.
 
             Arguments:
                 environment: The service environment to be used for the client
                 access_token: The access token used to authenticate with the
                     service
+                transport: The request.transport.Transport sending the requests,
+                    by default a RequestsTransport pooling the connections
+                single_flight: A request.coalescing.SingleFlight coalescing the
+                    concurrent identical GET requests, e.g. the lookups of the
+                    same path, which are not coalesced by default
+                timeout: The (connect, read) timeouts in seconds of the requests,
+                    None for no timeout. A request.deadline.Deadline context
+                    overrides them for the requests sent within it.
+                hedging: A request.hedging.HedgingPolicy duplicating the GET
+                    requests which are slower than usual, not hedged by default
+                circuit_breaker: A request.circuit_breaker.CircuitBreaker failing
+                    fast the requests to the endpoints which keep failing
 
             Returns:
                 A storage_service.api.ApiClient instance
@@ -58,8 +75,31 @@ class ApiClient(object):
                 >>> storage_client = ApiClient.new(my_access_token)
 
         '''
-        request = RequestBuilder \
-            .request(environment) \
+        request = cls.base_request(environment, transport).with_timeout(timeout)
+        if single_flight is not None:
+            request = request.coalesce_with(single_flight)
+        if hedging is not None:
+            request = request.hedge_with(hedging)
+        if circuit_breaker is not None:
+            request = request.with_circuit_breaker(circuit_breaker)
+        return cls.with_request(request, access_token)
+
+    @classmethod
+    def base_request(cls, environment='prod', transport=None):
+        '''Create the request template of the clients, which is not authenticated.
+
+        The service url is looked up once, when the template is created.
+
+            Arguments:
+                environment: The service environment to be used for the requests
+                transport: The request.transport.Transport sending the requests,
+                    by default a RequestsTransport pooling the connections
+
+            Returns:
+                A request.request_builder.RequestBuilder instance
+        '''
+        return RequestBuilder \
+            .request(environment, transport) \
             .to_service(cls.SERVICE_NAME, cls.SERVICE_VERSION) \
             .throw(
                 StorageForbiddenException,
@@ -71,15 +111,33 @@ class ApiClient(object):
                 lambda resp: 'The entity is not found'
                 if resp.status_code == 404 else None
             ) \
+            .throw(
+                StorageRangeException,
+                lambda resp: 'The byte range is not satisfiable'
+                if resp.status_code == 416 else None
+            ) \
             .throw(
                 StorageException,
                 lambda resp: 'Server response: {0} - {1}'.format(resp.status_code, resp.text)
                 if not resp.ok else None
             )
 
-        authenticated_request = request.with_token(access_token)
+    @classmethod
+    def with_request(cls, request, access_token):
+        '''Create a storage service REST client from a request template.
 
-        return cls(request, authenticated_request)
+        This is cheap, as the template is not copied, so that many clients
+        sharing a template can be created, e.g. one per access token.
+
+            Arguments:
+                request: The request template returned by `base_request`
+                access_token: The access token used to authenticate with the
+                    service
+
+            Returns:
+                A storage_service.api.ApiClient instance
+        '''
+        return cls(request, request.with_token(access_token))
 
     @staticmethod
     def _prep_params(params):
@@ -714,6 +772,50 @@ class ApiClient(object):
             .return_body() \
             .get()
 
+    def stream_folder_content(self, folder, name=None, entity_type=None,
+                              content_type=None, page_size=DEFAULT_PAGE_SIZE,
+                              page=None, ordering=None):
+        '''List the content of a folder, parsing the page while it is received.
+
+        A streaming variant of `list_folder_content`, suited to large pages:
+        the entities are yielded as soon as they are received and decoded,
+        without holding the whole page in memory.
+
+        Args:
+            folder (str): The UUID of the requested folder.
+            name (str): Optional filter on entity name.
+            entity_type (str): Optional filter on entity type.
+                Admitted values: ['file', 'folder'].
+            content_type (str): Optional filter on entity content type (only
+                files are returned).
+            page_size (int): Number of elements per page.
+            page (int): Number of the page.
+            ordering (str): Indicate on which fields to sort the result.
+
+        Returns:
+            A request.json_decoding.StreamedPage iterating over the entities
+            of the page, whose `fields` hold u'count', u'next' and u'previous'
+            once it is iterated.
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        if not is_valid_uuid(folder):
+            raise StorageArgumentException(
+                'Invalid UUID for folder: {0}'.format(folder))
+        params = self._prep_params(locals())
+        del params['folder']  # not a query parameter
+        resp = self._authenticated_request \
+            .to_endpoint('folder/{}/children/'.format(folder)) \
+            .with_params(params) \
+            .stream_response() \
+            .get()
+        return StreamedPage(
+            resp.iter_content(chunk_size=self.LISTING_CHUNK_SIZE), close=resp.close)
+
     def delete_folder(self, folder):
         '''Delete a folder. It will recursively delete all the content.
 
@@ -829,7 +931,8 @@ class ApiClient(object):
             file_id (str): The UUID of the file whose content is written.
             etag (str): The etag to match the contents against.
             source (str): The path of the local file whose content to be uploaded.
-            content (str): A string of the content to be uploaded.
+            content: The content to be uploaded, as a string, an iterable of
+                bytes chunks, which is streamed, or a file object.
 
         Note:
             ETags should be enclosed in double quotes::
@@ -945,6 +1048,64 @@ class ApiClient(object):
 
         return (resp.headers['ETag'], resp.content)
 
+    def iter_file_content(self, file_id, etag=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        '''Download file content as a stream of chunks.
+
+        Unlike download_file_content, the content is not held in memory as a
+        whole, the chunks are read from the connection as they are consumed.
+
+        Args:
+            file_id (str): The UUID of the file whose content is requested
+            etag (str): If the content is not changed since the provided ETag,
+                the content won't be downloaded. If the content is changed, it
+                will be downloaded and returned with its new ETag.
+            chunk_size (int): The maximum size in bytes of the chunks.
+
+        Returns:
+            A tuple of ETag and a generator of the chunks of the content
+            (etag, chunks) if the content was retrieved. If an etag was
+            provided, and content didn't change returns (None, None)::
+
+                ('"71e1ed9ee52e565a56aec66bc648a32c"', <generator object ...>)
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        if not is_valid_uuid(file_id):
+            raise StorageArgumentException(
+                'Invalid UUID for file_id: {0}'.format(file_id))
+
+        headers = {'Accept': '*/*'}
+        if etag:
+            headers['If-None-Match'] = etag
+
+        resp = self._authenticated_request \
+            .to_endpoint('file/{}/content/'.format(file_id)) \
+            .with_headers(headers) \
+            .stream_response() \
+            .get()
+
+        if resp.status_code == 304:
+            resp.close()
+            return (None, None)
+
+        if 'ETag' not in resp.headers:
+            resp.close()
+            raise StorageException('No ETag received from the service with the download')
+
+        def iter_chunks():
+            '''Read the chunks, releasing the connection at the end'''
+            try:
+                for chunk in resp.iter_content(chunk_size=chunk_size):
+                    yield chunk
+            finally:
+                resp.close()
+
+        return (resp.headers['ETag'], iter_chunks())
+
     def get_signed_url(self, file_id):
         '''Get a signed unauthenticated URL.
 
@@ -995,11 +1156,14 @@ class ApiClient(object):
             .to_endpoint('file/{}/'.format(file_id)) \
             .delete()
 
-    def download_signed_url(self, signed_url):
+    def download_signed_url(self, signed_url, byte_range=None):
         '''Downloads a file with its signed url.
 
         Args:
             signed_url (str): The signed url of the file to download.
+            byte_range (tuple): Optional (start, end) offsets of the bytes to
+                download, the end being excluded. The whole content is
+                downloaded by default.
 
         Returns:
             The streamed response which is used to retrieve the file content
@@ -1012,9 +1176,20 @@ class ApiClient(object):
             StorageArgumentException: Invalid arguments
             StorageForbiddenException: Server response code 403
             StorageNotFoundException: Server response code 404
+            StorageRangeException: Server response code 416, the range starts
+                after the end of the content
             StorageException: other 400-600 error codes
         '''
+        headers = {}
+        if byte_range:
+            start, end = byte_range
+            if not 0 <= start < end:
+                raise StorageArgumentException(
+                    'Invalid byte range: {0}'.format(byte_range))
+            headers['Range'] = 'bytes={0}-{1}'.format(start, end - 1)
+
         return self._request \
             .to_endpoint(signed_url) \
+            .with_headers(headers) \
             .stream_response() \
             .get()
@@ -0,0 +1,181 @@
+'''Load and save NumPy arrays directly from and to storage files.
+
+This module requires the optional `numpy` package.
+'''
+
+import io
+import logging
+import struct
+
+import numpy
+from numpy.lib import format as npy_format
+
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_WORKERS, map_concurrently)
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+from hbp_service_client.storage_service.remote_file import RangeReader
+
+L = logging.getLogger(__name__)
+
+# the size in bytes of the range requests filling an array
+RANGE_SIZE = 8 * 1024 * 1024
+# the size in bytes of the chunks of an uploaded array
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# the .npy headers are usually shorter than this
+HEADER_PROBE_SIZE = 4096
+
+
+def load_array(client, path, dtype=None, shape=None, workers=DEFAULT_WORKERS):
+    '''Load a NumPy array from a storage file.
+
+    The array is allocated once and its buffer is filled in place by range
+    requests, sent concurrently, so that the file is neither written to disk
+    nor held twice in memory.
+
+        Example:
+            >>> from hbp_service_client.storage_service.arrays import load_array
+            >>> volume = load_array(storage_client, '/my_project/volume.npy')
+            >>> raw = load_array(storage_client, '/my_project/volume.raw', '<u2', (256, 256, 256))
+
+    Args:
+        client: The storage_service.client.Client to read the file with.
+        path (str): The path of the file.
+        dtype: The data type of a raw binary file. By default the file is read
+            as a .npy file, whose header gives the data type and shape.
+        shape (tuple): The shape of a raw binary file, one dimension by default.
+        workers (int): The maximum number of concurrent range requests.
+
+    Returns:
+        The loaded numpy.ndarray
+
+    Raises:
+        StorageArgumentException: Invalid arguments, or the file content does
+            not match the array
+        StorageForbiddenException: Server response code 403
+        StorageNotFoundException: Server response code 404
+        StorageException: other 400-600 error codes
+    '''
+    entity = client.api_client.get_entity_by_query(path=path)
+    if entity['entity_type'] != 'file':
+        raise StorageArgumentException('Only file entities can be loaded')
+    reader = RangeReader(client.api_client, entity['uuid'])
+
+    if dtype is None:
+        offset, shape, fortran_order, dtype = _read_npy_header(reader, path)
+    else:
+        offset, fortran_order, dtype = 0, False, numpy.dtype(dtype)
+        if shape is None:
+            shape = (reader.size // dtype.itemsize,)
+    if dtype.hasobject:
+        raise StorageArgumentException('Arrays of Python objects cannot be loaded')
+
+    array = numpy.empty(shape, dtype, order='F' if fortran_order else 'C')
+    if offset + array.nbytes != reader.size:
+        raise StorageArgumentException(
+            'The {0} bytes of {1} do not match an array of {2} bytes'.format(
+                reader.size - offset, path, array.nbytes))
+
+    # a flat byte view of the array buffer, in its memory order
+    buffer = array.reshape(-1, order='A').view(numpy.uint8)
+
+    def fill(start):
+        '''Fetch a range of the array into its buffer'''
+        end = min(start + RANGE_SIZE, array.nbytes)
+        buffer[start:end] = numpy.frombuffer(reader.fetch(offset + start, offset + end),
+                                             numpy.uint8)
+
+    map_concurrently(fill, range(0, array.nbytes, RANGE_SIZE), workers)
+    return array
+
+
+def save_array(client, path, array, raw=False):
+    '''Save a NumPy array into a new storage file.
+
+    The array buffer is uploaded by chunks, without serialising a copy of the
+    array first, unless it is not contiguous in memory.
+
+        Example:
+            >>> from hbp_service_client.storage_service.arrays import save_array
+            >>> save_array(storage_client, '/my_project/volume.npy', volume)
+
+    Args:
+        client: The storage_service.client.Client to write the file with.
+        path (str): The path of the file to be created.
+        array: The numpy.ndarray to be saved.
+        raw (bool): Save the raw array buffer, without the .npy header.
+
+    Returns:
+        The created file entity, with its 'etag'
+
+    Raises:
+        StorageArgumentException: Invalid arguments
+        StorageForbiddenException: Server response code 403
+        StorageNotFoundException: Server response code 404
+        StorageException: other 400-600 error codes
+    '''
+    if array.dtype.hasobject:
+        raise StorageArgumentException('Arrays of Python objects cannot be saved')
+    if not (array.flags.c_contiguous or array.flags.f_contiguous):
+        array = numpy.ascontiguousarray(array)
+
+    header = b'' if raw else _npy_header(array)
+    buffer = memoryview(array.reshape(-1, order='A').view(numpy.uint8))
+
+    def iter_chunks():
+        '''Stream the header and the array buffer'''
+        if header:
+            yield header
+        for start in range(0, len(buffer), UPLOAD_CHUNK_SIZE):
+            yield buffer[start:start + UPLOAD_CHUNK_SIZE]
+
+    new_file = client.api_client.create_file(
+        name=path.rstrip('/').split('/')[-1],
+        content_type='application/octet-stream',
+        parent=client.get_parent(path)['uuid'])
+    new_file['etag'] = client.api_client.upload_file_content(
+        new_file['uuid'], content=iter_chunks())
+    return new_file
+
+
+def _read_npy_header(reader, path):
+    '''Parse the header of a .npy file.
+
+    Returns:
+        A tuple of the data offset, shape, fortran order and dtype
+    '''
+    probe = reader.fetch(0, HEADER_PROBE_SIZE)
+    prefix = io.BytesIO(probe)
+    try:
+        version = npy_format.read_magic(prefix)
+    except ValueError:
+        raise StorageArgumentException('{0} is not a .npy file'.format(path))
+    if version == (1, 0):
+        length_format, read_header = '<H', npy_format.read_array_header_1_0
+    elif version == (2, 0):
+        length_format, read_header = '<I', npy_format.read_array_header_2_0
+    else:
+        raise StorageArgumentException(
+            'Unsupported .npy format version {0} of {1}'.format(version, path))
+
+    length_size = struct.calcsize(length_format)
+    offset = npy_format.MAGIC_LEN + length_size + struct.unpack(
+        length_format, probe[npy_format.MAGIC_LEN:npy_format.MAGIC_LEN + length_size])[0]
+    if offset > len(probe):
+        probe = reader.fetch(0, offset)
+    header = io.BytesIO(probe)
+    npy_format.read_magic(header)
+    shape, fortran_order, dtype = read_header(header)
+    return offset, shape, fortran_order, dtype
+
+
+def _npy_header(array):
+    '''Build the .npy header of an array'''
+    header = io.BytesIO()
+    metadata = npy_format.header_data_from_array_1_0(array)
+    try:
+        npy_format.write_array_header_1_0(header, metadata)
+    except ValueError:
+        # the header is too long for the version 1.0
+        header = io.BytesIO()
+        npy_format.write_array_header_2_0(header, metadata)
+    return header.getvalue()
@@ -0,0 +1,339 @@
+'''A local SQLite catalog mirroring the entity tree of a project'''
+
+import logging
+import sqlite3
+
+from hbp_service_client.storage_service.change_feed import parse_timestamp
+from hbp_service_client.storage_service.concurrency import DEFAULT_WORKERS, map_concurrently
+from hbp_service_client.storage_service.exceptions import (
+    StorageArgumentException, StorageNotFoundException)
+from hbp_service_client.storage_service.traversal import iter_children, walk
+
+L = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS entity (
+    uuid TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT,
+    entity_type TEXT,
+    etag TEXT,
+    modified_on TEXT,
+    modified_utc TEXT
+);
+CREATE INDEX IF NOT EXISTS entity_child ON entity (parent, name);
+'''
+
+COLUMNS = ('uuid', 'parent', 'name', 'entity_type', 'etag', 'modified_on')
+
+# the modification dates are also stored in UTC with a fixed precision, so
+# that they are ordered as strings
+SORTABLE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+DELETE_SUBTREE = '''
+WITH RECURSIVE subtree(uuid) AS (
+    SELECT ? UNION SELECT entity.uuid FROM entity JOIN subtree ON entity.parent = subtree.uuid
+)
+DELETE FROM entity WHERE uuid IN subtree
+'''
+
+
+class Catalog(object):
+    '''A local mirror of the entity tree of a project.
+
+    The catalog is built by crawling the project concurrently, and answers
+    the path lookups and listings without any request to the service. It is
+    refreshed incrementally: each folder is listed from its most recently
+    modified children, only until the children already known, and is listed
+    in full only when its number of children changed, e.g. after a deletion.
+
+        Example:
+            >>> from hbp_service_client.storage_service.client import Client
+            >>> from hbp_service_client.storage_service.catalog import Catalog
+            >>> catalog = Catalog(Client.new(my_access_token), '/my_project', 'catalog.db')
+            >>> catalog.refresh()
+            >>> catalog.list('/my_project/data')
+            [u'a.nwb', u'/raw']
+            >>> catalog.exists('/my_project/data/b.nwb')
+            False
+    '''
+
+    # the number of children fetched at once by the incremental listings
+    REFRESH_PAGE_SIZE = 100
+
+    def __init__(self, client, project_path, database=':memory:', workers=DEFAULT_WORKERS):
+        '''
+        Args:
+            client: The storage_service.client.Client to crawl the project with.
+            project_path (str): The path of the project to mirror, e.g. '/my_project'.
+            database (str): The path of the SQLite database file. The catalog
+                is kept in memory by default.
+            workers (int): The maximum number of concurrent requests.
+        '''
+        self.__connection = sqlite3.connect(database, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+        self.__client = client
+        self.__project_path = project_path
+        self.__workers = workers
+
+    def build(self):
+        '''Snapshot the whole entity tree of the project, replacing the catalog.
+
+        Returns:
+            The number of entities in the catalog.
+
+        Raises:
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        api_client = self.__client.api_client
+        project = api_client.get_entity_by_query(path=self.__project_path)
+        entities = [project] + [entity for (_, entity) in walk(
+            api_client, self.__project_path, project['uuid'], self.__workers)]
+        with self.__connection:
+            self.__connection.execute('DELETE FROM entity')
+            for entity in entities:
+                self.__store(entity)
+            self.__set_state('project', project['uuid'])
+        L.debug('Catalogued %s entities of %s', len(entities), self.__project_path)
+        return len(entities)
+
+    def refresh(self):
+        '''Bring the catalog up to date with the service.
+
+        Each folder is listed ordered by '-modified_on', only until its
+        children which are not more recent than the catalogued ones. The
+        folders whose number of children changed are listed again in full to
+        find the removed entities, and the new folders are crawled. The
+        catalog is built on its first refresh.
+
+        Returns:
+            The number of new or modified entities.
+
+        Raises:
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        if self.__get_state('project') is None:
+            return self.build()
+        api_client = self.__client.api_client
+        folders = self.__connection.execute(
+            'SELECT uuid, (SELECT MAX(modified_utc) FROM entity AS child '
+            'WHERE child.parent = folder.uuid) FROM entity AS folder '
+            "WHERE entity_type IN ('project', 'folder')").fetchall()
+        recent = map_concurrently(
+            lambda folder: self.__recent_children(*folder), folders, self.__workers)
+
+        with self.__connection:
+            changed, new_folders = self.__upsert(
+                [child for (children, _) in recent for child in children])
+            stale = [folder for (folder, _), (_, count) in zip(folders, recent)
+                     if count is not None and count != self.__count_children(folder)]
+
+        # the folders whose children were removed, or moved from or into them
+        listings = map_concurrently(
+            lambda folder: list(iter_children(api_client, folder)), stale, self.__workers)
+        with self.__connection:
+            for children in listings:
+                more_changed, more_folders = self.__upsert(children)
+                changed.extend(more_changed)
+                new_folders.extend(more_folders)
+            for folder, children in zip(stale, listings):
+                self.__remove_missing(folder, children)
+
+        # the descendants of the new folders, e.g. moved into the project
+        for folder in new_folders:
+            with self.__connection:
+                changed.extend(self.__upsert(
+                    [entity for (_, entity) in walk(api_client, '', folder, self.__workers)])[0])
+
+        L.debug('Refreshed %s entities, listed %s folders in full, crawled %s folders',
+                len(changed), len(stale), len(new_folders))
+        return len(changed)
+
+    def get_entity(self, path):
+        '''Get the catalogued entity of a path.
+
+        Args:
+            path (str): The path of the entity, e.g. '/my_project/data/a.nwb'.
+
+        Returns:
+            A dictionary of the entity::
+
+                {
+                    u'uuid': u'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a56',
+                    u'parent': u'3abd8742-d069-44cf-a66b-2370df74a682',
+                    u'name': u'a.nwb',
+                    u'entity_type': u'file',
+                    u'etag': u'"71e1ed9ee52e565a56aec66bc648a32c"',
+                    u'modified_on': u'2017-03-13T10:17:01.688632Z'
+                }
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageNotFoundException: The path is not in the catalog
+        '''
+        steps = self.__steps(path)
+        project = self.__get_state('project')
+        if project is None:
+            raise StorageNotFoundException('The catalog was not built yet.')
+        entity = self.__select('uuid = ?', (project,))
+        if entity is None or entity['name'] != steps[0]:
+            raise StorageNotFoundException(
+                'The path {0} is not in the project {1}.'.format(path, self.__project_path))
+        for step in steps[1:]:
+            entity = self.__select('parent = ? AND name = ?', (entity['uuid'], step))
+            if entity is None:
+                raise StorageNotFoundException('The path {0} does not exist.'.format(path))
+        return entity
+
+    def exists(self, path):
+        '''Check if a path exists in the catalog.
+
+        Args:
+            path (str): The path to be checked.
+
+        Returns:
+            True if the path exists, False otherwise
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+        '''
+        try:
+            self.get_entity(path)
+        except StorageNotFoundException:
+            return False
+        return True
+
+    def get_parent(self, path):
+        '''Get the catalogued parent entity of a path.
+
+        Args:
+            path (str): The path of the entity whose parent is needed.
+
+        Returns:
+            A dictionary of the parent entity, see `get_entity`.
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageNotFoundException: The parent is not in the catalog
+        '''
+        steps = self.__steps(path)
+        if len(steps) == 1:
+            raise StorageArgumentException('This method does not accept projects in the path.')
+        return self.get_entity('/' + '/'.join(steps[:-1]))
+
+    def list(self, path):
+        '''List the catalogued entities directly under a path, as `Client.list`.
+
+        Args:
+            path (str): The path of the project or folder to be listed.
+
+        Returns:
+            The list of the names of the entities, ordered by name, with a
+            leading slash for the folders:
+
+                [u'file_1', u'/folder_1']
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageNotFoundException: The path is not in the catalog
+        '''
+        entity = self.get_entity(path)
+        if entity['entity_type'] not in ('project', 'folder'):
+            raise StorageArgumentException('The entity type "{0}" cannot be'
+                                           ' listed'.format(entity['entity_type']))
+        return [u'/' + name if entity_type == 'folder' else name
+                for name, entity_type in self.__connection.execute(
+                    'SELECT name, entity_type FROM entity WHERE parent = ? ORDER BY name',
+                    (entity['uuid'],))]
+
+    def close(self):
+        '''Close the underlying database connection.'''
+        self.__connection.close()
+
+    def __recent_children(self, folder, since):
+        '''List the children of a folder modified after the given date, and count them all'''
+        api_client = self.__client.api_client
+        recent = []
+        page_number = 1
+        while True:
+            try:
+                page = api_client.list_folder_content(
+                    folder, page=page_number, page_size=self.REFRESH_PAGE_SIZE,
+                    ordering='-modified_on')
+            except StorageNotFoundException:
+                L.debug('Folder %s vanished while refreshing', folder)
+                return [], None
+            for child in page['results']:
+                if since is not None and \
+                        (_sortable_timestamp(child.get('modified_on')) or '') <= since:
+                    return recent, page.get('count')
+                recent.append(child)
+            if page.get('next') is None:
+                return recent, page.get('count')
+            page_number += 1
+
+    def __upsert(self, entities):
+        '''Store the entities, returning the new or modified ones and the new folders'''
+        changed, new_folders = [], []
+        for entity in entities:
+            known = self.__select('uuid = ?', (entity['uuid'],))
+            if known is None and entity['entity_type'] == 'folder':
+                new_folders.append(entity['uuid'])
+            if known != dict((column, entity.get(column)) for column in COLUMNS):
+                changed.append(entity)
+                self.__store(entity)
+        return changed, new_folders
+
+    def __remove_missing(self, folder, children):
+        '''Remove the catalogued children of a folder which are no longer listed'''
+        listed = set(child['uuid'] for child in children)
+        for (uuid,) in self.__connection.execute(
+                'SELECT uuid FROM entity WHERE parent = ?', (folder,)).fetchall():
+            if uuid not in listed:
+                self.__connection.execute(DELETE_SUBTREE, (uuid,))
+
+    def __count_children(self, folder):
+        return self.__connection.execute(
+            'SELECT COUNT(*) FROM entity WHERE parent = ?', (folder,)).fetchone()[0]
+
+    def __store(self, entity):
+        self.__connection.execute(
+            'INSERT OR REPLACE INTO entity VALUES (?, ?, ?, ?, ?, ?, ?)',
+            tuple(entity.get(column) for column in COLUMNS) +
+            (_sortable_timestamp(entity.get('modified_on')),))
+
+    def __select(self, where, args):
+        row = self.__connection.execute(
+            'SELECT {0} FROM entity WHERE {1}'.format(', '.join(COLUMNS), where),
+            args).fetchone()
+        return None if row is None else dict(zip(COLUMNS, row))
+
+    def __get_state(self, key):
+        row = self.__connection.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def __set_state(self, key, value):
+        self.__connection.execute('INSERT OR REPLACE INTO state VALUES (?, ?)', (key, value))
+
+    @staticmethod
+    def __steps(path):
+        if not path or not isinstance(path, str) or path[0] != '/' or path == '/':
+            raise StorageArgumentException(
+                'The path must be a string, start with a slash (/), and be longer'
+                ' than 1 character.')
+        return [step for step in path.split('/') if step]
+
+
+def _sortable_timestamp(timestamp):
+    '''Normalize a modification date into UTC with a fixed precision, None if missing'''
+    if not timestamp:
+        return None
+    return parse_timestamp(timestamp).strftime(SORTABLE_FORMAT)
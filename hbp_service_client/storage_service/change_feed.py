@@ -0,0 +1,104 @@
+'''The positions of the change feeds of the folders, see `Client.changes_since`'''
+
+import io
+import json
+import os
+from datetime import datetime
+
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+
+TIMESTAMP_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S')
+
+
+def parse_timestamp(timestamp):
+    '''Parse a modification date of the service.
+
+    Args:
+        timestamp: An ISO 8601 date, e.g. '2017-03-13T10:17:01.688632Z', or a
+            datetime. The dates without time zone are in UTC.
+
+    Returns:
+        A naive datetime in UTC, which can be compared regardless of the
+        precision of the dates.
+
+    Raises:
+        StorageArgumentException: The date is not an ISO 8601 date
+    '''
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is not None:
+            timestamp = (timestamp - timestamp.utcoffset()).replace(tzinfo=None)
+        return timestamp
+    text = u'{0}'.format(timestamp)
+    for suffix in ('Z', '+00:00'):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)]
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, timestamp_format)
+        except ValueError:
+            pass
+    raise StorageArgumentException(
+        'Invalid timestamp {0}, expected an ISO 8601 date in UTC.'.format(timestamp))
+
+
+class ChangeCursor(object):
+    '''The position reached in the change feed of each folder.
+
+    The position of a folder is the modification date of its most recent
+    child returned by `Client.changes_since`. Each folder has its own
+    position, so that a child modified in a folder while another one is
+    listed is not skipped. The cursor is saved to a json file, if any, once
+    all the changes were iterated, so that the changes are returned again
+    when the iteration is interrupted.
+
+        Example:
+            >>> from hbp_service_client.storage_service.change_feed import ChangeCursor
+            >>> cursor = ChangeCursor('my_project.cursor.json')
+            >>> for path, entity in storage_client.changes_since(
+            ...         '/my_project', '2017-03-01T00:00:00Z', recursive=True, cursor=cursor):
+            ...     process(path, entity)
+    '''
+
+    def __init__(self, path=None):
+        '''
+        Args:
+            path (str): The path of the json file the cursor is loaded from, if
+                it exists, and saved to. The cursor is kept in memory by default.
+        '''
+        self.__path = path
+        self.__positions = {}
+        if path is not None and os.path.exists(path):
+            with io.open(path, encoding='utf-8') as source:
+                self.__positions = json.load(source)['folders']
+
+    def position(self, folder):
+        '''Get the position in the change feed of a folder.
+
+        Args:
+            folder (str): The UUID of the project or folder.
+
+        Returns:
+            The modification date of the most recent change returned, None if
+            no change of the folder was returned yet.
+        '''
+        return self.__positions.get(folder)
+
+    def advance(self, folder, timestamp):
+        '''Move the position of a folder forward.
+
+        Args:
+            folder (str): The UUID of the project or folder.
+            timestamp (str): The modification date of a returned change.
+        '''
+        position = self.__positions.get(folder)
+        if position is None or parse_timestamp(timestamp) > parse_timestamp(position):
+            self.__positions[folder] = timestamp
+
+    def save(self):
+        '''Write the cursor to its json file, replacing it atomically.'''
+        if self.__path is None:
+            return
+        temporary = self.__path + '.tmp'
+        with io.open(temporary, 'w', encoding='utf-8') as target:
+            target.write(u'{0}'.format(json.dumps({'folders': self.__positions}, sort_keys=True)))
+        getattr(os, 'replace', os.rename)(temporary, self.__path)
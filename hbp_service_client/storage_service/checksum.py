@@ -0,0 +1,166 @@
+'''Verification of the transferred contents against the ETags of the service'''
+
+import hashlib
+import logging
+import re
+import threading
+
+try:
+    from queue import Queue
+except ImportError:  # python 2
+    from Queue import Queue
+
+from hbp_service_client.storage_service.exceptions import StorageChecksumException
+
+L = logging.getLogger(__name__)
+
+# the contents larger than this are hashed in a worker thread
+THREADED_CHECKSUM_SIZE = 8 * 1024 * 1024
+
+MD5_ETAG = re.compile(r'^"?([0-9a-fA-F]{32})"?$')
+
+
+def md5_from_etag(etag):
+    '''Extract the MD5 digest of a strong ETag.
+
+    Args:
+        etag (str): The ETag returned by the service, e.g.
+            '"71e1ed9ee52e565a56aec66bc648a32c"'.
+
+    Returns:
+        The lower case hexadecimal digest, or None if the ETag is missing or
+        is not a MD5 digest.
+    '''
+    match = MD5_ETAG.match(etag or '')
+    return match.group(1).lower() if match else None
+
+
+def file_md5(path, chunk_size=1024 * 1024):
+    '''Compute the MD5 digest of a local file.
+
+    Args:
+        path (str): The path of the local file.
+        chunk_size (int): The size in bytes of the chunks which are read.
+
+    Returns:
+        The lower case hexadecimal digest.
+
+    Raises:
+        IOError: The file cannot be opened.
+    '''
+    digest = hashlib.md5()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StreamingChecksum(object):
+    '''A MD5 digest computed while a content is streamed.
+
+    The chunks are hashed as they go through `wrap`, so that the content is
+    read only once. In threaded mode the hashing runs in a worker thread, which
+    overlaps with the network I/O as hashlib releases the GIL on large chunks.
+    The thread is started by the first chunk, so that no thread is left
+    waiting when the transfer fails before its content is streamed.
+
+        Example:
+            >>> checksum = StreamingChecksum()
+            >>> etag = api_client.upload_file_content(file_uuid, content=checksum.wrap(chunks))
+            >>> checksum.verify(etag, '/my_project/my_file')
+    '''
+
+    # the maximum number of chunks waiting to be hashed in threaded mode
+    QUEUED_CHUNKS = 16
+
+    def __init__(self, threaded=False):
+        '''
+        Args:
+            threaded (bool): Hash the chunks in a worker thread.
+        '''
+        self.__digest = hashlib.md5()
+        self.__threaded = threaded
+        self.__chunks = None
+        self.__worker = None
+
+    def update(self, chunk):
+        '''Add a chunk of the content to the digest.
+
+        Args:
+            chunk (bytes): The next chunk of the content.
+        '''
+        if self.__threaded and self.__worker is None:
+            self.__chunks = Queue(self.QUEUED_CHUNKS)
+            self.__worker = threading.Thread(target=self.__hash_queued)
+            self.__worker.daemon = True
+            self.__worker.start()
+        if self.__chunks is None:
+            self.__digest.update(chunk)
+        else:
+            self.__chunks.put(chunk)
+
+    def wrap(self, chunks):
+        '''Hash the chunks of a stream as they are consumed.
+
+        Args:
+            chunks (iterable): The chunks of the content.
+
+        Returns:
+            A generator of the same chunks.
+        '''
+        try:
+            for chunk in chunks:
+                self.update(chunk)
+                yield chunk
+        finally:
+            # the transfer is over, also when it failed
+            self.__stop_worker()
+
+    def hexdigest(self):
+        '''Get the digest of the chunks so far, waiting for the worker thread.
+
+        Returns:
+            The lower case hexadecimal MD5 digest.
+        '''
+        self.__stop_worker()
+        return self.__digest.hexdigest()
+
+    def verify(self, etag, name):
+        '''Compare the digest with an ETag of the service.
+
+        Args:
+            etag (str): The ETag returned by the service.
+            name (str): The name of the content, for the error message.
+
+        Returns:
+            True if the content was verified, False if the ETag is not a MD5
+            digest and the content cannot be verified.
+
+        Raises:
+            StorageChecksumException: The digest does not match the ETag
+        '''
+        expected = md5_from_etag(etag)
+        digest = self.hexdigest()
+        if expected is None:
+            L.warning('Cannot verify the checksum of %s with the ETag %s', name, etag)
+            return False
+        if digest != expected:
+            raise StorageChecksumException(
+                'Checksum mismatch for {0}: ETag {1}, content MD5 {2}'.format(
+                    name, etag, digest))
+        return True
+
+    def __stop_worker(self):
+        '''Wait for the worker thread to hash the queued chunks, and stop it'''
+        self.__threaded = False
+        if self.__worker is not None:
+            self.__chunks.put(None)
+            self.__worker.join()
+            self.__chunks = self.__worker = None
+
+    def __hash_queued(self):
+        while True:
+            chunk = self.__chunks.get()
+            if chunk is None:
+                return
+            self.__digest.update(chunk)
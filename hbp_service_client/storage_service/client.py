@@ -1,12 +1,29 @@
+# pylint: disable=too-many-lines
+
 '''High-level Client for interacting with the HBP Storage Service, providing
 convenience functions for common operations'''
 
+import fnmatch
 import logging
 import os
+import re
+from collections import OrderedDict
 
+import requests
+from hbp_service_client.request.deadline import DEFAULT_TIMEOUT
+from hbp_service_client.request.tracing import traced
 from hbp_service_client.storage_service.api import ApiClient
+from hbp_service_client.storage_service.change_feed import parse_timestamp
+from hbp_service_client.storage_service.checksum import (
+    THREADED_CHECKSUM_SIZE, StreamingChecksum, file_md5)
+from hbp_service_client.storage_service.compression import (
+    CHUNK_SIZE, COMPRESSION_METADATA_KEY, compress_chunks, decompress_chunks, validate_codec)
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_RETRIES, DEFAULT_WORKERS, call_with_retries, imap_concurrently, map_concurrently)
 from hbp_service_client.storage_service.exceptions import (
-    StorageArgumentException, StorageNotFoundException)
+    StorageException, StorageArgumentException, StorageNotFoundException)
+from hbp_service_client.storage_service.remote_file import RemoteFile, byte_view
+from hbp_service_client.storage_service.traversal import iter_changes, iter_children, walk
 
 L = logging.getLogger(__name__)
 
@@ -22,16 +39,25 @@ class Client(object):
     '''
 
     __BROWSABLE_TYPES = ['project', 'folder']
+    # up to this number of wanted children, a folder is queried by name
+    __NAME_FILTER_LIMIT = 5
+    __GLOB_MAGIC = re.compile('[*?[]')
 
-    def __init__(self, client):
+    def __init__(self, client, bandwidth_limiter=None):
         '''
         Args:
            client: the low level api client
+           bandwidth_limiter: a storage_service.throttling.BandwidthLimiter
+               limiting the bandwidth of the uploads and downloads, unlimited
+               by default
         '''
         self.api_client = client
+        self.bandwidth_limiter = bandwidth_limiter
 
     @classmethod
-    def new(cls, access_token, environment='prod'):
+    def new(cls, access_token, environment='prod', transport=None, single_flight=None,
+            timeout=DEFAULT_TIMEOUT, hedging=None, circuit_breaker=None, bandwidth_limiter=None):
+        # pylint: disable=too-many-arguments
         '''Create new storage service client.
 
             Arguments:
@@ -39,14 +65,30 @@ class Client(object):
                     'prod' or 'dev'.
                 access_token(str): The access token used to authenticate with the
                     service
+                transport: The request.transport.Transport sending the requests,
+                    by default a RequestsTransport pooling the connections
+                single_flight: A request.coalescing.SingleFlight coalescing the
+                    concurrent identical GET requests, not coalesced by default
+                timeout: The (connect, read) timeouts in seconds of the requests,
+                    None for no timeout. A request.deadline.Deadline context
+                    bounds all the requests of the operations called within it.
+                hedging: A request.hedging.HedgingPolicy duplicating the GET
+                    requests which are slower than usual, not hedged by default
+                circuit_breaker: A request.circuit_breaker.CircuitBreaker failing
+                    fast the requests to the endpoints which keep failing
+                bandwidth_limiter: A storage_service.throttling.BandwidthLimiter
+                    limiting the bandwidth of the uploads and downloads
 
             Returns:
                 A storage_service.Client instance
         '''
 
-        api_client = ApiClient.new(access_token, environment)
-        return cls(api_client)
+        api_client = ApiClient.new(
+            access_token, environment, transport, single_flight, timeout, hedging,
+            circuit_breaker)
+        return cls(api_client, bandwidth_limiter)
 
+    @traced
     def list(self, path):
         '''List the entities found directly under the given path.
 
@@ -70,24 +112,244 @@ class Client(object):
         if entity['entity_type'] not in self.__BROWSABLE_TYPES:
             raise StorageArgumentException('The entity type "{0}" cannot be'
                                            'listed'.format(entity['entity_type']))
-        entity_uuid = entity['uuid']
         file_names = []
-
-        # get files
-        more_pages = True
-        page_number = 1
-        while more_pages:
-            response = self.api_client.list_folder_content(
-                entity_uuid, page=page_number, ordering='name')
-            more_pages = response['next'] is not None
-            page_number += 1
-            for child in response['results']:
-                pattern = '/{name}' if child['entity_type'] == 'folder' else '{name}'
-                file_names.append(pattern.format(name=child['name']))
+        for child in iter_children(self.api_client, entity['uuid']):
+            pattern = '/{name}' if child['entity_type'] == 'folder' else '{name}'
+            file_names.append(pattern.format(name=child['name']))
 
         return file_names
 
-    def download_file(self, path, target_path):
+    @traced
+    def find(self, path, name=None, entity_type=None, content_type=None):
+        '''Recursively find the entities under the given path matching the filters.
+
+        The filters supported by the service are sent along with the folder
+        listings, so only the matching entities and the folders to descend
+        into are transferred. A name containing wildcards (*, ?, [seq]) is
+        matched on the client side. Results are yielded as they are found.
+
+        Args:
+            path (str): The path of the project or folder to search in. Must
+                start with a '/'.
+            name (str): Optional filter on the entity name, either an exact
+                name or a shell-style pattern.
+            entity_type (str): Optional filter on the entity type.
+                Admitted values: ['file', 'folder'].
+            content_type (str): Optional filter on the content type (only
+                files are returned).
+
+        Returns:
+            A generator of the paths of the matching entities::
+
+                u'/12345/folder_1/file_1'
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+
+        self.__validate_storage_path(path)
+        entity = self.api_client.get_entity_by_query(path=path)
+        if entity['entity_type'] not in self.__BROWSABLE_TYPES:
+            raise StorageArgumentException('The entity type "{0}" cannot be'
+                                           ' searched'.format(entity['entity_type']))
+
+        pattern = name if name and self.__GLOB_MAGIC.search(name) else None
+        filters = {
+            'name': None if pattern else name,
+            'entity_type': entity_type,
+            'content_type': content_type
+        }
+        # the subfolders come with the matches unless the filters exclude them
+        single_listing = not (filters['name'] or content_type) and \
+            entity_type in (None, 'folder')
+
+        stack = [(path.rstrip('/'), entity['uuid'])]
+        while stack:
+            folder_path, folder_uuid = stack.pop()
+            subfolders = []
+            if single_listing:
+                for child in iter_children(self.api_client, folder_uuid, **filters):
+                    child_path = '{0}/{1}'.format(folder_path, child['name'])
+                    if child['entity_type'] == 'folder':
+                        subfolders.append((child_path, child['uuid']))
+                    if not pattern or fnmatch.fnmatchcase(child['name'], pattern):
+                        yield child_path
+            else:
+                for child in iter_children(self.api_client, folder_uuid, **filters):
+                    if not pattern or fnmatch.fnmatchcase(child['name'], pattern):
+                        yield '{0}/{1}'.format(folder_path, child['name'])
+                for child in iter_children(self.api_client, folder_uuid, entity_type='folder'):
+                    subfolders.append(
+                        ('{0}/{1}'.format(folder_path, child['name']), child['uuid']))
+            stack.extend(reversed(subfolders))
+
+    @traced
+    def changes_since(self, path, timestamp=None, recursive=False, cursor=None,
+                      workers=DEFAULT_WORKERS):
+        # pylint: disable=too-many-arguments
+        '''Iterate over the entities under a path modified after a date.
+
+        Each folder is listed ordered by '-modified_on', and only its pages
+        more recent than the date are requested. In recursive mode, all the
+        subfolders are found first, listing only the folders, as a folder is
+        not modified when its children are.
+
+        Args:
+            path (str): The path of the project or folder. Must start with a '/'.
+            timestamp: The date as a datetime or an ISO 8601 string, e.g.
+                '2017-03-13T10:17:01Z', for the folders without a position in
+                the cursor. All the entities are iterated by default.
+            recursive (bool): Iterate over the changes in all the subfolders.
+            cursor: A storage_service.change_feed.ChangeCursor, giving the
+                position of each folder in place of the date, and advanced and
+                saved once all the changes were iterated.
+            workers (int): The maximum number of concurrent requests.
+
+        Returns:
+            A generator of (path, entity) tuples of the modified entities, by
+            folder as soon as it is listed, the most recently modified first::
+
+                (u'/my_project/data/file_1', {u'uuid': u'0e17eaac-...',
+                    u'modified_on': u'2017-03-13T10:17:01.688632Z', ...})
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+
+        self.__validate_storage_path(path)
+        if timestamp is not None:
+            parse_timestamp(timestamp)
+        entity = self.api_client.get_entity_by_query(path=path)
+        if entity['entity_type'] not in self.__BROWSABLE_TYPES:
+            raise StorageArgumentException('The entity type "{0}" has no'
+                                           ' changes'.format(entity['entity_type']))
+
+        folders = [(path.rstrip('/'), entity['uuid'])]
+        if recursive:
+            folders.extend((folder_path, folder['uuid']) for (folder_path, folder) in walk(
+                self.api_client, path, entity['uuid'], workers, folders_only=True))
+
+        def folder_changes(folder):
+            '''List the children of a folder modified since its position'''
+            since = cursor.position(folder[1]) if cursor else None
+            return list(iter_changes(
+                self.api_client, folder[1], since if since is not None else timestamp))
+
+        latest = {}
+        for (folder_path, folder_uuid), children in imap_concurrently(
+                folder_changes, folders, workers):
+            for child in children:
+                yield ('{0}/{1}'.format(folder_path, child['name']), child)
+            if children:
+                latest[folder_uuid] = children[0]['modified_on']
+        if cursor:
+            for folder_uuid, modified_on in latest.items():
+                cursor.advance(folder_uuid, modified_on)
+            cursor.save()
+
+    @traced
+    def glob(self, pattern):
+        '''Find the entities whose path matches a shell-style pattern.
+
+        Each path step may contain the wildcards *, ? and [seq], and a step
+        made of ** matches any number of nested folders. The leading steps
+        without wildcards are resolved with a single query, plain names are
+        sent as a filter to the service, and folders which cannot lead to a
+        match are not traversed. Results are yielded as they are found.
+
+        Args:
+            pattern (str): The path pattern, e.g. '/my_project/**/*.nwb'. The
+                project (first step) cannot contain wildcards.
+
+        Returns:
+            A generator of the paths of the matching entities::
+
+                u'/my_project/folder_1/recording.nwb'
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+
+        self.__validate_storage_path(pattern)
+        steps = [step for step in pattern.split('/') if step]
+        if self.__GLOB_MAGIC.search(steps[0]):
+            raise StorageArgumentException(
+                'The project in the pattern cannot contain wildcards.')
+        # consecutive '**' steps are equivalent to a single one
+        steps = [step for i, step in enumerate(steps)
+                 if not (step == '**' and i > 0 and steps[i - 1] == '**')]
+
+        prefix_length = 1
+        while prefix_length < len(steps) and not self.__GLOB_MAGIC.search(steps[prefix_length]):
+            prefix_length += 1
+        prefix = '/{0}'.format('/'.join(steps[:prefix_length]))
+        try:
+            entity = self.api_client.get_entity_by_query(path=prefix)
+        except StorageNotFoundException:
+            return
+        if prefix_length == len(steps):
+            yield prefix
+            return
+        if entity['entity_type'] not in self.__BROWSABLE_TYPES:
+            return
+
+        steps = steps[prefix_length:]
+        stack = [(prefix, entity['uuid'], self.__glob_closure(steps, [0]))]
+        while stack:
+            folder_path, folder_uuid, states = stack.pop()
+            subfolders = []
+            filters = self.__glob_filters(steps, states)
+            for child in iter_children(self.api_client, folder_uuid, **filters):
+                child_states = self.__glob_closure(steps, [
+                    i if steps[i] == '**' else i + 1
+                    for i in states
+                    if i < len(steps) and (
+                        steps[i] == '**' or fnmatch.fnmatchcase(child['name'], steps[i]))])
+                child_path = '{0}/{1}'.format(folder_path, child['name'])
+                if len(steps) in child_states:
+                    yield child_path
+                if child['entity_type'] == 'folder' and \
+                        any(i < len(steps) for i in child_states):
+                    subfolders.append((child_path, child['uuid'], child_states))
+            stack.extend(reversed(subfolders))
+
+    @staticmethod
+    def __glob_closure(steps, states):
+        '''Add the states reachable by matching '**' with zero folders'''
+
+        closure = set()
+        for i in states:
+            closure.add(i)
+            while i < len(steps) and steps[i] == '**':
+                i += 1
+                closure.add(i)
+        return closure
+
+    @classmethod
+    def __glob_filters(cls, steps, states):
+        '''Compute the listing filters the service can apply for the given states'''
+
+        pending = [steps[i] for i in states if i < len(steps)]
+        if len(set(pending)) == 1 and not cls.__GLOB_MAGIC.search(pending[0]):
+            # a single plain name, whether it is a folder or a match
+            return {'name': pending[0]}
+        can_match = any(
+            len(steps) in cls.__glob_closure(steps, [i + 1])
+            for i in states if i < len(steps) and steps[i] != '**')
+        return {} if can_match or '**' in pending and steps[-1] == '**' \
+            else {'entity_type': 'folder'}
+
+    @traced
+    def download_file(self, path, target_path, decompress=False, verify_checksum=False):
         '''Download a file from storage service to local disk.
 
         Existing files on the target path will be overwritten.
@@ -95,12 +357,20 @@ class Client(object):
 
         Args:
             path (str): The path of the entity to be downloaded. Must start with a '/'.
+            target_path (str): The path of the local file to be written.
+            decompress (bool): Decompress the content while it is downloaded if
+                it was uploaded with a compression, as recorded in the metadata
+                of the file.
+            verify_checksum (bool): Compute the MD5 digest of the content while
+                it is downloaded and compare it with the ETag of the response,
+                downloading it again once on mismatch.
 
         Returns:
             None
 
         Raises:
             StorageArgumentException: Invalid arguments
+            StorageChecksumException: The content does not match its ETag
             StorageForbiddenException: Server response code 403
             StorageNotFoundException: Server response code 404
             StorageException: other 400-600 error codes
@@ -111,13 +381,189 @@ class Client(object):
         if entity['entity_type'] != 'file':
             raise StorageArgumentException('Only file entities can be downloaded')
 
+        codec = None
+        if decompress:
+            codec = self.api_client.get_metadata('file', entity['uuid']).get(
+                COMPRESSION_METADATA_KEY)
+            if codec:
+                validate_codec(codec)
+
+        def download():
+            '''Write the content into the target file, hashing it if needed'''
+            signed_url = self.api_client.get_signed_url(entity['uuid'])
+            response = self.api_client.download_signed_url(signed_url)
+            chunks = response.iter_content(
+                chunk_size=CHUNK_SIZE if codec or verify_checksum else 1024)
+            if verify_checksum:
+                checksum = StreamingChecksum(threaded=int(
+                    response.headers.get('Content-Length', 0)) > THREADED_CHECKSUM_SIZE)
+                chunks = checksum.wrap(chunks)
+            if self.bandwidth_limiter:
+                chunks = self.bandwidth_limiter.throttle(chunks)
+
+            with open(target_path, "wb") as output:
+                for chunk in decompress_chunks(chunks, codec) if codec else chunks:
+                    output.write(chunk)
+            if verify_checksum:
+                checksum.verify(response.headers.get('ETag'), path)
+
+        if verify_checksum:
+            call_with_retries(download, retries=1)
+        else:
+            download()
+
+    @traced
+    def download_bytes(self, path):
+        '''Download the content of a file into memory.
+
+        The buffer is allocated once from the size of the content and filled
+        in place, so that the content is not copied.
+
+        Args:
+            path (str): The path of the file to be downloaded. Must start with a '/'.
+
+        Returns:
+            A bytearray of the content
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+
+        response = self.__open_content(path)
+        try:
+            size = self.__decoded_size(response)
+            if size is None:
+                chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+                if self.bandwidth_limiter:
+                    chunks = self.bandwidth_limiter.throttle(chunks)
+                # extended in place, so that the chunks are not joined into a copy
+                content = bytearray()
+                for chunk in chunks:
+                    content.extend(chunk)
+                return content
+            content = bytearray(size)
+            self.__read_into(response, memoryview(content), path)
+            return content
+        finally:
+            response.close()
+
+    @traced
+    def download_into(self, path, buffer):
+        '''Download the content of a file into a preallocated buffer.
+
+        The content is written in place, by chunks, at the start of the buffer.
+
+        Args:
+            path (str): The path of the file to be downloaded. Must start with a '/'.
+            buffer: A writable buffer at least as large as the content, e.g. a
+                bytearray, a memoryview or a C-contiguous NumPy array. Under
+                python 2, the items of the buffer must be bytes.
+
+        Returns:
+            The number of bytes written
+
+        Raises:
+            StorageArgumentException: Invalid arguments, or the buffer is too small
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+
+        view = byte_view(buffer)
+        if view.readonly:
+            raise StorageArgumentException('The buffer must be writable')
+        response = self.__open_content(path)
+        try:
+            size = self.__decoded_size(response)
+            if size is not None and size > len(view):
+                raise StorageArgumentException(
+                    'The buffer of {0} bytes is too small for the {1} bytes of {2}'.format(
+                        len(view), size, path))
+            return self.__read_into(response, view, path)
+        finally:
+            response.close()
+
+    @staticmethod
+    def __decoded_size(response):
+        '''Get the size of a decoded content, None if it is unknown'''
+        size = response.headers.get('Content-Length')
+        # the length of an encoded content, e.g. gzip, is not the decoded one
+        if size is None or response.headers.get('Content-Encoding', 'identity') != 'identity':
+            return None
+        return int(size)
+
+    def __open_content(self, path):
+        '''Get the streamed response of the content of a file'''
+
+        self.__validate_storage_path(path, projects_allowed=False)
+        entity = self.api_client.get_entity_by_query(path=path)
+        if entity['entity_type'] != 'file':
+            raise StorageArgumentException('Only file entities can be downloaded')
         signed_url = self.api_client.get_signed_url(entity['uuid'])
-        response = self.api_client.download_signed_url(signed_url)
+        return self.api_client.download_signed_url(signed_url)
+
+    def __read_into(self, response, view, path):
+        '''Read a streamed response into a memoryview, returning the number of bytes read'''
+
+        acquire = self.bandwidth_limiter.transfer() if self.bandwidth_limiter else None
+        raw = response.raw
+        raw.decode_content = True
+        written = 0
+        while written < len(view):
+            # bounded reads, as the connection reads into a temporary buffer first
+            count = raw.readinto(view[written:written + CHUNK_SIZE])
+            if not count:
+                break
+            if acquire:
+                acquire(count)
+            written += count
+        if written == len(view) and raw.read(1):
+            raise StorageArgumentException(
+                'The buffer of {0} bytes is too small for {1}'.format(len(view), path))
+        return written
+
+    @traced
+    def open(self, path, mode='rb', block_size=RemoteFile.DEFAULT_BLOCK_SIZE,
+             cache_blocks=RemoteFile.DEFAULT_CACHE_BLOCKS,
+             read_ahead=RemoteFile.DEFAULT_READ_AHEAD):
+        '''Open a file of the storage service for random access reads.
+
+        Only the blocks of the content which are read are downloaded, so that
+        e.g. the header of a large HDF5 file can be read without downloading
+        the whole file.
+
+        Args:
+            path (str): The path of the file to be opened. Must start with a '/'.
+            mode (str): The mode in which the file is opened, only 'rb' is supported.
+            block_size (int): The size in bytes of the blocks which are fetched.
+            cache_blocks (int): The maximum number of blocks kept in memory.
+            read_ahead (int): The maximum number of blocks fetched at once when
+                reading sequentially.
 
-        with open(target_path, "wb") as output:
-            for chunk in response.iter_content(chunk_size=1024):
-                output.write(chunk)
+        Returns:
+            A seekable storage_service.remote_file.RemoteFile, an io.RawIOBase
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
 
+        self.__validate_storage_path(path, projects_allowed=False)
+        if mode != 'rb':
+            raise StorageArgumentException('Only the "rb" mode is supported')
+        entity = self.api_client.get_entity_by_query(path=path)
+        if entity['entity_type'] != 'file':
+            raise StorageArgumentException('Only file entities can be opened')
+
+        return RemoteFile(self.api_client, entity['uuid'], block_size=block_size,
+                          cache_blocks=cache_blocks, read_ahead=read_ahead)
+
+    @traced
     def exists(self, path):
         '''Check if a certain path exists in the storage service.
 
@@ -142,6 +588,94 @@ class Client(object):
 
         return metadata and 'uuid' in metadata
 
+    @traced
+    def exists_many(self, paths, workers=DEFAULT_WORKERS):
+        '''Check if many paths exist in the storage service, see `stat_many`.
+
+        Args:
+            paths (iterable): The paths to be checked.
+            workers (int): The maximum number of concurrent requests.
+
+        Returns:
+            An ordered dictionary of booleans keyed by path, True if the path exists.
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageException: other 400-600 error codes
+        '''
+
+        return OrderedDict((path, bool(entity and 'uuid' in entity))
+                           for path, entity in self.stat_many(paths, workers).items())
+
+    @traced
+    def stat_many(self, paths, workers=DEFAULT_WORKERS):
+        '''Get the details of the entities of many paths.
+
+        The paths are grouped by parent folder: each parent is resolved once,
+        then either its children are listed once or, when only a few of them
+        are wanted, they are queried by name. The groups are processed
+        concurrently.
+
+        Args:
+            paths (iterable): The paths of the entities.
+            workers (int): The maximum number of concurrent requests.
+
+        Returns:
+            An ordered dictionary of the entity details keyed by path, None for
+            the paths which do not exist::
+
+                {
+                    u'/my_project/file_1': {u'uuid': u'e2c25c1b-...', u'name': u'file_1', ...},
+                    u'/my_project/missing': None
+                }
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageException: other 400-600 error codes
+        '''
+
+        steps = OrderedDict()
+        for path in paths:
+            self.__validate_storage_path(path)
+            steps[path] = tuple(path.rstrip('/').rsplit('/', 1))
+        groups = OrderedDict()
+        for parent, name in steps.values():
+            groups.setdefault(parent, set()).add(name)
+
+        found = dict(zip(groups, map_concurrently(
+            self.__find_children, list(groups.items()), workers)))
+        return OrderedDict((path, found[parent].get(name))
+                           for path, (parent, name) in steps.items())
+
+    def __find_children(self, parent_and_names):
+        '''Get the wanted children of a parent path keyed by name'''
+
+        parent, names = parent_and_names
+        if not parent:
+            # projects can only be found by path
+            return dict((name, self.__find_entity('/' + name)) for name in names)
+
+        entity = self.__find_entity(parent)
+        if not entity or entity['entity_type'] not in self.__BROWSABLE_TYPES:
+            return {}
+        if len(names) <= self.__NAME_FILTER_LIMIT:
+            children = [child for name in sorted(names)
+                        for child in iter_children(self.api_client, entity['uuid'], name=name)]
+        else:
+            children = iter_children(self.api_client, entity['uuid'])
+        return dict((child['name'], child) for child in children if child['name'] in names)
+
+    def __find_entity(self, path):
+        '''Get the details of the entity of a path, None if it does not exist'''
+
+        try:
+            return self.api_client.get_entity_by_query(path=path)
+        except StorageNotFoundException:
+            return None
+
+    @traced
     def get_parent(self, path):
         '''Get the parent entity of the entity pointed by the given path.
 
@@ -164,6 +698,7 @@ class Client(object):
         parent_path = '/{0}'.format('/'.join(path_steps))
         return self.api_client.get_entity_by_query(path=parent_path)
 
+    @traced
     def mkdir(self, path):
         '''Create a folder in the storage service pointed by the given path.
 
@@ -186,7 +721,9 @@ class Client(object):
         # no return necessary, function succeeds or we would have thrown an exception
         # before this point.
 
-    def upload_file(self, local_file, dest_path, mimetype):
+    @traced
+    def upload_file(self, local_file, dest_path, mimetype, compression=None,
+                    verify_checksum=False):  # pylint: disable=too-many-arguments
         '''Upload local file content to a storage service destination folder.
 
             Args:
@@ -196,24 +733,27 @@ class Client(object):
                     suffix should be the name the file will have on in the destination folder
                     i.e.: /project/folder/.../file_name
                 mimetype(str): set the contentType attribute
+                compression(str): 'gzip' or 'zstd' to compress the content
+                    while it is uploaded. The codec is recorded in the metadata
+                    of the file, see the decompress argument of download_file.
+                verify_checksum(bool): compute the MD5 digest of the content
+                    while it is uploaded and compare it with the returned ETag,
+                    uploading it again once on mismatch.
 
             Returns:
                 The uuid of created file entity as string
 
             Raises:
                 StorageArgumentException: Invalid arguments
+                StorageChecksumException: The content does not match the ETag
                 StorageForbiddenException: Server response code 403
                 StorageNotFoundException: Server response code 404
                 StorageException: other 400-600 error codes
         '''
 
-        self.__validate_storage_path(dest_path)
-        # get the paths of the target dir and the target file name
-        if dest_path.endswith('/'):
-            raise StorageArgumentException('Must specify target file name in dest_path argument')
-        if local_file.endswith(os.path.sep):
-            raise StorageArgumentException('Must specify source file name in local_file'
-                                           ' argument, directory upload not supported')
+        self.__validate_upload(local_file, dest_path)
+        if compression:
+            validate_codec(compression)
 
         # create the file container
         new_file = self.api_client.create_file(
@@ -222,11 +762,126 @@ class Client(object):
             parent=self.get_parent(dest_path)['uuid']
         )
 
-        etag = self.api_client.upload_file_content(new_file['uuid'], source=local_file)
+        def upload():
+            '''Stream the content of the local file, compressing and hashing it if needed'''
+            with open(local_file, 'rb') as source:
+                chunks = iter(lambda: source.read(CHUNK_SIZE), b'')
+                if compression:
+                    chunks = compress_chunks(chunks, compression)
+                if verify_checksum:
+                    checksum = StreamingChecksum(
+                        threaded=os.path.getsize(local_file) > THREADED_CHECKSUM_SIZE)
+                    chunks = checksum.wrap(chunks)
+                if self.bandwidth_limiter:
+                    chunks = self.bandwidth_limiter.throttle(chunks)
+                etag = self.api_client.upload_file_content(new_file['uuid'], content=chunks)
+            if verify_checksum:
+                checksum.verify(etag, dest_path)
+            return etag
+
+        if verify_checksum:
+            etag = call_with_retries(upload, retries=1)
+        elif compression or self.bandwidth_limiter:
+            etag = upload()
+        else:
+            etag = self.api_client.upload_file_content(new_file['uuid'], source=local_file)
+        if compression:
+            self.api_client.set_metadata(
+                'file', new_file['uuid'], {COMPRESSION_METADATA_KEY: compression})
         new_file['etag'] = etag
 
         return new_file
 
+    @traced
+    def upload_files(self, files, content_index=None, workers=DEFAULT_WORKERS):
+        '''Upload many local files concurrently, sending each distinct content once.
+
+        The local files are hashed first. When several files have the same
+        content, it is uploaded once and copied by the service into the other
+        files. When a content index is given, the contents which already exist
+        in the indexed project are copied from the existing files instead of
+        being uploaded, and the index is updated with the new files.
+
+            Args:
+                files (iterable): (local_file, dest_path, mimetype) tuples, as
+                    the arguments of upload_file.
+                content_index: An optional
+                    storage_service.content_index.ContentIndex of the existing
+                    contents.
+                workers (int): The maximum number of concurrent transfers.
+
+            Returns:
+                An ordered dictionary of the created file entities, with their
+                'etag', keyed by their destination path.
+
+            Raises:
+                IOError: A local file cannot be read.
+                StorageArgumentException: Invalid arguments
+                StorageForbiddenException: Server response code 403
+                StorageNotFoundException: Server response code 404
+                StorageException: other 400-600 error codes
+        '''
+
+        files = list(files)
+        for item in files:
+            self.__validate_upload(item[0], item[1])
+        if len(set(dest_path for _, dest_path, _ in files)) != len(files):
+            raise StorageArgumentException('The destination paths must be distinct')
+
+        digests = map_concurrently(lambda item: file_md5(item[0]), files, workers)
+        # each parent folder is resolved once, through any of its files
+        children = dict((dest_path.rsplit('/', 1)[0], dest_path) for _, dest_path, _ in files)
+        parents = dict(zip(children, map_concurrently(
+            lambda parent: self.get_parent(children[parent])['uuid'], list(children), workers)))
+        sources = {}
+
+        def transfer(item):
+            '''Create a file, copying its content from an existing file if any'''
+            (local_file, dest_path, mimetype), digest = item
+            source = sources.get(digest) or (
+                content_index.find(digest) if content_index is not None else None)
+            new_file = self.api_client.create_file(
+                dest_path.split('/')[-1], mimetype, parents[dest_path.rsplit('/', 1)[0]])
+            if source:
+                self.api_client.copy_file_content(new_file['uuid'], source)
+                new_file['etag'] = '"{0}"'.format(digest)
+            elif self.bandwidth_limiter:
+                with open(local_file, 'rb') as content:
+                    new_file['etag'] = self.api_client.upload_file_content(
+                        new_file['uuid'], content=self.bandwidth_limiter.throttle(
+                            iter(lambda: content.read(CHUNK_SIZE), b'')))
+            else:
+                new_file['etag'] = self.api_client.upload_file_content(
+                    new_file['uuid'], source=local_file)
+            if content_index is not None and \
+                    dest_path.startswith(content_index.project_path + '/'):
+                content_index.add(new_file['uuid'], dest_path, new_file['etag'])
+            return new_file
+
+        # the first file of each content is transferred before the copies of its content
+        firsts, duplicates, seen = [], [], set()
+        for item in zip(files, digests):
+            (duplicates if item[1] in seen else firsts).append(item)
+            seen.add(item[1])
+        created = dict(zip([item[0][1] for item in firsts],
+                           map_concurrently(transfer, firsts, workers)))
+        sources.update((digest, created[dest_path]['uuid'])
+                       for (_, dest_path, _), digest in firsts)
+        created.update(zip([item[0][1] for item in duplicates],
+                           map_concurrently(transfer, duplicates, workers)))
+        return OrderedDict((dest_path, created[dest_path]) for _, dest_path, _ in files)
+
+    def __validate_upload(self, local_file, dest_path):
+        '''Check the source and destination of an upload'''
+        self.__validate_storage_path(dest_path)
+        # get the paths of the target dir and the target file name
+        if dest_path.endswith('/'):
+            raise StorageArgumentException('Must specify target file name in dest_path argument')
+        if local_file.endswith(os.path.sep):
+            raise StorageArgumentException('Must specify source file name in local_file'
+                                           ' argument, directory upload not supported')
+
+    @traced
     def delete(self, path):
         ''' Delete an entity from the storage service using its path.
 
@@ -258,6 +913,156 @@ class Client(object):
         elif entity['entity_type'] == 'file':
             self.api_client.delete_file(entity['uuid'])
 
+    @traced
+    def copy(self, src_path, dst_path, recursive=True, copy_metadata=False,
+             workers=DEFAULT_WORKERS):
+        '''Copy a file or a folder within the storage service.
+
+        The content of the files is copied by the service itself, no data is
+        transferred through the client. The folders of each level of the tree
+        are created concurrently, then all the files are copied concurrently.
+
+        Args:
+            src_path (str): The path of the file or folder to copy.
+            dst_path (str): The path of the copy. Its parent must exist and it
+                must not exist already.
+            recursive (bool): Allow the copy of folders with their content.
+            copy_metadata (bool): Copy the metadata of the entities as well.
+            workers (int): The maximum number of concurrent requests.
+
+        Returns:
+            A dictionary describing the created file or folder::
+
+                {
+                    u'created_by': u'303447',
+                    u'created_on': u'2017-03-21T14:06:32.293902Z',
+                    u'description': u'',
+                    u'entity_type': u'folder',
+                    u'modified_by': u'303447',
+                    u'modified_on': u'2017-03-21T14:06:32.293967Z',
+                    u'name': u'myfolder',
+                    u'parent': u'3abd8742-d069-44cf-a66b-2370df74a682',
+                    u'uuid': u'2516442e-1e26-4de1-8ed8-94523224cc40'
+                }
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+
+        self.__validate_storage_path(src_path)
+        self.__validate_storage_path(dst_path, projects_allowed=False)
+        dst_path = dst_path.rstrip('/')
+        source = self.api_client.get_entity_by_query(path=src_path)
+        if source['entity_type'] in self.__BROWSABLE_TYPES and not recursive:
+            raise StorageArgumentException(
+                'The entity type "{0}" can only be copied recursively'.format(
+                    source['entity_type']))
+        parent = self.get_parent(dst_path)
+
+        copy = self.__copy_entity(source, dst_path.split('/')[-1], parent['uuid'], copy_metadata)
+        if source['entity_type'] != 'file':
+            self.__copy_children(src_path.rstrip('/'), source['uuid'], copy['uuid'],
+                                 copy_metadata, workers)
+        return copy
+
+    def __copy_entity(self, entity, name, parent_uuid, copy_metadata):
+        '''Create the copy of an entity under the given parent, without its children'''
+
+        if entity['entity_type'] == 'file':
+            created = self.api_client.create_file(name, entity.get('content_type'), parent_uuid)
+            self.api_client.copy_file_content(created['uuid'], entity['uuid'])
+        else:
+            created = self.api_client.create_folder(name, parent_uuid)
+        if copy_metadata:
+            metadata = self.api_client.get_metadata(entity['entity_type'], entity['uuid'])
+            if metadata:
+                self.api_client.set_metadata(created['entity_type'], created['uuid'], metadata)
+        return created
+
+    def __copy_children(self, src_path, src_uuid, dst_uuid, copy_metadata, workers):
+        '''Copy recursively the children of a folder into another folder'''
+
+        copies = {src_path: dst_uuid}
+        folders, files = [], []
+        for path, entity in walk(self.api_client, src_path, src_uuid, workers):
+            (folders if entity['entity_type'] == 'folder' else files).append((path, entity))
+
+        def copy_child(path_and_entity):
+            '''Copy an entity under the copy of its parent folder'''
+            path, entity = path_and_entity
+            parent_path, name = path.rsplit('/', 1)
+            return self.__copy_entity(entity, name, copies[parent_path], copy_metadata)['uuid']
+
+        # the parent folders have to be created before their children
+        for depth in sorted(set(path.count('/') for path, _ in folders)):
+            level = [folder for folder in folders if folder[0].count('/') == depth]
+            copies.update(zip([path for path, _ in level],
+                              map_concurrently(copy_child, level, workers)))
+        map_concurrently(copy_child, files, workers)
+
+    @traced
+    def bulk_update_metadata(self, updates, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES):
+        '''Update the metadata of many entities concurrently.
+
+        The updates of the same entity are merged, in order, into a single
+        request. Existing non-modified metadata will not be affected. Each
+        request is retried on transient errors, and the failure of an entity
+        does not stop the update of the others.
+
+        Args:
+            updates (iterable): (entity, metadata) tuples where entity is either
+                the path of the entity or its details as returned by the
+                service (a dictionary with at least 'uuid' and 'entity_type'),
+                and metadata a dictionary of key/value pairs to be written.
+            workers (int): The maximum number of concurrent requests.
+            retries (int): The maximum number of retries of each request.
+
+        Returns:
+            An ordered dictionary of the result for each entity, keyed by its
+            path or UUID as given. The result is either the updated metadata or
+            the StorageException, or requests.RequestException on a connection
+            error, raised for that entity::
+
+                {
+                    u'/my_project/file_1': {u'species': u'mouse'},
+                    u'/my_project/file_2': StorageNotFoundException(...)
+                }
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+        '''
+
+        merged = OrderedDict()
+        for entity, metadata in updates:
+            if not isinstance(metadata, dict):
+                raise StorageArgumentException('The metadata was not provided as a '
+                                               'dictionary')
+            if isinstance(entity, str):
+                self.__validate_storage_path(entity)
+                key = entity
+            else:
+                key = entity['uuid']
+            merged.setdefault(key, (entity, {}))[1].update(metadata)
+
+        def update(item):
+            '''Update the merged metadata of an entity, returning any error'''
+            entity, metadata = item
+            try:
+                if isinstance(entity, str):
+                    entity = call_with_retries(
+                        lambda: self.api_client.get_entity_by_query(path=entity), retries)
+                return call_with_retries(
+                    lambda: self.api_client.update_metadata(
+                        entity['entity_type'], entity['uuid'], metadata), retries)
+            except (StorageException, requests.RequestException) as error:
+                return error
+
+        results = map_concurrently(update, merged.values(), workers)
+        return OrderedDict(zip(merged, results))
+
     @classmethod
     def __validate_storage_path(cls, path, projects_allowed=True):
         '''Validate a string as a valid storage path'''
@@ -0,0 +1,118 @@
+'''A pool of storage clients sharing their connections across access tokens'''
+
+import logging
+import threading
+
+from hbp_service_client.request.deadline import DEFAULT_TIMEOUT
+from hbp_service_client.request.transport import RequestsTransport
+from hbp_service_client.storage_service.api import ApiClient
+from hbp_service_client.storage_service.client import Client
+
+L = logging.getLogger(__name__)
+
+
+class ClientPool(object):
+    '''A factory of the clients of many users.
+
+    The pool holds the connections and, for each environment, the request
+    template of the clients, whose service url is looked up once. The clients
+    it hands out only add an access token to the template, which makes them
+    cheap enough to be created for each request of a multi-user service.
+
+    Nothing specific to a user is shared by the clients: the default transport
+    refuses the cookies of the servers, and the caches of the objects built on
+    a client, e.g. a ZarrStore, are held by these objects.
+
+        Example:
+            >>> from hbp_service_client.storage_service.client_pool import ClientPool
+            >>> pool = ClientPool()
+            >>> storage_client = pool.client(request_access_token)
+            >>> storage_client.list('/my_project')
+    '''
+
+    def __init__(self, transport=None, pool_maxsize=10, single_flight=None,
+                 timeout=DEFAULT_TIMEOUT, hedging=None, circuit_breaker=None):
+        # pylint: disable=too-many-arguments
+        '''
+        Args:
+            transport: The request.transport.Transport shared by the clients,
+                which must not keep any state specific to a user. By default a
+                RequestsTransport refusing the cookies.
+            pool_maxsize (int): The maximum number of connections kept for a host
+                by the default transport.
+            single_flight: A request.coalescing.SingleFlight coalescing the
+                concurrent identical GET requests of the clients. The requests
+                of different users differ by their token and are never coalesced.
+            timeout: The (connect, read) timeouts in seconds of the requests,
+                None for no timeout.
+            hedging: A request.hedging.HedgingPolicy duplicating the GET requests
+                of the clients which are slower than usual.
+            circuit_breaker: A request.circuit_breaker.CircuitBreaker failing fast
+                the requests of the clients to the endpoints which keep failing.
+        '''
+        self.__transport = transport if transport is not None else RequestsTransport(
+            pool_maxsize=pool_maxsize, cookies=False)
+        self.__single_flight = single_flight
+        self.__timeout = timeout
+        self.__hedging = hedging
+        self.__circuit_breaker = circuit_breaker
+        self.__requests = {}
+        self.__lock = threading.Lock()
+
+    def api_client(self, access_token, environment='prod'):
+        '''Get a REST client authenticated with an access token.
+
+        Args:
+            access_token (str): The access token of the user.
+            environment (str): The service environment, 'prod' or 'dev'.
+
+        Returns:
+            A storage_service.api.ApiClient instance
+        '''
+        return ApiClient.with_request(self.__base_request(environment), access_token)
+
+    def client(self, access_token, environment='prod'):
+        '''Get a high-level client authenticated with an access token.
+
+        Args:
+            access_token (str): The access token of the user.
+            environment (str): The service environment, 'prod' or 'dev'.
+
+        Returns:
+            A storage_service.client.Client instance
+        '''
+        return Client(self.api_client(access_token, environment))
+
+    def invalidate(self, environment=None):
+        '''Look the service url up again for the next clients.
+
+        Args:
+            environment (str): The environment whose template is dropped, all
+                of them by default.
+        '''
+        with self.__lock:
+            if environment is None:
+                self.__requests.clear()
+            else:
+                self.__requests.pop(environment, None)
+
+    def close(self):
+        '''Release the connections of the pool.'''
+        self.__transport.close()
+
+    def __base_request(self, environment):
+        '''Get the request template of an environment, created on first use'''
+        with self.__lock:
+            request = self.__requests.get(environment)
+            if request is None:
+                L.debug('Creating the request template of the %s environment', environment)
+                request = ApiClient.base_request(
+                    environment, self.__transport).with_timeout(self.__timeout)
+                if self.__single_flight is not None:
+                    request = request.coalesce_with(self.__single_flight)
+                if self.__hedging is not None:
+                    request = request.hedge_with(self.__hedging)
+                if self.__circuit_breaker is not None:
+                    request = request.with_circuit_breaker(self.__circuit_breaker)
+                self.__requests[environment] = request
+            return request
@@ -0,0 +1,90 @@
+'''Streaming compression of the file contents.
+
+The gzip codec uses the standard library, the zstd codec requires the optional
+`zstandard` package.
+'''
+
+import zlib
+
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# the metadata key recording the codec of a compressed file content
+COMPRESSION_METADATA_KEY = 'compression'
+CODECS = ('gzip', 'zstd')
+CHUNK_SIZE = 1024 * 1024
+
+# zlib window bits selecting the gzip container
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def validate_codec(codec):
+    '''Check that a codec is known and available.
+
+    Args:
+        codec (str): The name of the codec, one of CODECS.
+
+    Raises:
+        StorageArgumentException: Unknown or unavailable codec
+    '''
+    if codec not in CODECS:
+        raise StorageArgumentException(
+            'Unknown compression "{0}", expected one of {1}'.format(codec, ', '.join(CODECS)))
+    if codec == 'zstd' and zstandard is None:
+        raise StorageArgumentException('The zstd compression requires the zstandard package')
+
+
+def compress_chunks(chunks, codec):
+    '''Compress a stream of bytes on the fly.
+
+    Args:
+        chunks (iterable): The chunks of bytes to be compressed.
+        codec (str): The name of the codec, one of CODECS.
+
+    Returns:
+        A generator of the compressed chunks.
+
+    Raises:
+        StorageArgumentException: Unknown or unavailable codec
+    '''
+    validate_codec(codec)
+    if codec == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS)
+    else:
+        compressor = zstandard.ZstdCompressor().compressobj()
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def decompress_chunks(chunks, codec):
+    '''Decompress a stream of bytes on the fly.
+
+    Args:
+        chunks (iterable): The chunks of compressed bytes.
+        codec (str): The name of the codec, one of CODECS.
+
+    Returns:
+        A generator of the decompressed chunks.
+
+    Raises:
+        StorageArgumentException: Unknown or unavailable codec
+    '''
+    validate_codec(codec)
+    if codec == 'gzip':
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+    else:
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+    for chunk in chunks:
+        decompressed = decompressor.decompress(chunk)
+        if decompressed:
+            yield decompressed
+    remaining = decompressor.flush() if codec == 'gzip' else b''
+    if remaining:
+        yield remaining
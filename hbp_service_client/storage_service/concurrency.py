@@ -0,0 +1,121 @@
+'''Helpers to run storage service calls concurrently'''
+
+import logging
+import time
+from multiprocessing.pool import ThreadPool
+
+import requests
+from hbp_service_client.request import tracing
+from hbp_service_client.request.deadline import bind, remaining_time
+from hbp_service_client.storage_service.exceptions import (
+    StorageChecksumException, StorageException)
+
+L = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_RETRIES = 3
+
+
+def map_concurrently(function, items, workers=DEFAULT_WORKERS):
+    '''Apply a function to every item using a pool of threads.
+
+    Args:
+        function: The function to call with each item.
+        items (iterable): The items to process.
+        workers (int): The maximum number of concurrent calls.
+
+    The calls are made within the deadline and the span in effect in the
+    calling thread.
+
+    Returns:
+        The list of results, in the order of the items.
+
+    Raises:
+        The first exception raised by a call, once all the calls are done.
+    '''
+
+    items = list(items)
+    if len(items) <= 1 or workers <= 1:
+        return [function(item) for item in items]
+
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(bind(tracing.bind(function)), items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def imap_concurrently(function, items, workers=DEFAULT_WORKERS):
+    '''Apply a function to every item using a pool of threads, as a generator.
+
+    Args:
+        function: The function to call with each item.
+        items (iterable): The items to process.
+        workers (int): The maximum number of concurrent calls.
+
+    The calls are made within the deadline and the span in effect in the
+    calling thread. The pending calls are cancelled when the generator is
+    closed.
+
+    Returns:
+        A generator of (item, result) tuples, as soon as each call is done.
+
+    Raises:
+        The exception raised by a call, once its result is reached.
+    '''
+
+    items = list(items)
+    if len(items) <= 1 or workers <= 1:
+        for item in items:
+            yield (item, function(item))
+        return
+
+    function = bind(tracing.bind(function))
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        for result in pool.imap_unordered(lambda item: (item, function(item)), items):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def call_with_retries(function, retries=DEFAULT_RETRIES, backoff=0.5):
+    '''Call a function, retrying with an exponential backoff on transient errors.
+
+    Connection errors, checksum mismatches and the service errors which are
+    not a more specific StorageException (e.g. forbidden or not found) are
+    considered transient. There is no retry once the backoff would exceed the
+    deadline in effect.
+
+    Args:
+        function: The function to call, without arguments.
+        retries (int): The maximum number of retries after the first call.
+        backoff (float): The delay in seconds before the first retry, doubled
+            for each subsequent retry.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        The exception of the last attempt.
+    '''
+
+    attempt = 0
+    while True:
+        try:
+            return function()
+        except (StorageException, requests.ConnectionError, requests.Timeout) as error:
+            # pylint: disable=unidiomatic-typecheck
+            transient = type(error) in (StorageException, StorageChecksumException) or \
+                not isinstance(error, StorageException)
+            delay = backoff * 2 ** attempt
+            remaining = remaining_time()
+            if not transient or attempt >= retries or \
+                    (remaining is not None and remaining <= delay):
+                raise
+            L.debug('Retrying after transient error: %s', error)
+            tracing.record_retry(attempt, error)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,163 @@
+'''A local SQLite index of the content digests of the files of a project'''
+
+import logging
+import sqlite3
+import threading
+
+from hbp_service_client.storage_service.checksum import md5_from_etag
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_WORKERS, map_concurrently)
+from hbp_service_client.storage_service.exceptions import StorageException
+from hbp_service_client.storage_service.traversal import walk
+
+L = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS content (
+    uuid TEXT PRIMARY KEY,
+    path TEXT,
+    md5 TEXT,
+    modified_on TEXT
+);
+CREATE INDEX IF NOT EXISTS content_md5 ON content (md5);
+'''
+
+
+class ContentIndex(object):
+    '''A local index of the MD5 digest of the content of the files of a project.
+
+    The digests are taken from the ETags of the service, so that the index
+    tells which files already hold a given content without downloading any of
+    them. It is used by `Client.upload_files` to copy the existing contents on
+    the server side instead of uploading them again.
+
+        Example:
+            >>> from hbp_service_client.storage_service.client import Client
+            >>> from hbp_service_client.storage_service.content_index import ContentIndex
+            >>> client = Client.new(my_access_token)
+            >>> index = ContentIndex(client, '/my_project', database='my_project.db')
+            >>> index.build()
+            >>> client.upload_files([('atlas.nii', '/my_project/atlas.nii', None)], index)
+    '''
+
+    def __init__(self, client, project_path, database=':memory:', workers=DEFAULT_WORKERS):
+        '''
+        Args:
+            client: The storage_service.client.Client to crawl the project with.
+            project_path (str): The path of the project to index, e.g. '/my_project'.
+            database (str): The path of the SQLite database file. The index is
+                kept in memory by default.
+            workers (int): The maximum number of concurrent requests.
+        '''
+        self.__client = client
+        self.__project_path = project_path.rstrip('/')
+        self.__workers = workers
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(database, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+
+    @property
+    def project_path(self):
+        '''The path of the indexed project'''
+        return self.__project_path
+
+    def build(self):
+        '''Index the digests of the files of the project.
+
+        Only the files which are new or whose modification date changed are
+        fetched, and the files which no longer exist are removed.
+
+        Returns:
+            The number of files whose digest was fetched.
+
+        Raises:
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        api_client = self.__client.api_client
+        project = api_client.get_entity_by_query(path=self.__project_path)
+        files = [(path, entity) for (path, entity) in walk(
+            api_client, self.__project_path, project['uuid'], self.__workers)
+                 if entity['entity_type'] == 'file']
+
+        with self.__lock:
+            known = dict(self.__connection.execute('SELECT uuid, modified_on FROM content'))
+        stale = [(path, entity) for (path, entity) in files
+                 if known.get(entity['uuid'], '') != entity.get('modified_on')]
+        removed = set(known) - set(entity['uuid'] for (_, entity) in files)
+
+        digests = map_concurrently(
+            lambda path_and_entity: self.__fetch_md5(path_and_entity[1]['uuid']),
+            stale, self.__workers)
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                'DELETE FROM content WHERE uuid = ?', [(uuid,) for uuid in removed])
+            self.__connection.executemany(
+                'INSERT OR REPLACE INTO content VALUES (?, ?, ?, ?)',
+                [(entity['uuid'], path, md5, entity.get('modified_on'))
+                 for (path, entity), md5 in zip(stale, digests) if md5 is not None])
+
+        L.debug('Indexed %s files, removed %s', len(stale), len(removed))
+        return len(stale)
+
+    def add(self, file_uuid, path, etag):
+        '''Record the content of a file which was just written.
+
+        Args:
+            file_uuid (str): The UUID of the file.
+            path (str): The path of the file.
+            etag (str): The ETag returned by the service for the content.
+
+        Returns:
+            None
+        '''
+        md5 = md5_from_etag(etag)
+        if md5 is None:
+            return
+        with self.__lock, self.__connection:
+            # a null modification date has the file fetched again by the next build
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO content VALUES (?, ?, ?, NULL)', (file_uuid, path, md5))
+
+    def find(self, md5):
+        '''Find a file holding a content.
+
+        The candidate files are checked against the service, so that a file
+        which was deleted or modified since it was indexed is not returned.
+
+        Args:
+            md5 (str): The hexadecimal MD5 digest of the content.
+
+        Returns:
+            The UUID of a file holding the content, None if there is none.
+        '''
+        with self.__lock:
+            candidates = [row[0] for row in self.__connection.execute(
+                'SELECT uuid FROM content WHERE md5 = ?', (md5.lower(),))]
+        for file_uuid in candidates:
+            if self.__fetch_md5(file_uuid) == md5.lower():
+                return file_uuid
+            L.debug('The content of %s changed since it was indexed', file_uuid)
+            with self.__lock, self.__connection:
+                self.__connection.execute('DELETE FROM content WHERE uuid = ?', (file_uuid,))
+        return None
+
+    def close(self):
+        '''Close the underlying database connection.'''
+        self.__connection.close()
+
+    def __fetch_md5(self, file_uuid):
+        '''Get the digest of a file from the ETag of its first byte, None if unknown'''
+        api_client = self.__client.api_client
+        try:
+            response = api_client.download_signed_url(
+                api_client.get_signed_url(file_uuid), byte_range=(0, 1))
+        except StorageException as error:
+            # e.g. the file was deleted, or it is empty and has no first byte
+            L.debug('No digest for %s: %s', file_uuid, error)
+            return None
+        try:
+            return md5_from_etag(response.headers.get('ETag'))
+        finally:
+            response.close()
@@ -19,3 +19,23 @@ class StorageForbiddenException(StorageException):
 class StorageNotFoundException(StorageException):
     '''404 not found'''
     pass
+
+
+class StorageRangeException(StorageException):
+    '''416 range not satisfiable'''
+    pass
+
+
+class StorageChecksumException(StorageException):
+    '''The checksum of a transferred content does not match its ETag'''
+    pass
+
+
+class StorageTimeoutException(StorageException):
+    '''The deadline of an operation is exceeded'''
+    pass
+
+
+class StorageCircuitOpenException(StorageException):
+    '''The requests to an endpoint fail fast after repeated failures'''
+    pass
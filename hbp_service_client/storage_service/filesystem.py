@@ -0,0 +1,343 @@
+# pylint: disable=abstract-method
+#  - abstract-method: fsspec declares optional methods (e.g. sign, created) as
+# abstract, the unsupported ones raise NotImplementedError
+
+'''An fsspec filesystem backed by the storage service.
+
+This module requires the optional `fsspec` package.
+'''
+
+import logging
+import mimetypes
+import threading
+from queue import Full, Queue
+
+from fsspec.callbacks import DEFAULT_CALLBACK
+from fsspec.spec import AbstractBufferedFile, AbstractFileSystem
+
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_WORKERS, map_concurrently)
+from hbp_service_client.storage_service.exceptions import StorageNotFoundException
+from hbp_service_client.storage_service.remote_file import RangeReader
+from hbp_service_client.storage_service.traversal import iter_children
+
+L = logging.getLogger(__name__)
+
+
+class StorageFileSystem(AbstractFileSystem):
+    '''A filesystem giving access to the projects of the storage service.
+
+    Listings and entity details are cached, files are read with block-cached
+    byte range requests, written with a streaming upload, and `cat`, `get`
+    and `put` of several paths transfer the files concurrently.
+
+        Example:
+            >>> from hbp_service_client.storage_service.filesystem import StorageFileSystem
+            >>> fs = StorageFileSystem(access_token=my_access_token)
+            >>> with fs.open('/my_project/data.csv', 'rb') as data:
+            ...     header = data.readline()
+    '''
+
+    protocol = 'hbpstorage'
+    root_marker = '/'
+
+    def __init__(self, client=None, access_token=None, environment='prod',
+                 workers=DEFAULT_WORKERS, **kwargs):
+        '''
+        Args:
+            client: The storage_service.client.Client to use. A new client is
+                created from the access token if not provided.
+            access_token (str): The access token used to authenticate with the
+                service.
+            environment (str): The service environment, 'prod' or 'dev'.
+            workers (int): The maximum number of concurrent transfers.
+            kwargs: Passed to fsspec, e.g. `listings_expiry_time`.
+        '''
+        super(StorageFileSystem, self).__init__(**kwargs)
+        self.client = client or Client.new(access_token, environment)
+        self.workers = workers
+        self.__transfers = threading.local()
+
+    @classmethod
+    def _strip_protocol(cls, path):
+        if isinstance(path, list):
+            return [cls._strip_protocol(item) for item in path]
+        path = super(StorageFileSystem, cls)._strip_protocol(path)
+        return '/' + path.lstrip('/')
+
+    @property
+    def api_client(self):
+        '''The low level api client of the storage client'''
+        return self.client.api_client
+
+    def ls(self, path, detail=True, **kwargs):
+        path = self._strip_protocol(path)
+        refresh = kwargs.get('refresh', False)
+        if not refresh and path in self.dircache:
+            listing = self.dircache[path]
+        elif path == self.root_marker:
+            listing = [self.__to_info('/' + project['name'], project)
+                       for project in self.__iter_projects()]
+            self.dircache[path] = listing
+        else:
+            entity = self.__get_entity(path)
+            if entity['entity_type'] == 'file':
+                listing = [self.__to_info(path, entity)]
+            else:
+                listing = [self.__to_info('{0}/{1}'.format(path.rstrip('/'), child['name']), child)
+                           for child in iter_children(self.api_client, entity['uuid'])]
+                self.dircache[path] = listing
+        return listing if detail else [info['name'] for info in listing]
+
+    def info(self, path, **kwargs):
+        path = self._strip_protocol(path)
+        if path == self.root_marker:
+            return {'name': path, 'size': 0, 'type': 'directory'}
+        parent = self._parent(path)
+        cached = [info for info in self.dircache.get(parent, []) if info['name'] == path]
+        info = cached[0] if cached else self.__to_info(path, self.__get_entity(path))
+        if info['type'] == 'file' and info['size'] is None:
+            info['size'] = RangeReader(self.api_client, info['uuid']).size
+        return info
+
+    def invalidate_cache(self, path=None):
+        if path is None:
+            self.dircache.clear()
+            return
+        path = self._strip_protocol(path)
+        self.dircache.pop(path, None)
+        while path != self.root_marker:
+            path = self._parent(path)
+            self.dircache.pop(path, None)
+
+    def mkdir(self, path, create_parents=True, **kwargs):
+        path = self._strip_protocol(path)
+        if create_parents:
+            self.makedirs(path, exist_ok=True)
+            return
+        self.client.mkdir(path)
+        self.invalidate_cache(path)
+
+    def makedirs(self, path, exist_ok=False):
+        path = self._strip_protocol(path)
+        steps = [step for step in path.split('/') if step]
+        for depth in range(1, len(steps) + 1):
+            current = '/' + '/'.join(steps[:depth])
+            if self.exists(current):
+                if current == path and not exist_ok:
+                    raise FileExistsError(path)
+                continue
+            self.client.mkdir(current)
+            self.invalidate_cache(current)
+
+    def rmdir(self, path):
+        path = self._strip_protocol(path)
+        self.client.delete(path)
+        self.invalidate_cache(path)
+
+    def rm_file(self, path):
+        path = self._strip_protocol(path)
+        self.client.delete(path)
+        self.invalidate_cache(path)
+
+    def _rm(self, path):
+        path = self._strip_protocol(path)
+        entity = self.__get_entity(path)
+        if entity['entity_type'] == 'file':
+            self.api_client.delete_file(entity['uuid'])
+        else:
+            self.api_client.delete_folder(entity['uuid'])
+        self.invalidate_cache(path)
+
+    def cat_file(self, path, start=None, end=None, **kwargs):
+        if start is not None or end is not None:
+            return super(StorageFileSystem, self).cat_file(path, start, end, **kwargs)
+        entity = self.__get_entity(self._strip_protocol(path))
+        signed_url = self.api_client.get_signed_url(entity['uuid'])
+        return self.api_client.download_signed_url(signed_url).content
+
+    def cat(self, path, recursive=False, on_error='raise', **kwargs):
+        '''Fetch the contents of one or several paths, concurrently'''
+        paths = self.expand_path(path, recursive=recursive)
+        if len(paths) == 1 and not isinstance(path, list) and \
+                paths[0] == self._strip_protocol(path):
+            return self.cat_file(paths[0], **kwargs)
+
+        paths = [item for item in paths if not self.isdir(item)]
+
+        def fetch(item):
+            '''Fetch a file content, returning the error if allowed'''
+            try:
+                return self.cat_file(item, **kwargs)
+            except Exception as error:  # pylint: disable=broad-except
+                if on_error == 'raise':
+                    raise
+                return error
+
+        contents = map_concurrently(fetch, paths, self.workers)
+        return dict((item, content) for item, content in zip(paths, contents)
+                    if on_error == 'return' or not isinstance(content, Exception))
+
+    def get(self, rpath, lpath, recursive=False, callback=DEFAULT_CALLBACK, maxdepth=None,
+            **kwargs):
+        '''Copy remote files to local, downloading them concurrently'''
+        transfers = self.__collect_transfers(
+            super(StorageFileSystem, self).get, rpath, lpath, recursive=recursive,
+            maxdepth=maxdepth, **kwargs)
+        map_concurrently(
+            lambda transfer: super(StorageFileSystem, self).get_file(
+                transfer[0], transfer[1], **transfer[2]),
+            transfers, self.workers)
+
+    def get_file(self, rpath, lpath=None, callback=DEFAULT_CALLBACK, outfile=None, **kwargs):
+        if getattr(self.__transfers, 'pending', None) is not None:
+            self.__transfers.pending.append((rpath, lpath, dict(kwargs, outfile=outfile)))
+            return
+        super(StorageFileSystem, self).get_file(
+            rpath, lpath, callback=callback, outfile=outfile, **kwargs)
+
+    def put(self, lpath, rpath, recursive=False, callback=DEFAULT_CALLBACK, maxdepth=None,
+            **kwargs):
+        '''Copy local files to remote, uploading them concurrently'''
+        transfers = self.__collect_transfers(
+            super(StorageFileSystem, self).put, lpath, rpath, recursive=recursive,
+            maxdepth=maxdepth, **kwargs)
+        # the folders are created first, as concurrent creations would conflict
+        for folder in sorted(set(self._parent(transfer[1]) for transfer in transfers)):
+            self.makedirs(folder, exist_ok=True)
+        map_concurrently(
+            lambda transfer: super(StorageFileSystem, self).put_file(
+                transfer[0], transfer[1], **transfer[2]),
+            transfers, self.workers)
+
+    def put_file(self, lpath, rpath, callback=DEFAULT_CALLBACK, mode='overwrite', **kwargs):
+        if getattr(self.__transfers, 'pending', None) is not None:
+            self.__transfers.pending.append(
+                (lpath, self._strip_protocol(rpath), dict(kwargs, mode=mode)))
+            return
+        super(StorageFileSystem, self).put_file(
+            lpath, rpath, callback=callback, mode=mode, **kwargs)
+
+    def _open(self, path, mode='rb', block_size=None, autocommit=True,
+              cache_options=None, **kwargs):
+        path = self._strip_protocol(path)
+        if mode not in ('rb', 'wb'):
+            raise NotImplementedError('File mode not supported: {0}'.format(mode))
+        return StorageFile(self, path, mode, block_size=block_size, autocommit=autocommit,
+                           cache_options=cache_options, **kwargs)
+
+    def __collect_transfers(self, method, *args, **kwargs):
+        '''Run the fsspec path expansion of get/put, collecting the file transfers'''
+        self.__transfers.pending = []
+        try:
+            method(*args, **kwargs)
+            return self.__transfers.pending
+        finally:
+            self.__transfers.pending = None
+
+    def __get_entity(self, path):
+        try:
+            return self.api_client.get_entity_by_query(path=path)
+        except StorageNotFoundException:
+            raise FileNotFoundError(path)
+
+    def __iter_projects(self):
+        more_pages = True
+        page_number = 1
+        while more_pages:
+            response = self.api_client.list_projects(page=page_number, ordering='name')
+            more_pages = response['next'] is not None
+            page_number += 1
+            for project in response['results']:
+                yield project
+
+    @staticmethod
+    def __to_info(path, entity):
+        is_file = entity['entity_type'] == 'file'
+        return {
+            'name': path,
+            'size': entity.get('size') if is_file else 0,
+            'type': 'file' if is_file else 'directory',
+            'uuid': entity['uuid'],
+            'entity_type': entity['entity_type'],
+            'content_type': entity.get('content_type'),
+            'modified_on': entity.get('modified_on')
+        }
+
+
+class StorageFile(AbstractBufferedFile):
+    '''A file of the storage service opened through StorageFileSystem.
+
+    Reads fetch byte ranges of the content. Writes are streamed to the service
+    in a single upload request while the data is being written.
+    '''
+
+    # the number of written blocks buffered while the upload is catching up
+    QUEUED_BLOCKS = 2
+
+    def __init__(self, fs, path, mode='rb', **kwargs):
+        self.__reader = None
+        super(StorageFile, self).__init__(fs, path, mode, **kwargs)
+        self.__blocks = None
+        self.__upload = None
+        self.__upload_error = None
+        self.etag = None
+
+    def _fetch_range(self, start, end):
+        if self.__reader is None:
+            self.__reader = RangeReader(self.fs.api_client, self.details['uuid'], self.size)
+        return self.__reader.fetch(start, end)
+
+    def _initiate_upload(self):
+        api_client = self.fs.api_client
+        try:
+            file_uuid = api_client.get_entity_by_query(path=self.path)['uuid']
+        except StorageNotFoundException:
+            file_uuid = api_client.create_file(
+                name=self.path.split('/')[-1],
+                content_type=mimetypes.guess_type(self.path)[0] or 'application/octet-stream',
+                parent=self.fs.client.get_parent(self.path)['uuid'])['uuid']
+        self.fs.invalidate_cache(self.path)
+        self.__blocks = Queue(self.QUEUED_BLOCKS)
+        self.__upload = threading.Thread(target=self.__send, args=(file_uuid,))
+        self.__upload.daemon = True
+        self.__upload.start()
+
+    def _upload_chunk(self, final=False):
+        self.__put_block(self.buffer.getvalue())
+        if final:
+            self.__put_block(None)
+            self.__upload.join()
+            if self.__upload_error is not None:
+                raise self.__upload_error
+            self.fs.invalidate_cache(self.path)
+        return True
+
+    def __put_block(self, block):
+        '''Queue a block for the upload, failing if the upload stopped'''
+        while True:
+            if self.__upload_error is not None:
+                raise self.__upload_error
+            try:
+                self.__blocks.put(block, timeout=1)
+                return
+            except Full:
+                if not self.__upload.is_alive():
+                    raise IOError('The upload of {0} stopped'.format(self.path))
+
+    def __send(self, file_uuid):
+        try:
+            self.etag = self.fs.api_client.upload_file_content(
+                file_uuid, content=self.__iter_blocks())
+        except Exception as error:  # pylint: disable=broad-except
+            L.debug('Upload of %s failed: %s', self.path, error)
+            self.__upload_error = error
+
+    def __iter_blocks(self):
+        while True:
+            block = self.__blocks.get()
+            if block is None:
+                return
+            if block:
+                yield block
@@ -0,0 +1,255 @@
+'''A local SQLite index of the metadata of the entities of a project'''
+
+import logging
+import sqlite3
+
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_WORKERS, map_concurrently)
+from hbp_service_client.storage_service.exceptions import (
+    StorageArgumentException, StorageNotFoundException)
+from hbp_service_client.storage_service.traversal import walk
+
+L = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entity (
+    uuid TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT,
+    path TEXT,
+    entity_type TEXT,
+    modified_on TEXT
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    uuid TEXT,
+    key TEXT,
+    value TEXT,
+    number REAL,
+    PRIMARY KEY (uuid, key)
+);
+CREATE INDEX IF NOT EXISTS metadata_value ON metadata (key, value);
+CREATE INDEX IF NOT EXISTS metadata_number ON metadata (key, number);
+'''
+
+
+class MetadataIndex(object):
+    '''A local index of the metadata of all the entities of a project.
+
+    The index is built by crawling the project, fetching the metadata of the
+    entities concurrently, and allows to query the entities on several
+    metadata conditions without any request to the service.
+
+        Example:
+            >>> from hbp_service_client.storage_service.client import Client
+            >>> from hbp_service_client.storage_service.metadata_index import MetadataIndex
+            >>> index = MetadataIndex(Client.new(my_access_token), '/my_project')
+            >>> index.build()
+            >>> index.query(metadata={'species': 'mouse'}, ranges={'age': (10, 20)})
+    '''
+
+    def __init__(self, client, project_path, database=':memory:', workers=DEFAULT_WORKERS):
+        '''
+        Args:
+            client: The storage_service.client.Client to crawl the project with.
+            project_path (str): The path of the project to index, e.g. '/my_project'.
+            database (str): The path of the SQLite database file. The index is
+                kept in memory by default.
+            workers (int): The maximum number of concurrent requests.
+        '''
+        self.__client = client
+        self.__project_path = project_path
+        self.__workers = workers
+        self.__connection = sqlite3.connect(database, check_same_thread=False)
+        self.__connection.executescript(SCHEMA)
+
+    def build(self):
+        '''Index all the entities of the project.
+
+        When the database already contains an index, only the new and modified
+        entities are fetched, see `refresh`.
+
+        Returns:
+            The number of entities whose metadata was fetched.
+
+        Raises:
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        return self.refresh()
+
+    def refresh(self):
+        '''Bring the index up to date with the service.
+
+        The project tree is listed again, and the metadata is only fetched for
+        the entities which are new or whose modification date or path changed. The
+        entities which no longer exist are removed from the index.
+
+        Note:
+            Use `refresh_entity` after changing the metadata of an entity if
+            the service does not update its modification date.
+
+        Returns:
+            The number of entities whose metadata was fetched.
+
+        Raises:
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        api_client = self.__client.api_client
+        project = api_client.get_entity_by_query(path=self.__project_path)
+        entities = [(self.__project_path, project)] + list(walk(
+            api_client, self.__project_path, project['uuid'], self.__workers))
+
+        # the paths change without a modification of the descendants of a
+        # renamed or moved folder
+        known = dict((uuid, (modified_on, path)) for (uuid, modified_on, path) in
+                     self.__connection.execute('SELECT uuid, modified_on, path FROM entity'))
+        stale = [(path, entity) for (path, entity) in entities
+                 if known.get(entity['uuid']) != (entity.get('modified_on'), path)]
+        removed = set(known) - set(entity['uuid'] for (_, entity) in entities)
+
+        metadata = map_concurrently(self.__fetch_metadata, stale, self.__workers)
+        with self.__connection:
+            for uuid in removed:
+                self.__delete(uuid)
+            for (path, entity), entity_metadata in zip(stale, metadata):
+                self.__store(path, entity, entity_metadata)
+
+        L.debug('Indexed %s entities, removed %s', len(stale), len(removed))
+        return len(stale)
+
+    def refresh_entity(self, entity_uuid):
+        '''Fetch again the metadata of a single entity.
+
+        Args:
+            entity_uuid (str): The UUID of the entity.
+
+        Returns:
+            None
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageException: other 400-600 error codes
+        '''
+        api_client = self.__client.api_client
+        try:
+            entity = api_client.get_entity_details(entity_uuid)
+        except StorageNotFoundException:
+            with self.__connection:
+                self.__delete(entity_uuid)
+            return
+        path = api_client.get_entity_path(entity_uuid)
+        metadata = self.__fetch_metadata((path, entity))
+        with self.__connection:
+            self.__store(path, entity, metadata)
+
+    def query(self, metadata=None, ranges=None, prefixes=None):
+        '''Find the indexed entities matching all the given conditions.
+
+        Args:
+            metadata (dict): The {key: value} pairs the entities must have.
+            ranges (dict): The {key: (lower, upper)} inclusive bounds the values
+                must be within. A bound can be None to leave the range open.
+                Numeric bounds compare the values as numbers, other bounds
+                compare them as strings.
+            prefixes (dict): The {key: prefix} the values must start with.
+
+        Returns:
+            A list of the matching entities, ordered by path::
+
+                [{
+                    u'uuid': u'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a56',
+                    u'parent': u'3abd8742-d069-44cf-a66b-2370df74a682',
+                    u'name': u'myfile',
+                    u'path': u'/my_project/myfile',
+                    u'entity_type': u'file'
+                }]
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+        '''
+        if not (metadata or ranges or prefixes):
+            raise StorageArgumentException('No condition given for the query.')
+
+        clauses, args = [], []
+        for key, value in sorted((metadata or {}).items()):
+            clauses.append('key = ? AND value = ?')
+            args.extend([key, self.__to_text(value)])
+        for key, bounds in sorted((ranges or {}).items()):
+            clause, clause_args = self.__range_clause(key, bounds)
+            clauses.append(clause)
+            args.extend(clause_args)
+        for key, prefix in sorted((prefixes or {}).items()):
+            # the lower bound uses the (key, value) index, but there is no upper
+            # bound, e.g. the astral characters sort after U+FFFF
+            clauses.append('key = ? AND value >= ? AND substr(value, 1, length(?)) = ?')
+            args.extend([key, prefix, prefix, prefix])
+
+        where = ' AND '.join(
+            'uuid IN (SELECT uuid FROM metadata WHERE {0})'.format(clause)
+            for clause in clauses)
+        cursor = self.__connection.execute(
+            'SELECT uuid, parent, name, path, entity_type FROM entity '
+            'WHERE {0} ORDER BY path'.format(where), args)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    @classmethod
+    def __range_clause(cls, key, bounds):
+        '''Build the condition on the values of a key to be within the bounds'''
+        if not isinstance(bounds, (tuple, list)) or len(bounds) != 2:
+            raise StorageArgumentException(
+                'The range of "{0}" must be a (lower, upper) tuple.'.format(key))
+        numeric = all(isinstance(bound, (int, float))
+                      for bound in bounds if bound is not None)
+        column = 'number' if numeric else 'value'
+        clause, args = 'key = ?', [key]
+        for operator, bound in zip(['>=', '<='], bounds):
+            if bound is not None:
+                clause += ' AND {0} {1} ?'.format(column, operator)
+                args.append(bound if numeric else cls.__to_text(bound))
+        return clause, args
+
+    def close(self):
+        '''Close the underlying database connection.'''
+        self.__connection.close()
+
+    def __fetch_metadata(self, path_and_entity):
+        '''Get the metadata of an entity, None if it was deleted meanwhile'''
+        path, entity = path_and_entity
+        try:
+            return self.__client.api_client.get_metadata(entity['entity_type'], entity['uuid'])
+        except StorageNotFoundException:
+            L.debug('Entity %s vanished while indexing', path)
+            return None
+
+    def __store(self, path, entity, metadata):
+        self.__delete(entity['uuid'])
+        if metadata is None:
+            return
+        self.__connection.execute(
+            'INSERT INTO entity VALUES (?, ?, ?, ?, ?, ?)',
+            (entity['uuid'], entity.get('parent'), entity['name'], path,
+             entity['entity_type'], entity.get('modified_on')))
+        self.__connection.executemany(
+            'INSERT INTO metadata VALUES (?, ?, ?, ?)',
+            [(entity['uuid'], key, self.__to_text(value), self.__to_number(value))
+             for key, value in metadata.items()])
+
+    def __delete(self, uuid):
+        self.__connection.execute('DELETE FROM entity WHERE uuid = ?', (uuid,))
+        self.__connection.execute('DELETE FROM metadata WHERE uuid = ?', (uuid,))
+
+    @staticmethod
+    def __to_text(value):
+        return value if isinstance(value, type(u'')) else u'{0}'.format(value)
+
+    @staticmethod
+    def __to_number(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,239 @@
+# pylint: disable=too-many-instance-attributes
+
+'''Random access to the content of the files of the storage service'''
+
+import io
+import logging
+import time
+from collections import OrderedDict
+
+from hbp_service_client.storage_service.exceptions import (
+    StorageArgumentException, StorageForbiddenException, StorageNotFoundException,
+    StorageRangeException)
+
+L = logging.getLogger(__name__)
+
+
+def byte_view(buffer):
+    '''Get a view of the bytes of a buffer.
+
+    Args:
+        buffer: A buffer, e.g. a bytearray or a C-contiguous NumPy array.
+            Under python 2, whose views cannot be cast, the items of the
+            buffer must be bytes.
+
+    Returns:
+        A memoryview of the buffer, whose items are bytes.
+    '''
+    view = memoryview(buffer)
+    # memoryview.cast is new in python 3.3
+    return view.cast('B') if hasattr(view, 'cast') else view
+
+
+class RangeReader(object):
+    '''Fetch byte ranges of a file content through signed URLs.
+
+    A signed URL is reused as long as it is valid, and a new one is requested
+    when it expired.
+    '''
+
+    # the service signed URLs expire after 5 seconds
+    SIGNED_URL_LIFETIME = 4
+
+    def __init__(self, api_client, file_uuid, size=None):
+        '''
+        Args:
+            api_client: The storage_service.api.ApiClient to send the requests with.
+            file_uuid (str): The UUID of the file.
+            size (int): The size of the file content, if already known.
+        '''
+        self.__api_client = api_client
+        self.__file_uuid = file_uuid
+        self.__size = size
+        self.__signed_url = None
+        self.__signed_on = 0
+
+    @property
+    def size(self):
+        '''The size of the file content, fetched with a one byte range if unknown'''
+        if self.__size is None:
+            self.fetch(0, 1)
+        return self.__size
+
+    @property
+    def known_size(self):
+        '''The size of the file content if it is known already, None otherwise'''
+        return self.__size
+
+    def fetch(self, start, end):
+        '''Fetch a range of the file content.
+
+        Args:
+            start (int): The offset of the first byte.
+            end (int): The offset after the last byte. The range is truncated
+                to the end of the file.
+
+        Returns:
+            The bytes of the range, empty if it starts after the end of the file
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageNotFoundException: Server response code 404
+            StorageException: other 400-600 error codes
+        '''
+        if self.__size is not None:
+            end = min(end, self.__size)
+            if start >= end:
+                return b''
+        for attempt in range(2):
+            signed_url = self.__get_signed_url(refresh=attempt > 0)
+            try:
+                response = self.__api_client.download_signed_url(
+                    signed_url, byte_range=(start, end))
+            except StorageRangeException:
+                # the range starts after the end, the content is empty if it starts at 0
+                if start == 0:
+                    self.__size = 0
+                return b''
+            except (StorageForbiddenException, StorageNotFoundException):
+                if attempt > 0:
+                    raise
+                L.debug('Refreshing the signed URL of %s', self.__file_uuid)
+                continue
+            try:
+                content_range = response.headers.get('Content-Range')
+                if content_range:
+                    self.__size = int(content_range.split('/')[-1])
+                    return response.content
+                # the whole content was sent
+                content = response.content
+                self.__size = len(content)
+                return content[start:end]
+            finally:
+                response.close()
+
+    def __get_signed_url(self, refresh=False):
+        if refresh or self.__signed_url is None or \
+                time.time() - self.__signed_on > self.SIGNED_URL_LIFETIME:
+            self.__signed_on = time.time()
+            self.__signed_url = self.__api_client.get_signed_url(self.__file_uuid)
+        return self.__signed_url
+
+
+class RemoteFile(io.RawIOBase):
+    '''A read-only, seekable file object over the content of a storage file.
+
+    The content is fetched on demand by blocks, which are kept in a LRU
+    cache. When the blocks are read sequentially, the following blocks are
+    fetched ahead in a single request, doubling their number up to the
+    read-ahead limit.
+
+        Example:
+            >>> with storage_client.open('/my_project/recording.nwb') as recording:
+            ...     h5_file = h5py.File(recording, 'r')
+    '''
+
+    DEFAULT_BLOCK_SIZE = 1024 * 1024
+    DEFAULT_CACHE_BLOCKS = 32
+    DEFAULT_READ_AHEAD = 8
+
+    def __init__(self, api_client, file_uuid, block_size=DEFAULT_BLOCK_SIZE,
+                 cache_blocks=DEFAULT_CACHE_BLOCKS, read_ahead=DEFAULT_READ_AHEAD):
+        '''
+        Args:
+            api_client: The storage_service.api.ApiClient to send the requests with.
+            file_uuid (str): The UUID of the file.
+            block_size (int): The size in bytes of the blocks which are fetched.
+            cache_blocks (int): The maximum number of blocks kept in memory.
+            read_ahead (int): The maximum number of blocks fetched at once
+                when reading sequentially, 1 to disable the read-ahead.
+        '''
+        super(RemoteFile, self).__init__()
+        if block_size < 1 or read_ahead < 1:
+            raise StorageArgumentException('The block size and the read-ahead must be positive')
+        self.__reader = RangeReader(api_client, file_uuid)
+        self.__block_size = block_size
+        self.__cache_blocks = max(cache_blocks, read_ahead)
+        self.__read_ahead = read_ahead
+        self.__blocks = OrderedDict()
+        self.__position = 0
+        self.__window = 1
+        self.__next_block = None
+
+    @property
+    def size(self):
+        '''The size of the file content'''
+        return self.__reader.size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.__position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.__position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('Invalid whence: {0}'.format(whence))
+        if position < 0:
+            raise ValueError('Negative seek position {0}'.format(position))
+        self.__position = position
+        return position
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError('I/O operation on closed file.')
+        view = byte_view(buffer)
+        if self.__reader.known_size is None:
+            # the first block tells the size of the file
+            self.__get_block(self.__position // self.__block_size)
+        length = max(0, min(len(view), self.size - self.__position))
+        copied = 0
+        while copied < length:
+            index = self.__position // self.__block_size
+            offset = self.__position - index * self.__block_size
+            chunk = self.__get_block(index)[offset:offset + length - copied]
+            if not chunk:
+                # the content is shorter than its size, e.g. it was truncated
+                break
+            view[copied:copied + len(chunk)] = chunk
+            copied += len(chunk)
+            self.__position += len(chunk)
+        return copied
+
+    def close(self):
+        self.__blocks.clear()
+        super(RemoteFile, self).close()
+
+    def __get_block(self, index):
+        '''Get a block from the cache, fetching it with the following ones if missing'''
+        if index in self.__blocks:
+            block = self.__blocks.pop(index)
+            self.__blocks[index] = block
+            return block
+
+        if index == self.__next_block:
+            self.__window = min(self.__window * 2, self.__read_ahead)
+        else:
+            self.__window = 1
+        size = self.__reader.known_size
+        count = self.__window
+        if size is not None:
+            count = max(1, min(count, -(-size // self.__block_size) - index))
+        start = index * self.__block_size
+        content = self.__reader.fetch(start, start + count * self.__block_size)
+        for i in range(count):
+            self.__blocks[index + i] = content[i * self.__block_size:(i + 1) * self.__block_size]
+        self.__next_block = index + count
+        while len(self.__blocks) > self.__cache_blocks:
+            self.__blocks.popitem(last=False)
+        return self.__blocks[index]
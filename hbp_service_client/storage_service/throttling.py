@@ -0,0 +1,132 @@
+# pylint: disable=too-few-public-methods
+
+'''Bandwidth limits of the transfers of file contents'''
+
+import threading
+import time
+
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+
+# the transfers take their bytes from the buckets by slices of this size, in
+# turn, so that the concurrent transfers share the bandwidth fairly
+QUANTUM = 64 * 1024
+
+
+class BandwidthLimiter(object):
+    '''Limit the bandwidth of the transfers of file contents.
+
+    The bytes of the uploads and downloads are taken from a token bucket
+    refilled at `rate` bytes per second, shared by all the transfers, and from
+    a bucket of each transfer refilled at `per_transfer_rate`. The concurrent
+    transfers take their bytes by slices, in turn, so that each one gets a
+    fair share of the bandwidth. The rates can be changed while the transfers
+    run.
+
+        Example:
+            >>> from hbp_service_client.storage_service.throttling import BandwidthLimiter
+            >>> limiter = BandwidthLimiter(rate=10 * 1024 * 1024)
+            >>> storage_client = Client.new(my_access_token, bandwidth_limiter=limiter)
+            >>> storage_client.upload_file('my_file', '/my_project/my_file', 'text/plain')
+            >>> limiter.rate = 50 * 1024 * 1024  # e.g. at night
+    '''
+
+    def __init__(self, rate=None, per_transfer_rate=None, burst=QUANTUM):
+        '''
+        Args:
+            rate (float): The maximum bytes per second of all the transfers,
+                unlimited by default.
+            per_transfer_rate (float): The maximum bytes per second of each
+                transfer, unlimited by default.
+            burst (int): The maximum number of bytes transferred at once
+                after an idle period.
+
+        Raises:
+            StorageArgumentException: A rate is not positive
+        '''
+        self.__bucket = _TokenBucket(_validate_rate(rate), burst)
+        self.__per_transfer_rate = _validate_rate(per_transfer_rate)
+        self.__burst = burst
+
+    @property
+    def rate(self):
+        '''The maximum bytes per second of all the transfers, None if unlimited.'''
+        return self.__bucket.rate
+
+    @rate.setter
+    def rate(self, rate):
+        self.__bucket.rate = _validate_rate(rate)
+
+    @property
+    def per_transfer_rate(self):
+        '''The maximum bytes per second of each transfer, None if unlimited.'''
+        return self.__per_transfer_rate
+
+    @per_transfer_rate.setter
+    def per_transfer_rate(self, rate):
+        self.__per_transfer_rate = _validate_rate(rate)
+
+    def transfer(self):
+        '''Start a transfer.
+
+        Returns:
+            A function to be called with the number of bytes before they are
+            transferred, which waits until they fit in the bandwidth.
+        '''
+        bucket = _TokenBucket(self.__per_transfer_rate, self.__burst)
+
+        def acquire(count):
+            '''Wait until the bytes fit in the bandwidth'''
+            for start in range(0, count, QUANTUM):
+                size = min(QUANTUM, count - start)
+                bucket.rate = self.__per_transfer_rate
+                delay = max(bucket.reserve(size), self.__bucket.reserve(size))
+                if delay > 0:
+                    time.sleep(delay)
+        return acquire
+
+    def throttle(self, chunks):
+        '''Limit the bandwidth of a transfer by chunks.
+
+        Args:
+            chunks (iterable): The chunks of bytes of the transfer.
+
+        Returns:
+            A generator of the chunks, each one produced once it fits in the bandwidth.
+        '''
+        acquire = self.transfer()
+        for chunk in chunks:
+            acquire(len(chunk))
+            yield chunk
+
+
+def _validate_rate(rate):
+    '''Check that a rate is either unlimited or positive'''
+    if rate is not None and not rate > 0:
+        raise StorageArgumentException(
+            'The rate must be a positive number of bytes per second, or None if unlimited.')
+    return rate
+
+
+class _TokenBucket(object):
+    '''A bucket of bytes refilled at a given rate, which may go into debt'''
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.__burst = burst
+        self.__tokens = burst
+        self.__updated = time.time()
+        self.__lock = threading.Lock()
+
+    def reserve(self, count):
+        '''Take bytes from the bucket, returning the time to wait before using them'''
+        with self.__lock:
+            now = time.time()
+            rate = self.rate
+            if rate is None:
+                self.__tokens = self.__burst
+                self.__updated = now
+                return 0
+            self.__tokens = min(self.__burst, self.__tokens + (now - self.__updated) * rate)
+            self.__updated = now
+            self.__tokens -= count
+            return -self.__tokens / float(rate) if self.__tokens < 0 else 0
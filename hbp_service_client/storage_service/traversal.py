@@ -0,0 +1,93 @@
+'''Helpers to browse the entity tree of the storage service'''
+
+from hbp_service_client.storage_service.change_feed import parse_timestamp
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_WORKERS, map_concurrently)
+
+
+def iter_children(api_client, entity_uuid, **filters):
+    '''Iterate over all the pages of the children of a project or folder.
+
+    Args:
+        api_client: The storage_service.api.ApiClient to send the requests with.
+        entity_uuid (str): The UUID of the project or folder.
+        filters: Any filter supported by ApiClient.list_folder_content.
+
+    Returns:
+        A generator of the child entities, ordered by name. Each page is
+        parsed while it is received, so that the first children are yielded
+        before the whole page is.
+    '''
+
+    more_pages = True
+    page_number = 1
+    while more_pages:
+        page = api_client.stream_folder_content(
+            entity_uuid, page=page_number, ordering='name', **filters)
+        for child in page:
+            yield child
+        more_pages = page.fields.get('next') is not None
+        page_number += 1
+
+
+def iter_changes(api_client, entity_uuid, since=None, page_size=None):
+    '''Iterate over the children of a project or folder modified after a date.
+
+    The children are listed ordered by '-modified_on', and only the pages of
+    the children more recent than the date are requested.
+
+    Args:
+        api_client: The storage_service.api.ApiClient to send the requests with.
+        entity_uuid (str): The UUID of the project or folder.
+        since: The date as a datetime or an ISO 8601 string, e.g.
+            '2017-03-13T10:17:01Z'. All the children are iterated by default.
+        page_size (int): The number of children per page.
+
+    Returns:
+        A generator of the child entities, the most recently modified first.
+    '''
+
+    since = None if since is None else parse_timestamp(since)
+    page_number = 1
+    while True:
+        page = api_client.list_folder_content(
+            entity_uuid, page=page_number, page_size=page_size, ordering='-modified_on')
+        for child in page['results']:
+            if since is not None and parse_timestamp(child['modified_on']) <= since:
+                return
+            yield child
+        if page.get('next') is None:
+            return
+        page_number += 1
+
+
+def walk(api_client, path, entity_uuid, workers=DEFAULT_WORKERS, folders_only=False):
+    '''Recursively iterate over the entities under a project or folder.
+
+    The tree is crawled breadth first, listing all the folders of a level
+    concurrently.
+
+    Args:
+        api_client: The storage_service.api.ApiClient to send the requests with.
+        path (str): The path of the project or folder.
+        entity_uuid (str): The UUID of the project or folder.
+        workers (int): The maximum number of concurrent listings.
+        folders_only (bool): Only list and iterate over the folders.
+
+    Returns:
+        A generator of (path, entity) tuples for all the descendant entities.
+    '''
+
+    filters = {'entity_type': 'folder'} if folders_only else {}
+    level = [(path.rstrip('/'), entity_uuid)]
+    while level:
+        listings = map_concurrently(
+            lambda folder: list(iter_children(api_client, folder[1], **filters)), level, workers)
+        next_level = []
+        for (folder_path, _), children in zip(level, listings):
+            for child in children:
+                child_path = '{0}/{1}'.format(folder_path, child['name'])
+                yield (child_path, child)
+                if child['entity_type'] == 'folder':
+                    next_level.append((child_path, child['uuid']))
+        level = next_level
@@ -0,0 +1,190 @@
+'''A Zarr compatible store of the chunks of arrays in the storage service'''
+
+import logging
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # python 2
+    from collections import MutableMapping  # pylint: disable=deprecated-class
+
+from hbp_service_client.storage_service.concurrency import (
+    DEFAULT_WORKERS, map_concurrently)
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+from hbp_service_client.storage_service.traversal import walk
+
+L = logging.getLogger(__name__)
+
+
+class ZarrStore(MutableMapping):
+    '''A mapping of the keys of a Zarr hierarchy to the files under a folder.
+
+    The keys are the paths of the files relative to the folder, e.g.
+    'my_array/0.0', the nested folders being created as needed. The folder is
+    listed once and the UUID of the files are looked up in that listing, so
+    that reading a chunk costs a single request. `getitems`, `setitems` and
+    `delitems` transfer many chunks concurrently. Changes made to the folder
+    by other clients are only seen after `invalidate` is called.
+
+        Example:
+            >>> import zarr
+            >>> from hbp_service_client.storage_service.client import Client
+            >>> from hbp_service_client.storage_service.zarr_store import ZarrStore
+            >>> store = ZarrStore(Client.new(my_access_token), '/my_project/images.zarr')
+            >>> images = zarr.open(store, mode='r')
+    '''
+
+    CONTENT_TYPE = 'application/octet-stream'
+
+    def __init__(self, client, path, workers=DEFAULT_WORKERS):
+        '''
+        Args:
+            client: The storage_service.client.Client to access the folder with.
+            path (str): The path of an existing project or folder, e.g.
+                '/my_project/images.zarr'.
+            workers (int): The maximum number of concurrent requests.
+        '''
+        self.__api_client = client.api_client
+        self.__path = path.rstrip('/')
+        self.__workers = workers
+        self.__files = None
+        self.__folders = None
+
+    def invalidate(self):
+        '''Drop the listing of the folder, it is fetched again on the next access.'''
+        self.__files = None
+        self.__folders = None
+
+    def __getitem__(self, key):
+        file_uuid = self.__get_files()[self.__normalize(key)]
+        return self.__api_client.download_file_content(file_uuid)[1]
+
+    def __setitem__(self, key, value):
+        self.setitems({key: value})
+
+    def __delitem__(self, key):
+        key = self.__normalize(key)
+        self.__api_client.delete_file(self.__get_files()[key])
+        del self.__files[key]
+
+    def __contains__(self, key):
+        return self.__normalize(key) in self.__get_files()
+
+    def __iter__(self):
+        return iter(sorted(self.__get_files()))
+
+    def __len__(self):
+        return len(self.__get_files())
+
+    def listdir(self, path=''):
+        '''List the names of the files and folders directly under a key prefix.
+
+        Args:
+            path (str): The key prefix, the root of the store by default.
+
+        Returns:
+            The sorted list of the names of the children.
+        '''
+        prefix = self.__normalize(path) + '/' if path.strip('/') else ''
+        files = self.__get_files()
+        names = set()
+        for key in list(files) + list(self.__folders):
+            if key.startswith(prefix) and len(key) > len(prefix):
+                names.add(key[len(prefix):].split('/')[0])
+        return sorted(names)
+
+    def getitems(self, keys, contexts=None):  # pylint: disable=unused-argument
+        '''Download the content of many keys concurrently.
+
+        Args:
+            keys (iterable): The keys to be read.
+            contexts: Ignored, accepted for compatibility with Zarr.
+
+        Returns:
+            A dictionary of the content of the keys which exist.
+        '''
+        files = self.__get_files()
+        present = [key for key in keys if self.__normalize(key) in files]
+        contents = map_concurrently(self.__getitem__, present, self.__workers)
+        return dict(zip(present, contents))
+
+    def setitems(self, values):
+        '''Upload the content of many keys concurrently.
+
+        The missing folders are created first, then the files are created and
+        their contents uploaded concurrently.
+
+        Args:
+            values (dict): The bytes-like content of each key.
+
+        Returns:
+            None
+
+        Raises:
+            StorageArgumentException: Invalid arguments
+            StorageForbiddenException: Server response code 403
+            StorageException: other 400-600 error codes
+        '''
+        files = self.__get_files()
+        values = dict((self.__normalize(key), value) for key, value in values.items())
+        for folder in sorted(set(key.rpartition('/')[0] for key in values)):
+            self.__make_folder(folder)
+
+        def write(item):
+            '''Write the content of a key, creating its file if needed'''
+            key, value = item
+            value = memoryview(value).tobytes()
+            if key in files and not value:
+                # the service refuses empty uploads, an empty file is created instead
+                self.__api_client.delete_file(files.pop(key))
+            if key not in files:
+                folder, _, name = key.rpartition('/')
+                files[key] = self.__api_client.create_file(
+                    name, self.CONTENT_TYPE, self.__folders[folder])['uuid']
+            if value:
+                self.__api_client.upload_file_content(files[key], content=value)
+
+        map_concurrently(write, list(values.items()), self.__workers)
+
+    def delitems(self, keys):
+        '''Delete many keys concurrently, ignoring the missing ones.
+
+        Args:
+            keys (iterable): The keys to be deleted.
+
+        Returns:
+            None
+        '''
+        files = self.__get_files()
+        present = [self.__normalize(key) for key in keys if self.__normalize(key) in files]
+        map_concurrently(lambda key: self.__api_client.delete_file(files.pop(key)),
+                         present, self.__workers)
+
+    def __get_files(self):
+        '''Get the UUID of the files keyed by their key, listing the folder if needed'''
+        if self.__files is None:
+            root = self.__api_client.get_entity_by_query(path=self.__path)
+            files, folders = {}, {'': root['uuid']}
+            prefix_length = len(self.__path) + 1
+            for path, entity in walk(self.__api_client, self.__path, root['uuid'],
+                                     self.__workers):
+                entities = files if entity['entity_type'] == 'file' else folders
+                entities[path[prefix_length:]] = entity['uuid']
+            L.debug('Listed %s files under %s', len(files), self.__path)
+            self.__files, self.__folders = files, folders
+        return self.__files
+
+    def __make_folder(self, folder):
+        '''Create a folder of the store and its missing parents'''
+        if folder not in self.__folders:
+            parent, _, name = folder.rpartition('/')
+            self.__make_folder(parent)
+            self.__folders[folder] = self.__api_client.create_folder(
+                name, self.__folders[parent])['uuid']
+
+    @staticmethod
+    def __normalize(key):
+        '''Strip the slashes around a key, rejecting the empty ones'''
+        normalized = key.strip('/')
+        if not normalized or '//' in normalized:
+            raise StorageArgumentException('Invalid key: {0}'.format(key))
+        return normalized
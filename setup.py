@@ -29,6 +29,18 @@ config = {
     'version': hbp_service_client.__version__,
     'license': 'Apache License 2.0',
     'install_requires': REQS,
+    'extras_require': {
+        'fsspec': ['fsspec'],
+        'httpx': ['httpx'],
+        'numpy': ['numpy'],
+        'opentelemetry': ['opentelemetry-api'],
+        'orjson': ['orjson'],
+        'zstd': ['zstandard'],
+    },
+    'entry_points': {
+        'fsspec.specs': [
+            'hbpstorage=hbp_service_client.storage_service.filesystem.StorageFileSystem'],
+    },
     'packages': find_packages(exclude=['doc', '*tests*']),
     'scripts': [],
     'include_package_data': True
@@ -0,0 +1,171 @@
+'''Unit tests for hbp_service_client.request.circuit_breaker'''
+
+import mock
+import pytest
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.request.circuit_breaker import CircuitBreaker, endpoint_template
+from hbp_service_client.request.deadline import Deadline
+from hbp_service_client.request.request_builder import RequestBuilder
+from hbp_service_client.request.transport import Transport, TransportResponse
+from hbp_service_client.storage_service.exceptions import (
+    StorageCircuitOpenException, StorageTimeoutException)
+
+A_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01'
+
+
+class StatusTransport(Transport):
+    '''A transport answering with the given status codes'''
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.urls = []
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        self.urls.append(url)
+        return TransportResponse(self.statuses.pop(0), {}, [b''])
+
+
+def fail():
+    raise IOError('connection reset')
+
+
+class TestCircuitBreaker(object):
+
+    @pytest.mark.parametrize('endpoint, template', [
+        ('file/{0}/content/upload/'.format(A_UUID), 'file/{}/content/upload/'),
+        ('entity/?path=/my_project', 'entity/'),
+        ('project/12345/', 'project/{}/'),
+        ('/signed/' + 'a' * 40, '/signed/{}'),
+    ])
+    def test_endpoint_template_should_replace_the_variable_segments(self, endpoint, template):
+        assert_that(endpoint_template(endpoint), equal_to(template))
+
+    def test_call_should_open_the_circuit_after_the_failure_rate(self):
+        # given
+        breaker = CircuitBreaker(failure_rate=0.5, min_calls=4)
+        for function in [lambda: 'ok', fail, lambda: 'ok']:
+            try:
+                breaker.call('entity/', function)
+            except IOError:
+                pass
+        assert_that(breaker.states, equal_to({'entity/': 'closed'}))
+
+        # when
+        assert_that(calling(breaker.call).with_args('entity/', fail), raises(IOError))
+
+        # then
+        assert_that(breaker.states, equal_to({'entity/': 'open'}))
+        assert_that(calling(breaker.call).with_args('entity/', lambda: 'ok'),
+                    raises(StorageCircuitOpenException))
+        assert_that(breaker.call('folder/{}/', lambda: 'ok'), equal_to('ok'))
+
+    @mock.patch('hbp_service_client.request.circuit_breaker.time.time')
+    def test_call_should_probe_the_recovery_once_half_open(self, mock_time):
+        # given
+        mock_time.return_value = 100
+        breaker = CircuitBreaker(min_calls=1, open_duration=30)
+        assert_that(calling(breaker.call).with_args('entity/', fail), raises(IOError))
+
+        # when
+        mock_time.return_value = 131
+        assert_that(calling(breaker.call).with_args('entity/', fail), raises(IOError))
+        reopened = breaker.states['entity/']
+        mock_time.return_value = 162
+        result = breaker.call('entity/', lambda: 'ok')
+
+        # then
+        assert_that(reopened, equal_to('open'))
+        assert_that(result, equal_to('ok'))
+        assert_that(breaker.states, equal_to({'entity/': 'closed'}))
+
+    @mock.patch('hbp_service_client.request.circuit_breaker.time.time')
+    def test_call_should_let_a_single_probe_through(self, mock_time):
+        # given
+        mock_time.return_value = 100
+        breaker = CircuitBreaker(min_calls=1, open_duration=30)
+        assert_that(calling(breaker.call).with_args('entity/', fail), raises(IOError))
+        mock_time.return_value = 131
+
+        # when
+        concurrent = []
+
+        def probe():
+            try:
+                breaker.call('entity/', lambda: 'ok')
+            except StorageCircuitOpenException:
+                concurrent.append('rejected')
+            return 'probed'
+
+        # then
+        assert_that(breaker.call('entity/', probe), equal_to('probed'))
+        assert_that(concurrent, equal_to(['rejected']))
+
+    @mock.patch('hbp_service_client.request.circuit_breaker.time.time')
+    def test_call_should_count_the_slow_calls_as_failures(self, mock_time):
+        # given
+        mock_time.return_value = 100
+        breaker = CircuitBreaker(min_calls=1, slow_call_duration=2)
+
+        def slow():
+            mock_time.return_value = 105
+            return 'slow'
+
+        # when
+        result = breaker.call('entity/', slow)
+
+        # then
+        assert_that(result, equal_to('slow'))
+        assert_that(breaker.states, equal_to({'entity/': 'open'}))
+
+    def test_request_builder_should_fail_fast_on_server_errors(self):
+        # given
+        transport = StatusTransport([503, 404])
+        breaker = CircuitBreaker(min_calls=1)
+        request = RequestBuilder(transport=transport).with_circuit_breaker(breaker) \
+            .to_url('https://document/service/file/{0}/content/'.format(A_UUID))
+
+        # when
+        statuses = [request.get().status_code]
+
+        # then
+        assert_that(statuses, equal_to([503]))
+        assert_that(calling(request.get), raises(StorageCircuitOpenException))
+        assert_that(len(transport.urls), equal_to(1))
+        assert_that(breaker.states, equal_to({'/service/file/{}/content/': 'open'}))
+
+    @mock.patch('hbp_service_client.request.deadline.time.time')
+    def test_request_builder_should_not_count_the_exceeded_deadlines(self, mock_time):
+        # given
+        mock_time.return_value = 100
+        transport = StatusTransport([200])
+        breaker = CircuitBreaker(min_calls=1)
+        request = RequestBuilder(transport=transport).with_circuit_breaker(breaker) \
+            .to_url('https://document/service/entity/')
+        for _ in range(3):
+            with Deadline(1):
+                mock_time.return_value += 2
+                assert_that(calling(request.get), raises(StorageTimeoutException))
+
+        # when
+        response = request.get()
+
+        # then
+        assert_that(response.status_code, equal_to(200))
+        assert_that(len(transport.urls), equal_to(1))
+        assert_that(breaker.states, equal_to({'/service/entity/': 'closed'}))
+
+    def test_call_should_not_count_the_timeouts_before_sending(self):
+        # given
+        breaker = CircuitBreaker(min_calls=1)
+
+        def expired():
+            raise StorageTimeoutException('The deadline was exceeded by 0.001s')
+
+        # when
+        assert_that(calling(breaker.call).with_args('entity/', expired),
+                    raises(StorageTimeoutException))
+
+        # then
+        assert_that(breaker.states, equal_to({'entity/': 'closed'}))
@@ -0,0 +1,171 @@
+'''Unit tests for hbp_service_client.request.coalescing'''
+
+import threading
+import time
+from hamcrest import assert_that, calling, raises, equal_to, contains_inanyorder
+
+from hbp_service_client.request.coalescing import SingleFlight
+from hbp_service_client.request.deadline import Deadline
+from hbp_service_client.request.request_builder import RequestBuilder
+from hbp_service_client.request.transport import Transport, TransportResponse
+from hbp_service_client.storage_service.exceptions import StorageTimeoutException
+
+
+class BlockingTransport(Transport):
+    '''A transport answering once released'''
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.urls = []
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        self.urls.append(url)
+        self.released.wait()
+        return TransportResponse(
+            200, {'Content-Type': 'application/json'}, [b'{"url": "' + url.encode() + b'"}'])
+
+
+def wait_for(predicate):
+    deadline = time.time() + 5
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.001)
+
+
+def run_concurrently(function, count):
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = function()
+        except Exception as error:  # pylint: disable=broad-except
+            results[index] = error
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class TestSingleFlight(object):
+
+    def test_call_should_share_the_result_of_the_call_in_flight(self):
+        # given
+        single_flight = SingleFlight()
+        released = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(1)
+            released.wait()
+            return {'name': 'my_project'}
+
+        # when
+        threads, results = run_concurrently(lambda: single_flight.call('key', function), 4)
+        wait_for(lambda: single_flight.stats['coalesced'] == 3)
+        released.set()
+        for thread in threads:
+            thread.join()
+
+        # then
+        assert_that(len(calls), equal_to(1))
+        assert_that(results, equal_to([{'name': 'my_project'}] * 4))
+        assert_that(len(set(id(result) for result in results)), equal_to(4))
+        assert_that(single_flight.stats, equal_to({'sent': 1, 'coalesced': 3}))
+
+    def test_call_should_share_the_exception_of_the_call_in_flight(self):
+        # given
+        single_flight = SingleFlight()
+        released = threading.Event()
+
+        def function():
+            released.wait()
+            raise ValueError('failed')
+
+        # when
+        threads, results = run_concurrently(lambda: single_flight.call('key', function), 3)
+        wait_for(lambda: single_flight.stats['coalesced'] == 2)
+        released.set()
+        for thread in threads:
+            thread.join()
+
+        # then
+        assert_that([type(result) for result in results], equal_to([ValueError] * 3))
+
+    def test_call_should_wait_no_longer_than_the_deadline(self):
+        # given
+        single_flight = SingleFlight()
+        released = threading.Event()
+        threads, _ = run_concurrently(
+            lambda: single_flight.call('key', lambda: released.wait()), 1)
+        wait_for(lambda: single_flight.stats['sent'] == 1)
+
+        def call_within_a_deadline():
+            with Deadline(0.01):
+                return single_flight.call('key', lambda: 'result')
+
+        # then
+        try:
+            assert_that(calling(call_within_a_deadline), raises(StorageTimeoutException))
+        finally:
+            released.set()
+            threads[0].join()
+
+    def test_call_should_not_share_the_exceeded_deadline_of_the_call_in_flight(self):
+        # given
+        single_flight = SingleFlight()
+        released = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(1)
+            if len(calls) == 1:
+                released.wait()
+                raise StorageTimeoutException('The deadline was exceeded')
+            return 'result'
+
+        # when
+        threads, results = run_concurrently(lambda: single_flight.call('key', function), 2)
+        wait_for(lambda: single_flight.stats['coalesced'] == 1)
+        released.set()
+        for thread in threads:
+            thread.join()
+
+        # then
+        assert_that([type(result) for result in results], contains_inanyorder(
+            StorageTimeoutException, str))
+        assert_that(single_flight.stats, equal_to({'sent': 2, 'coalesced': 0}))
+
+    def test_call_should_not_coalesce_the_sequential_calls(self):
+        # given
+        single_flight = SingleFlight()
+
+        # when
+        results = [single_flight.call('key', lambda: 'result') for _ in range(2)]
+
+        # then
+        assert_that(results, equal_to(['result', 'result']))
+        assert_that(single_flight.stats, equal_to({'sent': 2, 'coalesced': 0}))
+
+    def test_request_builder_should_coalesce_the_identical_gets(self):
+        # given
+        transport = BlockingTransport()
+        single_flight = SingleFlight()
+        request = RequestBuilder(transport=transport).coalesce_with(single_flight).return_body()
+
+        # when
+        threads, results = run_concurrently(lambda: request.to_url('http://a.url/0').get(), 1)
+        wait_for(lambda: len(transport.urls) == 1)
+        threads += run_concurrently(lambda: request.to_url('http://a.url/0').get(), 3)[0]
+        threads += run_concurrently(lambda: request.to_url('http://a.url/1').get(), 1)[0]
+        threads += run_concurrently(
+            lambda: request.with_token('other').to_url('http://a.url/0').get(), 1)[0]
+        wait_for(lambda: single_flight.stats['coalesced'] == 3 and len(transport.urls) == 3)
+        transport.released.set()
+        for thread in threads:
+            thread.join()
+
+        # then
+        assert_that(results, equal_to([{'url': 'http://a.url/0'}]))
+        assert_that(transport.urls, contains_inanyorder(
+            'http://a.url/0', 'http://a.url/0', 'http://a.url/1'))
+        assert_that(single_flight.stats, equal_to({'sent': 3, 'coalesced': 3}))
@@ -0,0 +1,102 @@
+'''Unit tests for hbp_service_client.request.deadline'''
+
+import threading
+import mock
+from hamcrest import assert_that, calling, raises, equal_to, close_to
+
+from hbp_service_client.request.deadline import (
+    DEFAULT_TIMEOUT, Deadline, bind, remaining_time, request_timeout)
+from hbp_service_client.request.request_builder import RequestBuilder
+from hbp_service_client.request.transport import Transport, TransportResponse
+from hbp_service_client.storage_service.exceptions import StorageTimeoutException
+
+
+class RecordingTransport(Transport):
+    '''A transport recording the timeouts of the requests'''
+
+    def __init__(self):
+        self.timeouts = []
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        self.timeouts.append(timeout)
+        return TransportResponse(200, {}, [b''])
+
+
+class TestDeadline(object):
+
+    def test_request_timeout_should_default_to_the_client_timeout(self):
+        assert_that(request_timeout((3, 30)), equal_to((3, 30)))
+        assert_that(remaining_time(), equal_to(None))
+
+    def test_request_timeout_should_be_bounded_by_the_deadline(self):
+        with Deadline(5):
+            connect, read = request_timeout((3, 30))
+
+        assert_that(connect, equal_to(3))
+        assert_that(read, close_to(5, 0.5))
+
+    def test_request_timeout_should_be_bounded_without_client_timeout(self):
+        with Deadline(5):
+            connect, read = request_timeout(None)
+
+        assert_that((connect, read), equal_to((read, read)))
+        assert_that(read, close_to(5, 0.5))
+
+    def test_nested_deadlines_should_keep_the_earliest(self):
+        with Deadline(5):
+            with Deadline(60):
+                inner = remaining_time()
+            with Deadline(1):
+                earliest = remaining_time()
+            outer = remaining_time()
+
+        assert_that(inner, close_to(5, 0.5))
+        assert_that(earliest, close_to(1, 0.5))
+        assert_that(outer, close_to(5, 0.5))
+        assert_that(remaining_time(), equal_to(None))
+
+    def test_deadline_should_override_the_timeouts(self):
+        with Deadline(timeout=(1, 2)):
+            assert_that(request_timeout((3, 30)), equal_to((1, 2)))
+
+    @mock.patch('hbp_service_client.request.deadline.time.time')
+    def test_request_timeout_should_fail_once_the_deadline_is_exceeded(self, mock_time):
+        mock_time.return_value = 100
+        with Deadline(5) as deadline:
+            mock_time.return_value = 106
+
+            assert_that(deadline.remaining(), equal_to(-1))
+            assert_that(calling(request_timeout).with_args((3, 30)),
+                        raises(StorageTimeoutException))
+
+    def test_bind_should_propagate_the_deadline_to_other_threads(self):
+        remaining = []
+        with Deadline(5):
+            thread = threading.Thread(target=bind(lambda: remaining.append(remaining_time())))
+        thread.start()
+        thread.join()
+
+        assert_that(remaining[0], close_to(5, 0.5))
+
+    def test_request_builder_should_send_the_timeouts(self):
+        transport = RecordingTransport()
+        request = RequestBuilder(transport=transport).to_url('http://a.url/')
+
+        request.get()
+        request.with_timeout(None).get()
+        with Deadline(timeout=1):
+            request.get()
+
+        assert_that(transport.timeouts, equal_to([DEFAULT_TIMEOUT, None, 1]))
+
+    @mock.patch('hbp_service_client.request.deadline.time.time')
+    def test_request_builder_should_not_send_past_the_deadline(self, mock_time):
+        transport = RecordingTransport()
+        mock_time.return_value = 100
+        with Deadline(5):
+            mock_time.return_value = 105
+            assert_that(calling(RequestBuilder(transport=transport).to_url('http://a.url/').get),
+                        raises(StorageTimeoutException))
+
+        assert_that(transport.timeouts, equal_to([]))
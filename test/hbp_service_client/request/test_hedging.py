@@ -0,0 +1,138 @@
+'''Unit tests for hbp_service_client.request.hedging'''
+
+import threading
+import time
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.request.hedging import HedgingPolicy
+from hbp_service_client.request.request_builder import RequestBuilder
+from hbp_service_client.request.transport import Transport, TransportResponse
+
+
+class SlowFirstCall(object):
+    '''A function whose first call is blocked until released'''
+
+    def __init__(self, error=None):
+        self.released = threading.Event()
+        self.closed = threading.Event()
+        self.calls = 0
+        self.error = error
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls == 1:
+            self.released.wait(5)
+            return self
+        if self.error is not None:
+            raise self.error
+        return 'hedge'
+
+    def close(self):
+        self.closed.set()
+
+
+class CountingTransport(Transport):
+    '''A transport answering immediately'''
+
+    def __init__(self):
+        self.count = 0
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        self.count += 1
+        return TransportResponse(200, {}, [b'response'])
+
+
+class TestHedgingPolicy(object):
+
+    def test_call_should_not_hedge_the_fast_calls(self):
+        # given
+        hedging = HedgingPolicy(max_extra_load=1, initial_delay=5)
+
+        # when
+        result = hedging.call(lambda: 'result')
+
+        # then
+        assert_that(result, equal_to('result'))
+        assert_that(hedging.stats, equal_to(
+            {'requests': 1, 'hedged': 0, 'wins': 0, 'hedge_rate': 0.0}))
+
+    def test_call_should_use_the_duplicate_of_a_slow_call(self):
+        # given
+        hedging = HedgingPolicy(max_extra_load=1, initial_delay=0.01)
+        function = SlowFirstCall()
+
+        # when
+        result = hedging.call(function)
+        function.released.set()
+
+        # then
+        assert_that(result, equal_to('hedge'))
+        assert_that(hedging.stats, equal_to(
+            {'requests': 1, 'hedged': 1, 'wins': 1, 'hedge_rate': 1.0}))
+        assert_that(function.closed.wait(5), equal_to(True))
+
+    def test_call_should_wait_for_the_slow_call_when_the_duplicate_fails(self):
+        # given
+        hedging = HedgingPolicy(max_extra_load=1, initial_delay=0.01)
+        function = SlowFirstCall(error=ValueError('failed'))
+        threading.Timer(0.1, function.released.set).start()
+
+        # when
+        result = hedging.call(function)
+
+        # then
+        assert_that(result, equal_to(function))
+        assert_that(hedging.stats['wins'], equal_to(0))
+
+    def test_call_should_raise_the_error_of_both_calls(self):
+        # given
+        hedging = HedgingPolicy(max_extra_load=1, initial_delay=0.01)
+
+        def function():
+            time.sleep(0.05)
+            raise ValueError('failed')
+
+        # then
+        assert_that(calling(hedging.call).with_args(function), raises(ValueError))
+
+    def test_call_should_cap_the_extra_load(self):
+        # given
+        hedging = HedgingPolicy(max_extra_load=0.5, initial_delay=0.01)
+        function = SlowFirstCall()
+        threading.Timer(0.1, function.released.set).start()
+
+        # when
+        result = hedging.call(function)
+
+        # then
+        assert_that(result, equal_to(function))
+        assert_that(function.calls, equal_to(1))
+        assert_that(hedging.stats['hedged'], equal_to(0))
+
+    def test_delay_should_follow_the_percentile_of_the_latencies(self):
+        # given
+        hedging = HedgingPolicy(percentile=50, min_delay=0, initial_delay=3)
+        initial_delay = hedging.delay()
+
+        # when
+        for _ in range(HedgingPolicy.MIN_SAMPLES):
+            hedging.call(lambda: None)
+
+        # then
+        assert_that(initial_delay, equal_to(3))
+        assert_that(hedging.delay() < 1, equal_to(True))
+
+    def test_request_builder_should_not_hedge_the_streamed_requests(self):
+        # given
+        transport = CountingTransport()
+        hedging = HedgingPolicy(max_extra_load=1, initial_delay=5)
+        request = RequestBuilder(transport=transport).hedge_with(hedging).to_url('http://a.url/')
+
+        # when
+        request.return_body().get()
+        request.stream_response().get()
+
+        # then
+        assert_that(transport.count, equal_to(2))
+        assert_that(hedging.stats['requests'], equal_to(1))
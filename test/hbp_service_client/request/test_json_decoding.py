@@ -0,0 +1,87 @@
+'''Unit tests for hbp_service_client.request.json_decoding'''
+
+import json
+import pytest
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.request import json_decoding
+from hbp_service_client.request.json_decoding import StreamedPage, loads
+
+PAGE = {
+    'count': 3,
+    'next': 'https://document/service/folder/1/children/?page=2',
+    'previous': None,
+    'results': [{'name': u'caf\xe9', 'size': 12345},
+                {'name': 'b', 'tags': [1, 2.5, True, None, {'x': '}]'}]},
+                {'name': 'c'}],
+}
+
+
+def split(content, size):
+    return [content[start:start + size] for start in range(0, len(content), size)]
+
+
+class TestJsonDecoding(object):
+
+    def test_loads_should_decode_utf8_documents(self):
+        assert_that(loads(json.dumps(PAGE).encode('utf-8')), equal_to(PAGE))
+
+    def test_loads_should_fall_back_on_the_standard_library(self, monkeypatch):
+        monkeypatch.setattr(json_decoding, 'orjson', None)
+        assert_that(loads(json.dumps(PAGE).encode('utf-8')), equal_to(PAGE))
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 7, 1024])
+    def test_streamed_page_should_yield_the_results_of_any_chunks(self, chunk_size):
+        # given
+        content = json.dumps(PAGE, indent=2, ensure_ascii=False).encode('utf-8')
+        page = StreamedPage(split(content, chunk_size))
+
+        # when
+        results = list(page)
+
+        # then
+        assert_that(results, equal_to(PAGE['results']))
+        assert_that(page.fields, equal_to({key: value for key, value in PAGE.items()
+                                           if key != 'results'}))
+
+    def test_streamed_page_should_yield_before_the_page_is_received(self):
+        # given
+        received = []
+
+        def chunks():
+            for chunk in split(json.dumps(PAGE).encode('utf-8'), 10):
+                received.append(chunk)
+                yield chunk
+        page = iter(StreamedPage(chunks()))
+
+        # when
+        first = next(page)
+
+        # then
+        assert_that(first, equal_to(PAGE['results'][0]))
+        assert_that(len(b''.join(received)) < len(json.dumps(PAGE)), equal_to(True))
+
+    def test_streamed_page_should_keep_the_fields_after_the_results(self):
+        # given
+        page = StreamedPage([b'{"results": [], "next": 12', b'34}'])
+
+        # when
+        results = list(page)
+
+        # then
+        assert_that((results, page.fields), equal_to(([], {'next': 1234})))
+
+    def test_streamed_page_should_close_the_response(self):
+        # given
+        closed = []
+        page = StreamedPage([b'{"results": [1, 2]}'], close=lambda: closed.append(True))
+
+        # when
+        list(page)
+
+        # then
+        assert_that(closed, equal_to([True]))
+
+    @pytest.mark.parametrize('content', [b'[1, 2]', b'{"results": [1 2]}', b'{"results": [1, '])
+    def test_streamed_page_should_reject_invalid_documents(self, content):
+        assert_that(calling(list).with_args(StreamedPage([content])), raises(ValueError))
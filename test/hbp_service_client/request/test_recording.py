@@ -0,0 +1,164 @@
+'''Unit tests for hbp_service_client.request.recording'''
+
+import json
+
+import httpretty
+import mock
+import pytest
+from hamcrest import assert_that, equal_to, has_entries, has_length, is_not, contains_string
+
+from hbp_service_client.request.recording import (
+    RecordingTransport, load_trace, replay, scrub_path, scrub_params)
+from hbp_service_client.request.transport import WsgiTransport
+from hbp_service_client.storage_service.api import ApiClient
+
+A_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01'
+A_TOKEN = 'f' * 40
+A_BODY = json.dumps({'uuid': A_UUID, 'name': 'my_file'}).encode('utf-8')
+
+
+def fake_service(environ, start_response):
+    '''A WSGI application standing in for the storage service'''
+    environ['wsgi.input'].read(int(environ['CONTENT_LENGTH'] or 0))
+    if environ['PATH_INFO'].startswith('/fail/'):
+        start_response('503 Service Unavailable', [])
+        return [b'']
+    start_response('200 OK', [('Content-Type', 'application/json'),
+                              ('Content-Length', str(len(A_BODY))), ('ETag', '"etag"')])
+    return [A_BODY]
+
+
+class TestRecording(object):
+
+    def setup_method(self):
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, 'https://collab.humanbrainproject.eu/services.json',
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+
+    @staticmethod
+    def teardown_method():
+        httpretty.disable()
+        httpretty.reset()
+
+    def test_scrub_path_should_replace_the_tokens_but_not_the_uuids(self):
+        assert_that(
+            scrub_path('/file/{0}/content/{1}/'.format(A_UUID, A_TOKEN)),
+            equal_to('/file/{0}/content/{{token}}/'.format(A_UUID)))
+
+    def test_scrub_params_should_replace_the_sensitive_values(self):
+        assert_that(
+            scrub_params({'path': '/my_project', 'access_token': 'secret'}),
+            equal_to({'path': '/my_project', 'access_token': '{token}'}))
+
+    def test_recording_transport_should_record_the_requests_without_credentials(self, tmpdir):
+        # given
+        path = str(tmpdir.join('trace.jsonl'))
+        recorder = RecordingTransport(path, WsgiTransport(fake_service))
+        api_client = ApiClient.new('my-access-token', transport=recorder)
+
+        # when
+        api_client.get_file_details(A_UUID)
+        api_client.upload_file_content(A_UUID, content='some content')
+        recorder.close()
+
+        # then
+        with open(path) as trace:
+            assert_that(trace.read(), is_not(contains_string('my-access-token')))
+        records = load_trace(path)
+        assert_that(records, has_length(2))
+        assert_that(records[0], has_entries({
+            'method': 'GET',
+            'endpoint': '/service/file/{}/',
+            'path': '/service/file/{0}/'.format(A_UUID),
+            'status': 200,
+            'request_size': 0,
+            'response_size': len(A_BODY),
+        }))
+        assert_that(records[1], has_entries({
+            'method': 'POST',
+            'endpoint': '/service/file/{}/content/upload/',
+            'request_size': len('some content'),
+        }))
+        assert_that(records[1]['t'] >= records[0]['t'], equal_to(True))
+
+    @pytest.mark.parametrize('transport', ['wsgi', 'requests'])
+    def test_recording_transport_should_count_the_streamed_bodies(self, tmpdir, transport):
+        # given
+        httpretty.register_uri(httpretty.POST, 'https://service/upload/', body='')
+        path = str(tmpdir.join('trace.jsonl'))
+        recorder = RecordingTransport(
+            path, WsgiTransport(fake_service) if transport == 'wsgi' else None)
+        local_file = tmpdir.join('data.bin')
+        local_file.write_binary(b'#' * 1000)
+
+        # when
+        with open(str(local_file), 'rb') as source:
+            recorder.send('POST', 'https://service/upload/', body=source)
+        recorder.send('POST', 'https://service/upload/', body=iter([b'#' * 10, b'#' * 20]))
+        recorder.close()
+
+        # then
+        assert_that([record['request_size'] for record in load_trace(path)],
+                    equal_to([1000, 30]))
+
+    def test_recording_transport_should_compress_a_gz_trace(self, tmpdir):
+        # given
+        path = str(tmpdir.join('trace.jsonl.gz'))
+        recorder = RecordingTransport(path, WsgiTransport(fake_service))
+
+        # when
+        recorder.send('GET', 'https://service/entity/', params={'path': '/my_project'})
+        recorder.close()
+
+        # then
+        with open(path, 'rb') as trace:
+            assert_that(trace.read(2), equal_to(b'\x1f\x8b'))
+        assert_that(load_trace(path), equal_to([mock.ANY]))
+        assert_that(load_trace(path)[0]['params'], equal_to({'path': '/my_project'}))
+
+    def test_replay_should_report_the_latencies_of_each_endpoint(self, tmpdir):
+        # given
+        path = str(tmpdir.join('trace.jsonl'))
+        with open(path, 'w') as trace:
+            for index in range(10):
+                trace.write(json.dumps({
+                    't': index * 0.5, 'method': 'POST', 'params': {},
+                    'path': '/file/{0}/content/upload/'.format(A_UUID),
+                    'endpoint': '/file/{}/content/upload/', 'request_size': 100}) + '\n')
+            trace.write(json.dumps({
+                't': 5.0, 'method': 'GET', 'params': {},
+                'path': '/fail/', 'endpoint': '/fail/'}) + '\n')
+
+        # when
+        with mock.patch('hbp_service_client.request.recording.time.sleep') as sleep:
+            report = replay(path, 'http://localhost', WsgiTransport(fake_service), speed=None)
+
+        # then
+        sleep.assert_not_called()
+        assert_that(report['*'], has_entries({'count': 11, 'errors': 1}))
+        assert_that(report['/file/{}/content/upload/'], has_entries({'count': 10, 'errors': 0}))
+        assert_that(report['/fail/'], has_entries({'count': 1, 'errors': 1}))
+        stats = report['*']
+        assert_that(stats['p50'] <= stats['p90'] <= stats['p99'] <= stats['max'],
+                    equal_to(True))
+
+    def test_replay_should_keep_the_accelerated_pace_of_the_trace(self, tmpdir):
+        # given
+        path = str(tmpdir.join('trace.jsonl'))
+        with open(path, 'w') as trace:
+            for index in range(3):
+                trace.write(json.dumps({
+                    't': index * 2.0, 'method': 'GET', 'params': {},
+                    'path': '/entity/', 'endpoint': '/entity/'}) + '\n')
+
+        # when
+        with mock.patch('hbp_service_client.request.recording.time.sleep') as sleep:
+            replay(path, 'http://localhost', WsgiTransport(fake_service), speed=10)
+
+        # then
+        delays = [call[0][0] for call in sleep.call_args_list]
+        assert_that(delays, has_length(2))
+        assert_that(0.1 < delays[0] <= 0.2 and 0.3 < delays[1] <= 0.4, equal_to(True))
@@ -0,0 +1,99 @@
+'''Unit tests for hbp_service_client.request.tracing'''
+
+import pytest
+from hamcrest import assert_that, equal_to, has_entries
+
+from hbp_service_client.request import tracing
+from hbp_service_client.request.request_builder import RequestBuilder
+from hbp_service_client.request.transport import Transport, TransportResponse
+from hbp_service_client.storage_service.concurrency import map_concurrently
+
+
+class StaticTransport(Transport):
+    '''A transport answering with an empty json object'''
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        return TransportResponse(
+            200, {'Content-Type': 'application/json', 'Content-Length': '2'}, [b'{}'])
+
+
+class Operations(object):
+    '''Traced operations sending requests'''
+
+    request = RequestBuilder(transport=StaticTransport()).return_body()
+
+    @tracing.traced
+    def lookup(self, uuid):
+        return self.request.to_url('https://document/service/entity/{0}/'.format(uuid)).get()
+
+    @tracing.traced
+    def lookup_all(self, uuids):
+        return map_concurrently(self.lookup, uuids, workers=2)
+
+    @tracing.traced
+    def iter_lookups(self, uuids):
+        for uuid in uuids:
+            yield self.lookup(uuid)
+
+
+@pytest.fixture(name='exporter', scope='module')
+def fixture_exporter():
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return exporter
+
+
+class TestTracing(object):
+
+    def test_traced_methods_should_work_without_spans(self, monkeypatch):
+        monkeypatch.setattr(tracing, 'trace', None)
+        operations = Operations()
+
+        assert_that(operations.lookup('1'), equal_to({}))
+        assert_that(list(operations.iter_lookups(['1', '2'])), equal_to([{}, {}]))
+        assert_that(operations.lookup_all(['1', '2']), equal_to([{}, {}]))
+
+    def test_requests_should_be_children_of_the_operation(self, exporter):
+        # given
+        exporter.clear()
+
+        # when
+        Operations().lookup_all(['1', '2', '3'])
+
+        # then
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        parent = spans['Client.lookup_all']
+        lookups = [span for span in exporter.get_finished_spans() if span.name == 'Client.lookup']
+        requests = [span for span in exporter.get_finished_spans()
+                    if span.name == 'GET /service/entity/{}/']
+        assert_that(len(lookups), equal_to(3))
+        assert_that(set(span.parent.span_id for span in lookups),
+                    equal_to({parent.context.span_id}))
+        assert_that(set(span.parent.span_id for span in requests),
+                    equal_to(set(span.context.span_id for span in lookups)))
+        assert_that(dict(requests[0].attributes), has_entries({
+            'http.request.method': 'GET',
+            'http.route': '/service/entity/{}/',
+            'http.response.status_code': 200,
+            'http.response.body.size': 2}))
+
+    def test_generator_span_should_cover_the_iteration(self, exporter):
+        # given
+        exporter.clear()
+
+        # when
+        list(Operations().iter_lookups(['1', '2']))
+
+        # then
+        spans = exporter.get_finished_spans()
+        parent = [span for span in spans if span.name == 'Client.iter_lookups'][0]
+        assert_that([span.parent.span_id for span in spans if span.name == 'Client.lookup'],
+                    equal_to([parent.context.span_id] * 2))
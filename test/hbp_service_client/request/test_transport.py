@@ -0,0 +1,188 @@
+'''Unit tests for hbp_service_client.request.transport'''
+
+import json
+import pytest
+import httpretty
+from hamcrest import assert_that, calling, equal_to, has_entries, raises
+
+from hbp_service_client.request.request_builder import RequestBuilder
+from hbp_service_client.request.transport import (
+    Transport, RequestsTransport, WsgiTransport, TransportResponse)
+from hbp_service_client.storage_service.api import ApiClient
+
+
+def fake_service(environ, start_response):
+    '''A WSGI application echoing the requests'''
+    body = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH'] or 0))
+    echo = {
+        'method': environ['REQUEST_METHOD'],
+        'path': environ['PATH_INFO'],
+        'query': environ['QUERY_STRING'],
+        'authorization': environ.get('HTTP_AUTHORIZATION'),
+        'content_type': environ.get('CONTENT_TYPE'),
+        'body': body.decode('utf-8'),
+    }
+    start_response('200 OK', [('Content-Type', 'application/json'), ('ETag', '"etag"')])
+    return [json.dumps(echo).encode('utf-8')]
+
+
+class RecordingTransport(Transport):
+    '''A transport recording the requests'''
+
+    def __init__(self):
+        self.requests = []
+
+    def send(self, method, url, headers=None, params=None, body=None, json_body=None,
+             stream=False, timeout=None):
+        self.requests.append((method, url, params))
+        return TransportResponse(200, {'Content-Type': 'text/plain'}, [b'recorded'])
+
+
+class TestTransport(object):
+
+    def setup_method(self):
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, 'https://collab.humanbrainproject.eu/services.json',
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+
+    @staticmethod
+    def teardown_method():
+        httpretty.disable()
+        httpretty.reset()
+
+    def test_request_builder_should_send_with_the_given_transport(self):
+        # given
+        transport = RecordingTransport()
+
+        # when
+        body = RequestBuilder.request(transport=transport) \
+            .to_service('document', 'v1') \
+            .to_endpoint('entity/') \
+            .with_params({'path': '/my_project'}) \
+            .return_body() \
+            .get()
+
+        # then
+        assert_that(body, equal_to('recorded'))
+        assert_that(transport.requests, equal_to(
+            [('GET', 'https://document/service/entity/', {'path': '/my_project'})]))
+
+    def test_requests_transport_should_reuse_its_session(self):
+        # given
+        httpretty.register_uri(httpretty.GET, 'http://a.url/', body='response')
+        transport = RequestsTransport()
+        request = RequestBuilder.request(transport=transport).to_url('http://a.url/')
+
+        # when
+        responses = [request.get().text, request.get().text]
+
+        # then
+        assert_that(responses, equal_to(['response', 'response']))
+        transport.close()
+
+    def test_api_client_should_call_a_wsgi_application(self):
+        # given
+        api_client = ApiClient.new('access_token', transport=WsgiTransport(fake_service))
+
+        # when
+        echo = api_client.get_entity_by_query(path='/my_project')
+
+        # then
+        assert_that(echo, has_entries({
+            'method': 'GET', 'path': '/service/entity/', 'query': 'path=%2Fmy_project',
+            'authorization': 'Bearer access_token'}))
+
+    def test_wsgi_transport_should_send_the_bodies(self):
+        # given
+        transport = WsgiTransport(fake_service)
+
+        # when
+        json_echo = transport.send('POST', 'http://a.url/?a=1', params={'b': 2},
+                                   json_body={'name': 'file'}).json()
+        chunked_echo = transport.send('PUT', 'http://a.url/', body=iter([b'a', b'b'])).json()
+
+        # then
+        assert_that(json_echo, has_entries({
+            'query': 'a=1&b=2', 'content_type': 'application/json',
+            'body': '{"name": "file"}'}))
+        assert_that(chunked_echo['body'], equal_to('ab'))
+
+    def test_wsgi_transport_should_stream_the_generator_applications(self):
+        # given
+        def generator_service(environ, start_response):
+            '''A WSGI application starting the response on its first iteration'''
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            yield b'abc'
+            yield b'def'
+
+        # when
+        response = WsgiTransport(generator_service).send('GET', 'http://a.url/', stream=True)
+
+        # then
+        assert_that(response.status_code, equal_to(200))
+        assert_that(b''.join(response.iter_content(chunk_size=2)), equal_to(b'abcdef'))
+
+    @pytest.mark.parametrize('stream', [False, True])
+    def test_wsgi_transport_should_fail_when_the_response_is_not_started(self, stream):
+        # given
+        closed = []
+
+        class UnstartedResult(object):
+            '''The result of a WSGI application which does not start the response'''
+
+            def __iter__(self):
+                return iter([b'abc'])
+
+            @staticmethod
+            def close():
+                closed.append(True)
+
+        transport = WsgiTransport(lambda environ, start_response: UnstartedResult())
+
+        # then
+        assert_that(
+            calling(transport.send).with_args('GET', 'http://a.url/', stream=stream),
+            raises(RuntimeError, 'did not call start_response'))
+        assert_that(closed, equal_to([True]))
+
+    def test_transport_response_should_be_streamed(self):
+        # given
+        response = TransportResponse(200, [('etag', '"etag"')], iter([b'abc', b'def', b'g']))
+
+        # when
+        chunks = list(response.iter_content(chunk_size=2))
+
+        # then
+        assert_that(response.headers['ETag'], equal_to('"etag"'))
+        assert_that(response.ok, equal_to(True))
+        assert_that(b''.join(chunks), equal_to(b'abcdefg'))
+        assert_that(max(len(chunk) for chunk in chunks), equal_to(2))
+
+    def test_transport_response_raw_should_read_into_buffers(self):
+        # given
+        response = TransportResponse(206, {}, [b'abc', b'defg'])
+        buffer = bytearray(5)
+
+        # when
+        count = response.raw.readinto(buffer)
+        count += response.raw.readinto(memoryview(buffer)[count:])
+
+        # then
+        assert_that((count, bytes(buffer)), equal_to((5, b'abcde')))
+        assert_that(response.raw.read(), equal_to(b'fg'))
+
+    def test_httpx_transport_should_wrap_the_responses(self):
+        httpx = pytest.importorskip('httpx')
+        from hbp_service_client.request.transport import HttpxTransport
+        # given
+        transport = HttpxTransport(client=httpx.Client(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=b'content', headers={'ETag': 'e'}))))
+
+        # when
+        response = transport.send('GET', 'http://a.url/', stream=True)
+
+        # then
+        assert_that((response.headers['etag'], response.content), equal_to(('e', b'content')))
@@ -0,0 +1,90 @@
+'''A fake storage service serving a tree of entities to the unit tests'''
+
+import json
+import re
+import httpretty
+
+try:
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:  # python 2
+    from urlparse import parse_qs, urlsplit
+
+PROJECT = {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a00', 'entity_type': 'project',
+           'name': 'my_project', 'modified_on': '2017-03-10T12:50:06Z'}
+FOLDER = {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01', 'entity_type': 'folder',
+          'name': 'data', 'parent': PROJECT['uuid'], 'modified_on': '2017-03-10T12:50:06Z'}
+FILE_1 = {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a02', 'entity_type': 'file',
+          'name': 'a.nwb', 'parent': FOLDER['uuid'], 'modified_on': '2017-03-10T12:50:06Z'}
+FILE_2 = {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a03', 'entity_type': 'file',
+          'name': 'b.nwb', 'parent': FOLDER['uuid'], 'modified_on': '2017-03-10T12:50:06Z'}
+SUBFOLDER = {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a04', 'entity_type': 'folder',
+             'name': 'raw', 'parent': FOLDER['uuid'], 'modified_on': '2017-04-10T12:50:06Z'}
+
+# httpretty does not support concurrent requests
+WORKERS = 1
+
+
+class FakeTreeService(object):
+    '''Fake the lookups of the entities and the listings of the folders of a tree.
+
+    The children are filtered by entity type, ordered and paginated as by the
+    service. The entities and the children may be changed during a test.
+    '''
+
+    def __init__(self, entities, children, page_size=100):
+        '''
+        Args:
+            entities (dict): The entities returned by the lookups, by path.
+            children (dict): The list of the children of the folders, by UUID.
+            page_size (int): The size of the pages when none is requested.
+        '''
+        self.entities = entities
+        self.children = children
+        self.page_size = page_size
+
+    def start(self):
+        '''Enable httpretty, and fake the service locator and the tree'''
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, 'https://collab.humanbrainproject.eu/services.json',
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/entity/$'),
+            body=self.get_entity, content_type='application/json')
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/folder/[^/]+/children/'),
+            body=self.list_children, content_type='application/json')
+
+    @staticmethod
+    def stop():
+        '''Disable httpretty'''
+        httpretty.disable()
+        httpretty.reset()
+
+    def get_entity(self, request, uri, headers):
+        '''Get an entity by its path'''
+        entity = self.entities.get(request.querystring['path'][0])
+        return (200, headers, json.dumps(entity)) if entity else (404, headers, '')
+
+    def list_children(self, request, uri, headers):
+        '''List the children of a folder, filtered, ordered and paginated as the service'''
+        url = urlsplit(uri)
+        params = parse_qs(url.query)
+        children = [child for child in self.children.get(url.path.split('/')[-3], [])
+                    if child['entity_type'] in params.get('entity_type', ['file', 'folder'])]
+        ordering = params.get('ordering', ['name'])[0]
+        children = sorted(children, key=lambda child: child[ordering.lstrip('-')],
+                          reverse=ordering.startswith('-'))
+        page = int(params.get('page', [1])[0])
+        page_size = int(params.get('page_size', [self.page_size])[0])
+        return (200, headers, json.dumps({
+            'count': len(children),
+            'next': 'next' if page * page_size < len(children) else None,
+            'results': children[(page - 1) * page_size:page * page_size]}))
+
+    @staticmethod
+    def listings():
+        '''Get the sent requests listing the children of a folder'''
+        return [req for req in httpretty.HTTPretty.latest_requests if '/children/' in req.path]
@@ -653,6 +653,27 @@ class TestApiClient(object):
             equal_to({'ordering': ['name']})  # folder_id excluded!
         )
 
+    def test_stream_folder_content_iterates_over_the_results(self):
+        page = {"count": 2, "next": None, "results": [{"name": "a"}, {"name": "b"}]}
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://document/service/folder/{}/children/?ordering=name'.format(self.a_uuid),
+            body=json.dumps(page),
+            content_type="application/json",
+            match_querystring=True
+        )
+
+        streamed = self.client.stream_folder_content(self.a_uuid, ordering='name')
+
+        assert_that(list(streamed), equal_to(page['results']))
+        assert_that(streamed.fields, equal_to({'count': 2, 'next': None}))
+
+    def test_stream_folder_content_verifies_uuids(self):
+        assert_that(
+            calling(self.client.stream_folder_content).with_args('1'),
+            raises(StorageArgumentException)
+        )
+
     #
     # delete folder
     #
@@ -941,6 +962,37 @@ class TestApiClient(object):
             instance_of(tuple)
         )
 
+    def test_iter_file_content_verifies_uuids(self):
+        assert_that(
+            calling(self.client.iter_file_content).with_args('1'),
+            raises(StorageArgumentException)
+        )
+
+    def test_iter_file_content_streams_the_chunks(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://document/service/file/{}/content/'.format(self.a_uuid),
+            adding_headers={'ETag':'some_etag'},
+            body='#' * 2500
+        )
+
+        etag, chunks = self.client.iter_file_content(self.a_uuid, chunk_size=1000)
+
+        assert_that(etag, equal_to('some_etag'))
+        assert_that([len(chunk) for chunk in chunks], equal_to([1000, 1000, 500]))
+
+    def test_iter_file_content_returns_none_if_not_modified(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://document/service/file/{}/content/'.format(self.a_uuid),
+            status=304,
+        )
+
+        assert_that(
+            self.client.iter_file_content(self.a_uuid, etag='some_etag'),
+            equal_to((None, None))
+        )
+
     def test_download_file_content_requires_etag_in_response(self):
         httpretty.register_uri(
             httpretty.GET,
@@ -1025,3 +1077,24 @@ class TestApiClient(object):
             calling(self.client.delete_file).with_args('1'),
             raises(StorageArgumentException)
         )
+
+    #
+    # download_signed_url
+    #
+
+    def test_download_signed_url_requests_the_byte_range(self):
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url',
+            body='cont', status=206
+        )
+
+        response = self.client.download_signed_url('/signed/url', byte_range=(10, 14))
+
+        assert_that(response.content, equal_to(b'cont'))
+        assert_that(httpretty.last_request().headers['Range'], equal_to('bytes=10-13'))
+
+    def test_download_signed_url_verifies_the_byte_range(self):
+        assert_that(
+            calling(self.client.download_signed_url).with_args('/signed/url', byte_range=(4, 4)),
+            raises(StorageArgumentException)
+        )
@@ -0,0 +1,165 @@
+'''Unit tests for hbp_service_client.storage_service.arrays'''
+
+import io
+import json
+import re
+import pytest
+import httpretty
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+
+numpy = pytest.importorskip('numpy')
+arrays = pytest.importorskip('hbp_service_client.storage_service.arrays')
+
+FILE_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01'
+PARENT_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a00'
+
+
+def npy_bytes(array):
+    output = io.BytesIO()
+    numpy.save(output, array)
+    return output.getvalue()
+
+
+def dechunk(body):
+    chunks = []
+    while body:
+        size, body = body.split(b'\r\n', 1)
+        if int(size, 16) == 0:
+            break
+        chunks.append(body[:int(size, 16)])
+        body = body[int(size, 16) + 2:]
+    return chunks
+
+
+class TestArrays(object):
+
+    def setup_method(self):
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, 'https://collab.humanbrainproject.eu/services.json',
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+        self.content = b''
+        self.ranges = []
+        self.uploads = []
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/entity/$'),
+            body=lambda request, uri, headers: (200, headers, json.dumps(
+                {'uuid': FILE_UUID if request.querystring['path'][0].endswith('.npy')
+                         or request.querystring['path'][0].endswith('.raw') else PARENT_UUID,
+                 'entity_type': 'file'})),
+            content_type='application/json')
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://document/service/file/{}/content/secure_link/'.format(FILE_UUID),
+            body=json.dumps({'signed_url': '/signed/url'}), content_type='application/json')
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url', body=self.content_callback)
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/', status=201,
+            body=json.dumps({'uuid': FILE_UUID}), content_type='application/json')
+        httpretty.register_uri(
+            httpretty.POST,
+            'https://document/service/file/{}/content/upload/'.format(FILE_UUID),
+            body=lambda request, uri, headers: (
+                self.uploads.append(request.body) or (201, dict(headers, ETag='"etag"'), '')))
+        self.client = Client.new('access_token')
+
+    @staticmethod
+    def teardown_method():
+        httpretty.disable()
+        httpretty.reset()
+
+    def content_callback(self, request, uri, headers):
+        start, end = [int(offset) for offset in re.match(
+            r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()]
+        self.ranges.append((start, end + 1))
+        end = min(end, len(self.content) - 1)
+        headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, end, len(self.content))
+        return (206, headers, self.content[start:end + 1])
+
+    @pytest.mark.parametrize('order', ['C', 'F'])
+    def test_load_array_should_read_npy_files(self, order):
+        # given
+        expected = numpy.asarray(numpy.arange(60, dtype='>i4').reshape(3, 4, 5), order=order)
+        self.content = npy_bytes(expected)
+
+        # when
+        array = arrays.load_array(self.client, '/my_project/volume.npy', workers=1)
+
+        # then
+        assert_that(array.dtype, equal_to(expected.dtype))
+        assert_that(array.flags.f_contiguous, equal_to(order == 'F'))
+        assert_that(array.tolist(), equal_to(expected.tolist()))
+
+    def test_load_array_should_fill_the_array_by_ranges(self, monkeypatch):
+        # given
+        monkeypatch.setattr(arrays, 'RANGE_SIZE', 1000)
+        expected = numpy.arange(1000, dtype='<f8')
+        self.content = npy_bytes(expected)
+        offset = len(self.content) - expected.nbytes
+
+        # when
+        array = arrays.load_array(self.client, '/my_project/volume.npy', workers=1)
+
+        # then
+        assert_that(array.tolist(), equal_to(expected.tolist()))
+        assert_that(self.ranges[1:], equal_to(
+            [(offset + start, offset + min(start + 1000, 8000))
+             for start in range(0, 8000, 1000)]))
+
+    def test_load_array_should_read_raw_files(self):
+        # given
+        expected = numpy.arange(24, dtype='<u2').reshape(2, 3, 4)
+        self.content = expected.tobytes()
+
+        # when
+        array = arrays.load_array(self.client, '/my_project/volume.raw', '<u2', (2, 3, 4),
+                                  workers=1)
+
+        # then
+        assert_that(array.tolist(), equal_to(expected.tolist()))
+
+    def test_load_array_should_check_the_size_of_raw_files(self):
+        # given
+        self.content = b'\x00' * 10
+
+        # then
+        assert_that(
+            calling(arrays.load_array).with_args(
+                self.client, '/my_project/volume.raw', '<u2', (2, 3), workers=1),
+            raises(StorageArgumentException))
+
+    def test_load_array_should_reject_other_files(self):
+        # given
+        self.content = b'not an array'
+
+        # then
+        assert_that(
+            calling(arrays.load_array).with_args(self.client, '/my_project/volume.npy'),
+            raises(StorageArgumentException))
+
+    def test_save_array_should_upload_a_npy_file(self):
+        # given
+        array = numpy.arange(12, dtype='<i8').reshape(3, 4).T
+
+        # when
+        new_file = arrays.save_array(self.client, '/my_project/volume.npy', array)
+
+        # then
+        assert_that(new_file['etag'], equal_to('"etag"'))
+        assert_that(b''.join(dechunk(self.uploads[0])), equal_to(npy_bytes(array)))
+
+    def test_save_array_should_upload_the_raw_buffer(self):
+        # given
+        array = numpy.arange(12, dtype='<i8')
+
+        # when
+        arrays.save_array(self.client, '/my_project/volume.raw', array[::2], raw=True)
+
+        # then
+        assert_that(b''.join(dechunk(self.uploads[0])), equal_to(array[::2].tobytes()))
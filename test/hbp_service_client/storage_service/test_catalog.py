@@ -0,0 +1,156 @@
+'''Unit tests for hbp_service_client.storage_service.catalog'''
+
+import httpretty
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.storage_service.catalog import Catalog
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.exceptions import (
+    StorageArgumentException, StorageNotFoundException)
+
+from . import fake_tree
+from .fake_tree import PROJECT, FOLDER, SUBFOLDER, WORKERS, FakeTreeService
+
+FILE_1 = dict(fake_tree.FILE_1, etag='"etag_a"')
+FILE_2 = dict(fake_tree.FILE_2, modified_on='2017-03-11T12:50:06Z', etag='"etag_b"')
+FILE_3 = {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a05', 'entity_type': 'file',
+          'name': 'c.nwb', 'parent': SUBFOLDER['uuid'], 'modified_on': '2017-04-10T12:50:06Z'}
+
+
+class TestCatalog(object):
+
+    def setup_method(self):
+        self.children = {PROJECT['uuid']: [FOLDER], FOLDER['uuid']: [FILE_1, FILE_2]}
+        self.service = FakeTreeService({'/my_project': PROJECT}, self.children)
+        self.service.start()
+        self.catalog = Catalog(Client.new('access_token'), '/my_project', workers=WORKERS)
+
+    def teardown_method(self):
+        self.catalog.close()
+        self.service.stop()
+
+    def test_build_should_snapshot_the_tree_of_the_project(self):
+        assert_that(self.catalog.build(), equal_to(4))
+        assert_that(self.catalog.list('/my_project'), equal_to(['/data']))
+        assert_that(self.catalog.list('/my_project/data/'), equal_to(['a.nwb', 'b.nwb']))
+
+    def test_lookups_should_not_send_requests(self):
+        # given
+        self.catalog.build()
+        httpretty.HTTPretty.latest_requests[:] = []
+
+        # when
+        entity = self.catalog.get_entity('/my_project/data/b.nwb')
+        exists = self.catalog.exists('/my_project/data/c.nwb')
+        parent = self.catalog.get_parent('/my_project/data/a.nwb')
+
+        # then
+        assert_that(entity, equal_to(FILE_2))
+        assert_that(exists, equal_to(False))
+        assert_that(parent['uuid'], equal_to(FOLDER['uuid']))
+        assert_that(httpretty.HTTPretty.latest_requests, equal_to([]))
+
+    def test_get_entity_should_reject_the_paths_of_other_projects(self):
+        self.catalog.build()
+        assert_that(calling(self.catalog.get_entity).with_args('/other_project/data'),
+                    raises(StorageNotFoundException))
+        assert_that(calling(self.catalog.get_entity).with_args('data'),
+                    raises(StorageArgumentException))
+
+    def test_list_should_reject_files(self):
+        self.catalog.build()
+        assert_that(calling(self.catalog.list).with_args('/my_project/data/a.nwb'),
+                    raises(StorageArgumentException))
+
+    def test_refresh_should_build_the_catalog_first(self):
+        assert_that(self.catalog.refresh(), equal_to(4))
+        assert_that(self.catalog.exists('/my_project/data/a.nwb'), equal_to(True))
+
+    def test_refresh_should_only_fetch_the_recently_modified_children(self):
+        # given
+        self.catalog.build()
+        self.catalog.REFRESH_PAGE_SIZE = 1
+        modified = dict(FILE_2, modified_on='2017-04-10T12:50:06Z', etag='"etag_b2"')
+        self.children[FOLDER['uuid']] = [FILE_1, modified]
+        httpretty.HTTPretty.latest_requests[:] = []
+
+        # when
+        refreshed = self.catalog.refresh()
+
+        # then
+        assert_that(refreshed, equal_to(1))
+        assert_that(self.catalog.get_entity('/my_project/data/b.nwb')['etag'],
+                    equal_to('"etag_b2"'))
+        # a page of the project, and two of the folder until a known child
+        assert_that(len(self.service.listings()), equal_to(3))
+
+    def test_refresh_should_compare_the_dates_regardless_of_their_precision(self):
+        # given
+        self.catalog.build()
+        modified = dict(FILE_2, modified_on='2017-03-11T12:50:06.500000Z', etag='"etag_b2"')
+        self.children[FOLDER['uuid']] = [FILE_1, modified]
+
+        # when
+        refreshed = self.catalog.refresh()
+
+        # then
+        assert_that(refreshed, equal_to(1))
+        assert_that(self.catalog.get_entity('/my_project/data/b.nwb')['etag'],
+                    equal_to('"etag_b2"'))
+
+    def test_refresh_without_changes_should_not_modify_the_catalog(self):
+        self.catalog.build()
+        assert_that(self.catalog.refresh(), equal_to(0))
+
+    def test_refresh_should_remove_the_deleted_entities(self):
+        # given
+        self.catalog.build()
+        self.children[FOLDER['uuid']] = [FILE_2]
+
+        # when
+        self.catalog.refresh()
+
+        # then
+        assert_that(self.catalog.list('/my_project/data'), equal_to(['b.nwb']))
+
+    def test_refresh_should_crawl_the_new_folders(self):
+        # given
+        self.catalog.build()
+        self.children[FOLDER['uuid']] = [FILE_1, FILE_2, SUBFOLDER]
+        self.children[SUBFOLDER['uuid']] = [FILE_3]
+
+        # when
+        refreshed = self.catalog.refresh()
+
+        # then
+        assert_that(refreshed, equal_to(2))
+        assert_that(self.catalog.list('/my_project/data'), equal_to(['a.nwb', 'b.nwb', '/raw']))
+        assert_that(self.catalog.get_entity('/my_project/data/raw/c.nwb')['uuid'],
+                    equal_to(FILE_3['uuid']))
+
+    def test_refresh_should_follow_the_renamed_folders(self):
+        # given
+        self.catalog.build()
+        self.children[PROJECT['uuid']] = [
+            dict(FOLDER, name='renamed', modified_on='2017-05-10T12:50:06Z')]
+
+        # when
+        self.catalog.refresh()
+
+        # then
+        assert_that(self.catalog.exists('/my_project/data/a.nwb'), equal_to(False))
+        assert_that(self.catalog.exists('/my_project/renamed/a.nwb'), equal_to(True))
+
+    def test_the_catalog_should_persist_in_the_database(self, tmpdir):
+        # given
+        database = str(tmpdir.join('catalog.db'))
+        catalog = Catalog(Client.new('access_token'), '/my_project', database, workers=WORKERS)
+        catalog.build()
+        catalog.close()
+
+        # when
+        reopened = Catalog(Client.new('access_token'), '/my_project', database, workers=WORKERS)
+
+        # then
+        assert_that(reopened.list('/my_project/data'), equal_to(['a.nwb', 'b.nwb']))
+        reopened.close()
@@ -0,0 +1,172 @@
+'''Unit tests for hbp_service_client.storage_service.change_feed'''
+
+import zlib
+from datetime import datetime, timedelta, tzinfo
+
+import pytest
+from hamcrest import assert_that, calling, raises, equal_to, less_than
+
+from hbp_service_client.storage_service.change_feed import ChangeCursor, parse_timestamp
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+
+from . import fake_tree
+from .fake_tree import PROJECT, WORKERS, FakeTreeService
+
+# the folders are older than all their children
+FOLDER = dict(fake_tree.FOLDER, modified_on='2017-03-01T00:00:00Z')
+SUBFOLDER = dict(fake_tree.SUBFOLDER, modified_on='2017-03-01T00:00:00Z')
+
+
+def a_file(name, modified_on):
+    number = zlib.crc32(name.encode('utf-8')) & 0xffffffff
+    return {'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-{0:012d}'.format(number),
+            'entity_type': 'file', 'name': name, 'modified_on': modified_on}
+
+
+class UTC2(tzinfo):
+    '''A time zone 2 hours ahead of UTC'''
+
+    def utcoffset(self, dt):
+        return timedelta(hours=2)
+
+    def dst(self, dt):
+        return timedelta(0)
+
+
+class TestParseTimestamp(object):
+
+    @pytest.mark.parametrize('timestamp, expected', [
+        ('2017-03-13T10:17:01.688632Z', datetime(2017, 3, 13, 10, 17, 1, 688632)),
+        ('2017-03-13T10:17:01Z', datetime(2017, 3, 13, 10, 17, 1)),
+        ('2017-03-13T10:17:01+00:00', datetime(2017, 3, 13, 10, 17, 1)),
+        (datetime(2017, 3, 13, 12, 17, 1, tzinfo=UTC2()), datetime(2017, 3, 13, 10, 17, 1)),
+    ])
+    def test_parse_timestamp_should_return_naive_utc_dates(self, timestamp, expected):
+        assert_that(parse_timestamp(timestamp), equal_to(expected))
+
+    def test_parse_timestamp_should_reject_invalid_dates(self):
+        assert_that(calling(parse_timestamp).with_args('yesterday'),
+                    raises(StorageArgumentException))
+
+
+class TestChangeCursor(object):
+
+    def test_advance_should_only_move_forward(self):
+        # given
+        cursor = ChangeCursor()
+        cursor.advance('folder', '2017-03-13T10:17:01.5Z')
+
+        # when
+        cursor.advance('folder', '2017-03-13T10:17:01Z')
+
+        # then
+        assert_that(cursor.position('folder'), equal_to('2017-03-13T10:17:01.5Z'))
+
+    def test_save_should_persist_the_positions(self, tmpdir):
+        # given
+        path = str(tmpdir.join('cursor.json'))
+        cursor = ChangeCursor(path)
+        cursor.advance('folder', '2017-03-13T10:17:01Z')
+
+        # when
+        cursor.save()
+
+        # then
+        assert_that(ChangeCursor(path).position('folder'), equal_to('2017-03-13T10:17:01Z'))
+        assert_that(tmpdir.listdir(), equal_to([tmpdir.join('cursor.json')]))
+
+
+class TestChangesSince(object):
+
+    def setup_method(self):
+        self.children = {
+            PROJECT['uuid']: [FOLDER],
+            FOLDER['uuid']: [SUBFOLDER] + [
+                a_file('file_{0}'.format(day), '2017-03-{0:02d}T12:00:00Z'.format(day))
+                for day in range(1, 11)],
+            SUBFOLDER['uuid']: [a_file('deep', '2017-03-20T12:00:00Z')],
+        }
+        self.service = FakeTreeService(
+            {'/my_project': PROJECT, '/my_project/data': FOLDER}, self.children, page_size=3)
+        self.service.start()
+        self.client = Client.new('access_token')
+
+    def teardown_method(self):
+        self.service.stop()
+
+    def test_changes_since_should_stop_at_the_watermark(self):
+        # when
+        changes = list(self.client.changes_since(
+            '/my_project/data', '2017-03-08T00:00:00Z', workers=WORKERS))
+
+        # then
+        assert_that([path for (path, _) in changes], equal_to(
+            ['/my_project/data/file_10', '/my_project/data/file_9', '/my_project/data/file_8']))
+        # the first page of three children is enough
+        assert_that(len(self.service.listings()), equal_to(2))
+
+    def test_changes_since_should_read_the_pages_until_the_watermark(self):
+        # when
+        changes = list(self.client.changes_since(
+            '/my_project/data', '2017-03-03T00:00:00Z', workers=WORKERS))
+
+        # then
+        assert_that(len(changes), equal_to(8))
+        assert_that(len(self.service.listings()), equal_to(3))
+
+    def test_changes_since_should_find_the_changes_of_the_subfolders(self):
+        # when
+        changes = list(self.client.changes_since(
+            '/my_project', '2017-03-09T00:00:00Z', recursive=True, workers=WORKERS))
+
+        # then
+        assert_that([path for (path, _) in changes], equal_to([
+            '/my_project/data/file_10', '/my_project/data/file_9',
+            '/my_project/data/raw/deep']))
+        # the subfolders are found by listing only the folders
+        assert_that(
+            [req.querystring.get('entity_type') for req in self.service.listings()][:3],
+            equal_to([['folder'], ['folder'], ['folder']]))
+
+    def test_changes_since_should_yield_the_changes_of_a_folder_once_listed(self):
+        # when
+        changes = self.client.changes_since(
+            '/my_project', '2017-03-09T00:00:00Z', recursive=True, workers=WORKERS)
+        next(changes)
+        listed = len(self.service.listings())
+        list(changes)
+
+        # then
+        assert_that(listed, less_than(len(self.service.listings())))
+
+    def test_changes_since_should_resume_from_the_cursor(self, tmpdir):
+        # given
+        path = str(tmpdir.join('cursor.json'))
+        list(self.client.changes_since('/my_project/data', '2017-03-09T00:00:00Z',
+                                       cursor=ChangeCursor(path), workers=WORKERS))
+        self.children[FOLDER['uuid']].append(a_file('new', '2017-03-15T12:00:00Z'))
+
+        # when
+        changes = list(self.client.changes_since(
+            '/my_project/data', '2017-03-09T00:00:00Z', cursor=ChangeCursor(path), workers=WORKERS))
+
+        # then
+        assert_that([path for (path, _) in changes], equal_to(['/my_project/data/new']))
+
+    def test_changes_since_should_not_save_the_cursor_of_an_interrupted_iteration(self, tmpdir):
+        # given
+        cursor = ChangeCursor(str(tmpdir.join('cursor.json')))
+
+        # when
+        next(self.client.changes_since('/my_project/data', cursor=cursor, workers=WORKERS))
+
+        # then
+        assert_that(cursor.position(FOLDER['uuid']), equal_to(None))
+        assert_that(tmpdir.listdir(), equal_to([]))
+
+    def test_changes_since_should_reject_files(self):
+        self.service.entities['/my_project/file_1'] = a_file('file_1', '2017-03-01T12:00:00Z')
+        assert_that(
+            calling(lambda: list(self.client.changes_since('/my_project/file_1', workers=WORKERS))),
+            raises(StorageArgumentException))
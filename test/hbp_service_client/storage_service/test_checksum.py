@@ -0,0 +1,73 @@
+'''Unit tests for hbp_service_client.storage_service.checksum'''
+
+import hashlib
+import threading
+import pytest
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.storage_service.checksum import StreamingChecksum, md5_from_etag
+from hbp_service_client.storage_service.exceptions import StorageChecksumException
+
+CHUNKS = [b'#' * 4096, b'@' * 10, b'!' * 70000]
+DIGEST = hashlib.md5(b''.join(CHUNKS)).hexdigest()
+
+
+class TestChecksum(object):
+
+    @pytest.mark.parametrize('etag, digest', [
+        ('"71E1ED9EE52E565A56AEC66BC648A32C"', '71e1ed9ee52e565a56aec66bc648a32c'),
+        ('71e1ed9ee52e565a56aec66bc648a32c', '71e1ed9ee52e565a56aec66bc648a32c'),
+        ('W/"71e1ed9ee52e565a56aec66bc648a32c"', None),
+        ('"71e1ed9ee52e565a56aec66bc648a32c-2"', None),
+        (None, None)])
+    def test_md5_from_etag_should_only_accept_md5_digests(self, etag, digest):
+        assert_that(md5_from_etag(etag), equal_to(digest))
+
+    @pytest.mark.parametrize('threaded', [False, True])
+    def test_wrap_should_hash_the_chunks_while_passing_them(self, threaded):
+        # given
+        checksum = StreamingChecksum(threaded=threaded)
+
+        # when
+        chunks = list(checksum.wrap(iter(CHUNKS)))
+
+        # then
+        assert_that(chunks, equal_to(CHUNKS))
+        assert_that(checksum.hexdigest(), equal_to(DIGEST))
+
+    def test_unconsumed_checksums_should_not_start_threads(self):
+        # given
+        threads = threading.active_count()
+
+        # when
+        checksums = [StreamingChecksum(threaded=True) for _ in range(5)]
+        wrapped = [checksum.wrap(iter(CHUNKS)) for checksum in checksums]
+
+        # then
+        assert_that(threading.active_count(), equal_to(threads))
+        assert_that(len(wrapped), equal_to(5))
+
+    def test_verify_should_accept_the_matching_etag(self):
+        # given
+        checksum = StreamingChecksum()
+        list(checksum.wrap(iter(CHUNKS)))
+
+        # then
+        assert_that(checksum.verify('"{0}"'.format(DIGEST), 'my_file'), equal_to(True))
+
+    def test_verify_should_raise_on_mismatch(self):
+        # given
+        checksum = StreamingChecksum(threaded=True)
+        list(checksum.wrap(iter(CHUNKS[:-1])))
+
+        # then
+        assert_that(calling(checksum.verify).with_args('"{0}"'.format(DIGEST), 'my_file'),
+                    raises(StorageChecksumException))
+
+    def test_verify_should_skip_etags_which_are_not_digests(self):
+        # given
+        checksum = StreamingChecksum()
+        list(checksum.wrap(iter(CHUNKS)))
+
+        # then
+        assert_that(checksum.verify('some_etag', 'my_file'), equal_to(False))
@@ -1,16 +1,26 @@
 '''Unit tests for hbp_service_client.storage_service.client'''
 
+import gzip
+import hashlib
+import io
 import json
+import os
 import re
+import zlib
+import uuid
 import pytest
 import mock
 import httpretty
-from hamcrest import (assert_that, calling, raises, equal_to, has_properties)
+import requests
+from hamcrest import (
+    assert_that, calling, raises, equal_to, has_entry, has_properties, instance_of,
+    less_than)
 
 
 from hbp_service_client.storage_service.client import Client
 from hbp_service_client.storage_service.exceptions import (
-    StorageNotFoundException, StorageArgumentException)
+    StorageNotFoundException, StorageArgumentException, StorageChecksumException)
+from hbp_service_client.storage_service.throttling import BandwidthLimiter
 
 class TestClient(object):
     __BAD_PATHS = [123, 'foo', '', '/']
@@ -237,6 +247,244 @@ class TestClient(object):
         file_handle.write.assert_has_calls(
             [mock.call(b'#'*1024), mock.call(b'#'*1024)])
 
+    def test_download_file_should_decompress_the_content_if_asked(self, tmpdir):
+        # given
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fpath%2Fto%2Ffile',
+            returns={'entity_type': 'file', 'uuid': file_uuid}
+        )
+        self.register_uri(
+            'https://document/service/file/{}/metadata/'.format(file_uuid),
+            returns={'compression': 'gzip'}
+        )
+        self.register_uri(
+            'https://document/service/file/{}/content/secure_link/'.format(file_uuid),
+            returns={'signed_url':'/signed/url/to/the/file'}
+        )
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url/to/the/file',
+            body=gzip_compress(b'a,b\n' * 1000)
+        )
+        target = tmpdir.join('target.csv')
+
+        # when
+        self.client.download_file('/path/to/file', str(target), decompress=True)
+
+        # then
+        assert_that(target.read_binary(), equal_to(b'a,b\n' * 1000))
+
+    @mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+    def test_download_file_should_download_again_on_checksum_mismatch(self, mock_sleep, tmpdir):
+        # given
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fpath%2Fto%2Ffile',
+            returns={'entity_type': 'file', 'uuid': file_uuid}
+        )
+        self.register_uri(
+            'https://document/service/file/{}/content/secure_link/'.format(file_uuid),
+            returns={'signed_url':'/signed/url/to/the/file'}
+        )
+        etag = '"{0}"'.format(hashlib.md5(b'some content').hexdigest())
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url/to/the/file',
+            responses=[
+                httpretty.Response(body='some c0ntent', adding_headers={'ETag': etag}),
+                httpretty.Response(body='some content', adding_headers={'ETag': etag})]
+        )
+        target = tmpdir.join('target.file')
+
+        # when
+        self.client.download_file('/path/to/file', str(target), verify_checksum=True)
+
+        # then
+        assert_that(target.read_binary(), equal_to(b'some content'))
+        assert_that(mock_sleep.call_count, equal_to(1))
+
+    @mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+    def test_download_file_should_raise_on_repeated_checksum_mismatch(self, _, tmpdir):
+        # given
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fpath%2Fto%2Ffile',
+            returns={'entity_type': 'file', 'uuid': file_uuid}
+        )
+        self.register_uri(
+            'https://document/service/file/{}/content/secure_link/'.format(file_uuid),
+            returns={'signed_url':'/signed/url/to/the/file'}
+        )
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url/to/the/file',
+            body='some c0ntent',
+            adding_headers={'ETag': '"{0}"'.format(hashlib.md5(b'some content').hexdigest())}
+        )
+
+        # then
+        assert_that(
+            calling(self.client.download_file).with_args(
+                '/path/to/file', str(tmpdir.join('target.file')), verify_checksum=True),
+            raises(StorageChecksumException))
+
+    #
+    # download_bytes / download_into
+    #
+
+    def register_file_content(self, content):
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fpath%2Fto%2Ffile',
+            returns={'entity_type': 'file', 'uuid': file_uuid}
+        )
+        self.register_uri(
+            'https://document/service/file/{}/content/secure_link/'.format(file_uuid),
+            returns={'signed_url':'/signed/url/to/the/file'}
+        )
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url/to/the/file', body=content)
+
+    @pytest.mark.parametrize('path', __BAD_PATHS)
+    def test_download_bytes_validates_path(self, path):
+        assert_that(
+            calling(self.client.download_bytes).with_args(path),
+            raises(StorageArgumentException))
+
+    def test_download_bytes_should_return_the_content(self):
+        # given
+        self.register_file_content(b'#' * 5000)
+
+        # when
+        content = self.client.download_bytes('/path/to/file')
+
+        # then
+        assert_that(content, equal_to(bytearray(b'#' * 5000)))
+
+    def register_encoded_file_content(self, content):
+        self.register_file_content(b'')
+        encoded = io.BytesIO()
+        with gzip.GzipFile(fileobj=encoded, mode='wb') as gzip_file:
+            gzip_file.write(content)
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url/to/the/file',
+            body=encoded.getvalue(), adding_headers={
+                'Content-Encoding': 'gzip', 'Content-Length': str(len(encoded.getvalue()))})
+
+    def test_download_bytes_should_decode_the_encoded_content(self):
+        # given
+        self.register_encoded_file_content(b'#' * 5000)
+
+        # when
+        content = self.client.download_bytes('/path/to/file')
+
+        # then
+        assert_that(content, equal_to(bytearray(b'#' * 5000)))
+
+    def test_download_into_should_fill_the_buffer_in_place(self):
+        # given
+        self.register_file_content(b'some content')
+        buffer = bytearray(20)
+
+        # when
+        size = self.client.download_into('/path/to/file', memoryview(buffer)[4:])
+
+        # then
+        assert_that(size, equal_to(12))
+        assert_that(bytes(buffer[4:16]), equal_to(b'some content'))
+
+    def test_download_into_should_fill_numpy_arrays(self):
+        numpy = pytest.importorskip('numpy')
+
+        # given
+        expected = numpy.arange(100, dtype='<u4')
+        self.register_file_content(expected.tobytes())
+        array = numpy.zeros(100, dtype='<u4')
+
+        # when
+        self.client.download_into('/path/to/file', array)
+
+        # then
+        assert_that(array.tolist(), equal_to(expected.tolist()))
+
+    def test_download_into_should_decode_the_encoded_content(self):
+        # given
+        # the random content is longer once encoded
+        content = os.urandom(5000)
+        self.register_encoded_file_content(content)
+        buffer = bytearray(5000)
+
+        # when
+        size = self.client.download_into('/path/to/file', buffer)
+
+        # then
+        assert_that((size, bytes(buffer)), equal_to((5000, content)))
+
+    def test_download_into_should_reject_too_small_buffers(self):
+        # given
+        self.register_file_content(b'some content')
+
+        # then
+        assert_that(
+            calling(self.client.download_into).with_args('/path/to/file', bytearray(4)),
+            raises(StorageArgumentException))
+
+    def test_download_into_should_reject_read_only_buffers(self):
+        assert_that(
+            calling(self.client.download_into).with_args('/path/to/file', b'read only'),
+            raises(StorageArgumentException))
+
+    #
+    # open
+    #
+
+    @pytest.mark.parametrize('path', __BAD_PATHS)
+    def test_open_validates_path(self, path):
+        assert_that(
+            calling(self.client.open).with_args(path),
+            raises(StorageArgumentException))
+
+    def test_open_only_accepts_the_read_binary_mode(self):
+        assert_that(
+            calling(self.client.open).with_args('/my_project/file', mode='wb'),
+            raises(StorageArgumentException))
+
+    def test_open_checks_entity_is_a_file(self):
+        # given
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fpath%2Fto%2Fsomething',
+            returns={'entity_type': 'folder', 'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'}
+        )
+
+        # then
+        assert_that(
+            calling(self.client.open).with_args('/path/to/something'),
+            raises(StorageArgumentException)
+        )
+
+    def test_open_should_read_ranges_of_the_file_content(self):
+        # given
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fpath%2Fto%2Ffile',
+            returns={'entity_type': 'file', 'uuid': file_uuid}
+        )
+        self.register_uri(
+            'https://document/service/file/{}/content/secure_link/'.format(file_uuid),
+            returns={'signed_url': '/signed/url'}
+        )
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/signed/url',
+            body='efgh', status=206, adding_headers={'Content-Range': 'bytes 4-7/10'}
+        )
+
+        # when
+        with self.client.open('/path/to/file', block_size=4, read_ahead=1) as remote:
+            remote.seek(4)
+            content = remote.read(4)
+
+        # then
+        assert_that(content, equal_to(b'efgh'))
+        assert_that(httpretty.last_request().headers['Range'], equal_to('bytes=4-7'))
+
 
     #
     # exists
@@ -290,6 +538,76 @@ class TestClient(object):
         assert_that(exists, equal_to(True))
 
 
+    #
+    # exists_many / stat_many
+    #
+
+    def test_stat_many_validates_the_paths(self):
+        assert_that(
+            calling(self.client.stat_many).with_args(['/my_project/file', 'foo']),
+            raises(StorageArgumentException))
+
+    def test_stat_many_should_return_the_entities_in_order(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        entities = self.client.stat_many([
+            '/my_project/data/notes.txt', '/my_project', '/my_project/data/missing',
+            '/my_project/readme.txt/child', '/my_project/nothing/child', '/other_project'],
+            workers=1)
+
+        # then
+        assert_that(list(entities), equal_to([
+            '/my_project/data/notes.txt', '/my_project', '/my_project/data/missing',
+            '/my_project/readme.txt/child', '/my_project/nothing/child', '/other_project']))
+        assert_that(entities['/my_project/data/notes.txt'],
+                    has_entry('uuid', 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a05'))
+        assert_that(entities['/my_project'], has_entry('uuid', PROJECT_UUID))
+        assert_that([path for path, entity in entities.items() if entity is None], equal_to([
+            '/my_project/data/missing', '/my_project/readme.txt/child',
+            '/my_project/nothing/child', '/other_project']))
+
+    def test_stat_many_should_query_few_children_by_name(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        self.client.stat_many(['/my_project/data/a.nwb', '/my_project/data/deep'], workers=1)
+
+        # then
+        listings = [request.querystring for request in httpretty.HTTPretty.latest_requests
+                    if request.path.split('?')[0].endswith('/children/')]
+        assert_that(sorted(query['name'][0] for query in listings),
+                    equal_to(['a.nwb', 'deep']))
+
+    def test_stat_many_should_list_the_parent_once_for_many_children(self):
+        # given
+        register_tree(PROJECT_TREE)
+        paths = ['/my_project/data/{0}'.format(i) for i in range(10)] + ['/my_project/data/a.nwb']
+
+        # when
+        entities = self.client.stat_many(paths, workers=1)
+
+        # then
+        listings = [request for request in httpretty.HTTPretty.latest_requests
+                    if request.path.split('?')[0].endswith('/children/')]
+        assert_that(len(listings), equal_to(1))
+        assert_that([path for path, entity in entities.items() if entity],
+                    equal_to(['/my_project/data/a.nwb']))
+
+    def test_exists_many_should_return_booleans(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        exists = self.client.exists_many(
+            ['/my_project/readme.txt', '/my_project/data/missing'], workers=1)
+
+        # then
+        assert_that(exists, equal_to(
+            {'/my_project/readme.txt': True, '/my_project/data/missing': False}))
+
     #
     # get_parents
     #
@@ -584,6 +902,205 @@ class TestClient(object):
             equal_to('content of the local file')
         )
 
+    def test_upload_file_should_reject_unknown_compressions(self):
+        assert_that(
+            calling(self.client.upload_file).with_args(
+                'local/file', '/dest/parent/file', None, compression='rar'),
+            raises(StorageArgumentException))
+
+    def test_upload_file_should_compress_the_content_and_record_the_codec(self, tmpdir):
+        # given
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fdest%2Fparent',
+            returns={'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'}
+        )
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a1256'
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/',
+            status=201, body=json.dumps({'uuid': file_uuid}), content_type='application/json'
+        )
+        uploads = []
+        httpretty.register_uri(
+            httpretty.POST,
+            'https://document/service/file/{}/content/upload/'.format(file_uuid),
+            body=lambda request, uri, headers: (
+                uploads.append(request.body) or (200, dict(headers, ETag='"etag"'), ''))
+        )
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/{}/metadata/'.format(file_uuid),
+            body=json.dumps({'compression': 'gzip'}), content_type='application/json'
+        )
+        local_file = tmpdir.join('data.csv')
+        local_file.write_binary(b'a,b\n' * 1000)
+
+        # when
+        self.client.upload_file(str(local_file), '/dest/parent/data.csv', 'text/csv',
+                                compression='gzip')
+
+        # then
+        compressed = b''.join(dechunk(uploads[0]))
+        assert_that(gzip_decompress(compressed), equal_to(b'a,b\n' * 1000))
+        assert_that(len(compressed), less_than(4000))
+        assert_that(json.loads(httpretty.last_request().body.decode()),
+                    equal_to({'compression': 'gzip'}))
+
+    @mock.patch('hbp_service_client.storage_service.throttling.time.sleep')
+    def test_upload_file_should_limit_the_bandwidth(self, mock_sleep, tmpdir):
+        # given
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fdest%2Fparent',
+            returns={'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'}
+        )
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a1256'
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/',
+            status=201, body=json.dumps({'uuid': file_uuid}), content_type='application/json'
+        )
+        uploads = []
+        httpretty.register_uri(
+            httpretty.POST,
+            'https://document/service/file/{}/content/upload/'.format(file_uuid),
+            body=lambda request, uri, headers: (
+                uploads.append(request.body) or (200, dict(headers, ETag='"etag"'), ''))
+        )
+        local_file = tmpdir.join('data.bin')
+        local_file.write_binary(b'#' * 4 * 64 * 1024)
+        self.client.bandwidth_limiter = BandwidthLimiter(rate=64 * 1024)
+
+        # when
+        self.client.upload_file(str(local_file), '/dest/parent/data.bin', None)
+
+        # then
+        assert_that(b''.join(dechunk(uploads[0])), equal_to(b'#' * 4 * 64 * 1024))
+        assert_that(mock_sleep.call_count, equal_to(3))
+
+    def test_upload_file_should_verify_the_checksum_of_the_content(self, tmpdir):
+        # given
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fdest%2Fparent',
+            returns={'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'}
+        )
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a1256'
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/',
+            status=201, body=json.dumps({'uuid': file_uuid}), content_type='application/json'
+        )
+        etag = '"{0}"'.format(hashlib.md5(b'some content').hexdigest())
+        httpretty.register_uri(
+            httpretty.POST,
+            'https://document/service/file/{}/content/upload/'.format(file_uuid),
+            adding_headers={'ETag': etag}
+        )
+        local_file = tmpdir.join('data.txt')
+        local_file.write_binary(b'some content')
+
+        # when
+        new_file = self.client.upload_file(str(local_file), '/dest/parent/data.txt',
+                                           'text/plain', verify_checksum=True)
+
+        # then
+        assert_that(new_file['etag'], equal_to(etag))
+
+    #
+    # upload_files
+    #
+
+    def register_upload_service(self):
+        '''Fakes the creation, upload and copy of files, returning the sent requests'''
+        self.register_uri(
+            'https://document/service/entity/?path=%2Fdest%2Fparent',
+            returns={'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a9a56'}
+        )
+        sent = {'created': [], 'uploaded': [], 'copied': []}
+
+        def create(request, uri, headers):
+            sent['created'].append(json.loads(request.body.decode())['name'])
+            return (201, headers, json.dumps({'uuid': str(uuid.uuid4())}))
+
+        def upload(request, uri, headers):
+            sent['uploaded'].append(request.path.split('/')[-4])
+            return (201, dict(headers, ETag='"etag"'), '')
+
+        def copy(request, uri, headers):
+            sent['copied'].append((request.path.split('/')[-3], request.headers['X-Copy-From']))
+            return (200, headers, '')
+
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/', body=create,
+            content_type='application/json')
+        httpretty.register_uri(
+            httpretty.POST, re.compile(r'https://document/service/file/[^/]+/content/upload/$'),
+            body=upload)
+        httpretty.register_uri(
+            httpretty.PUT, re.compile(r'https://document/service/file/[^/]+/content/$'),
+            body=copy)
+        return sent
+
+    def test_upload_files_should_reject_duplicate_destinations(self):
+        assert_that(
+            calling(self.client.upload_files).with_args(
+                [('a', '/dest/parent/file', None), ('b', '/dest/parent/file', None)]),
+            raises(StorageArgumentException))
+
+    def test_upload_files_should_upload_identical_contents_once(self, tmpdir):
+        # given
+        sent = self.register_upload_service()
+        for name, content in [('a', b'same'), ('b', b'other'), ('c', b'same')]:
+            tmpdir.join(name).write_binary(content)
+
+        # when
+        created = self.client.upload_files(
+            [(str(tmpdir.join(name)), '/dest/parent/' + name, 'text/plain')
+             for name in ['a', 'b', 'c']],
+            workers=1)
+
+        # then
+        assert_that(list(created), equal_to(['/dest/parent/a', '/dest/parent/b',
+                                             '/dest/parent/c']))
+        assert_that(sorted(sent['created']), equal_to(['a', 'b', 'c']))
+        assert_that(sent['uploaded'], equal_to(
+            [created['/dest/parent/a']['uuid'], created['/dest/parent/b']['uuid']]))
+        assert_that(sent['copied'], equal_to(
+            [(created['/dest/parent/c']['uuid'], created['/dest/parent/a']['uuid'])]))
+        assert_that(created['/dest/parent/c']['etag'],
+                    equal_to('"{0}"'.format(hashlib.md5(b'same').hexdigest())))
+
+    def test_upload_files_should_copy_the_contents_found_in_the_index(self, tmpdir):
+        # given
+        sent = self.register_upload_service()
+        tmpdir.join('a').write_binary(b'same')
+        existing_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a0000'
+        content_index = mock.Mock(project_path='/dest')
+        content_index.find.return_value = existing_uuid
+
+        # when
+        created = self.client.upload_files(
+            [(str(tmpdir.join('a')), '/dest/parent/a', None)], content_index, workers=1)
+
+        # then
+        content_index.find.assert_called_once_with(hashlib.md5(b'same').hexdigest())
+        assert_that(sent['uploaded'], equal_to([]))
+        assert_that(sent['copied'], equal_to(
+            [(created['/dest/parent/a']['uuid'], existing_uuid)]))
+        content_index.add.assert_called_once_with(
+            created['/dest/parent/a']['uuid'], '/dest/parent/a',
+            created['/dest/parent/a']['etag'])
+
+    @mock.patch('hbp_service_client.storage_service.throttling.time.sleep')
+    def test_upload_files_should_limit_the_bandwidth(self, mock_sleep, tmpdir):
+        # given
+        sent = self.register_upload_service()
+        tmpdir.join('a').write_binary(b'#' * 4 * 64 * 1024)
+        self.client.bandwidth_limiter = BandwidthLimiter(rate=64 * 1024)
+
+        # when
+        created = self.client.upload_files(
+            [(str(tmpdir.join('a')), '/dest/parent/a', None)], workers=1)
+
+        # then
+        assert_that(sent['uploaded'], equal_to([created['/dest/parent/a']['uuid']]))
+        assert_that(mock_sleep.call_count, equal_to(3))
+
     #
     # delete
     #
@@ -677,7 +1194,363 @@ class TestClient(object):
                  'path':equal_to('/service{}'.format(endpoint))})
         )
 
+    #
+    # find
+    #
+
+    @pytest.mark.parametrize('path', __BAD_PATHS)
+    def test_find_validates_path(self, path):
+        assert_that(
+            calling(lambda p: list(self.client.find(p))).with_args(path),
+            raises(StorageArgumentException))
+
+    def test_find_should_return_all_the_entities_recursively(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        paths = list(self.client.find('/my_project'))
+
+        # then
+        assert_that(paths, equal_to([
+            '/my_project/data', '/my_project/readme.txt', '/my_project/data/a.nwb',
+            '/my_project/data/deep', '/my_project/data/notes.txt',
+            '/my_project/data/deep/c.nwb']))
+
+    def test_find_should_send_the_filters_to_the_service(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        paths = list(self.client.find('/my_project', content_type='text/plain'))
+
+        # then
+        assert_that(paths, equal_to(['/my_project/readme.txt', '/my_project/data/notes.txt']))
+        assert_that(
+            find_sent_request(lambda req: 'content_type' in req.querystring),
+            has_properties({'querystring': has_entry('content_type', ['text/plain'])}))
+
+    def test_find_should_match_name_patterns_on_the_client_side(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        paths = list(self.client.find('/my_project', name='*.nwb'))
+
+        # then
+        assert_that(paths, equal_to(['/my_project/data/a.nwb', '/my_project/data/deep/c.nwb']))
+        assert_that(
+            find_sent_request(lambda req: 'name' in req.querystring), equal_to(None))
+
+    #
+    # glob
+    #
+
+    @pytest.mark.parametrize('pattern', __BAD_PATHS + ['/*/data'])
+    def test_glob_validates_pattern(self, pattern):
+        assert_that(
+            calling(lambda p: list(self.client.glob(p))).with_args(pattern),
+            raises(StorageArgumentException))
+
+    def test_glob_should_match_nested_folders(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        paths = list(self.client.glob('/my_project/**/*.nwb'))
+
+        # then
+        assert_that(paths, equal_to(['/my_project/data/a.nwb', '/my_project/data/deep/c.nwb']))
+
+    def test_glob_should_resolve_the_plain_prefix_with_a_single_query(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        paths = list(self.client.glob('/my_project/data/*.txt'))
+
+        # then
+        assert_that(paths, equal_to(['/my_project/data/notes.txt']))
+        assert_that(
+            find_sent_request(lambda req: req.querystring.get('path') == ['/my_project']),
+            equal_to(None))
+
+    def test_glob_should_only_list_folders_when_no_match_is_possible(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # when
+        paths = list(self.client.glob('/my_project/*/deep'))
+
+        # then
+        assert_that(paths, equal_to(['/my_project/data/deep']))
+        assert_that(
+            find_sent_request(lambda req: req.path.startswith(
+                '/service/folder/{0}/children/'.format(PROJECT_UUID))),
+            has_properties({'querystring': has_entry('entity_type', ['folder'])}))
+
+    def test_glob_should_return_nothing_if_the_prefix_does_not_exist(self):
+        # given
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/entity/?path=%2Fmy_project%2Fnothing',
+            status=404
+        )
+
+        # then
+        assert_that(list(self.client.glob('/my_project/nothing/*')), equal_to([]))
+
+    #
+    # bulk_update_metadata
+    #
+
+    def test_bulk_update_metadata_should_merge_the_updates_of_an_entity(self):
+        # given
+        entity = {'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a1256', 'entity_type': 'file'}
+        sent_bodies = []
+
+        def update_callback(request, uri, headers):
+            sent_bodies.append(request.body)
+            return (200, headers, request.body)
+
+        httpretty.register_uri(
+            httpretty.PUT,
+            'https://document/service/file/{}/metadata/'.format(entity['uuid']),
+            body=update_callback,
+            content_type='application/json'
+        )
+
+        # when
+        results = self.client.bulk_update_metadata(
+            [(entity, {'foo': '1', 'bar': '2'}), (entity, {'foo': '3'})])
+
+        # then
+        assert_that(len(sent_bodies), equal_to(1))
+        assert_that(results, equal_to({entity['uuid']: {'foo': '3', 'bar': '2'}}))
+
+    def test_bulk_update_metadata_should_resolve_paths(self):
+        # given
+        file_uuid = 'e2c25c1b-1234-4cf6-b8d2-271e628a1256'
+        self.register_uri(
+            'https://document/service/entity/?path=%2Ffoo%2Fbar',
+            returns={'uuid': file_uuid, 'entity_type': 'file'}
+        )
+        httpretty.register_uri(
+            httpretty.PUT,
+            'https://document/service/file/{}/metadata/'.format(file_uuid),
+            body=json.dumps({'foo': '1'}),
+            content_type='application/json'
+        )
+
+        # when
+        results = self.client.bulk_update_metadata([('/foo/bar', {'foo': '1'})])
+
+        # then
+        assert_that(results, equal_to({'/foo/bar': {'foo': '1'}}))
+
+    def test_bulk_update_metadata_should_return_the_error_of_each_entity(self):
+        # given
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/entity/?path=%2Ffoo%2Fnothing',
+            status=404
+        )
+
+        # when
+        results = self.client.bulk_update_metadata([('/foo/nothing', {'foo': '1'})])
+
+        # then
+        assert_that(results['/foo/nothing'], instance_of(StorageNotFoundException))
+
+    def test_bulk_update_metadata_should_return_the_request_errors_of_each_entity(self):
+        # given
+        failing = {'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a1256', 'entity_type': 'file'}
+        entity = {'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a1257', 'entity_type': 'file'}
+
+        def update_metadata(entity_type, entity_id, metadata):
+            if entity_id == failing['uuid']:
+                raise requests.TooManyRedirects('Exceeded 30 redirects.')
+            return metadata
+
+        # when
+        with mock.patch.object(self.client.api_client, 'update_metadata', update_metadata):
+            results = self.client.bulk_update_metadata(
+                [(failing, {'foo': '1'}), (entity, {'foo': '2'})])
+
+        # then
+        assert_that(results[failing['uuid']], instance_of(requests.TooManyRedirects))
+        assert_that(results[entity['uuid']], equal_to({'foo': '2'}))
+
+    @mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+    def test_bulk_update_metadata_should_retry_on_server_errors(self, mock_sleep):
+        # given
+        entity = {'uuid': 'e2c25c1b-1234-4cf6-b8d2-271e628a1256', 'entity_type': 'folder'}
+        httpretty.register_uri(
+            httpretty.PUT,
+            'https://document/service/folder/{}/metadata/'.format(entity['uuid']),
+            responses=[
+                httpretty.Response(body='', status=503),
+                httpretty.Response(body=json.dumps({'foo': '1'}),
+                                   content_type='application/json')]
+        )
+
+        # when
+        results = self.client.bulk_update_metadata([(entity, {'foo': '1'})])
+
+        # then
+        assert_that(results, equal_to({entity['uuid']: {'foo': '1'}}))
+        assert_that(mock_sleep.call_count, equal_to(1))
+
+    def test_bulk_update_metadata_validates_metadata(self):
+        assert_that(
+            calling(self.client.bulk_update_metadata).with_args([('/foo/bar', ['foo'])]),
+            raises(StorageArgumentException))
+
+    #
+    # copy
+    #
+
+    @pytest.mark.parametrize('path', __BAD_PATHS + ['/project'])
+    def test_copy_validates_destination_path(self, path):
+        assert_that(
+            calling(self.client.copy).with_args('/my_project/data', path),
+            raises(StorageArgumentException))
+
+    def test_copy_should_copy_file_content_on_the_server(self):
+        # given
+        register_tree(PROJECT_TREE)
+        created_uuid = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9aff'
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/',
+            body=json.dumps({'uuid': created_uuid, 'entity_type': 'file'}),
+            content_type='application/json'
+        )
+        httpretty.register_uri(
+            httpretty.PUT, 'https://document/service/file/{}/content/'.format(created_uuid)
+        )
+
+        # when
+        copy = self.client.copy('/my_project/readme.txt', '/my_project/data/readme.txt')
+
+        # then
+        assert_that(copy['uuid'], equal_to(created_uuid))
+        create_request = find_sent_request(lambda req: req.path == '/service/file/')
+        assert_that(json.loads(create_request.body.decode()), equal_to({
+            'name': 'readme.txt', 'content_type': 'text/plain',
+            'parent': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01'}))
+        assert_that(httpretty.last_request().headers['X-Copy-From'],
+                    equal_to('e2c25c1b-f6a9-4cf6-b8d2-271e628a9a02'))
+
+    def test_copy_should_not_copy_folders_unless_recursive(self):
+        # given
+        register_tree(PROJECT_TREE)
+
+        # then
+        assert_that(
+            calling(self.client.copy).with_args(
+                '/my_project/data', '/my_project/copy', recursive=False),
+            raises(StorageArgumentException))
+
+    def test_copy_should_recreate_the_folder_tree(self):
+        # given
+        register_tree(PROJECT_TREE)
+        created = []
+
+        def create_callback(request, uri, headers):
+            body = json.loads(request.body.decode())
+            entity = dict(body, uuid=str(uuid.uuid4()),
+                          entity_type=request.path.split('/')[-2])
+            created.append(entity)
+            return (201, headers, json.dumps(entity))
+
+        for endpoint in ['folder', 'file']:
+            httpretty.register_uri(
+                httpretty.POST, 'https://document/service/{}/'.format(endpoint),
+                body=create_callback, content_type='application/json')
+        httpretty.register_uri(
+            httpretty.PUT, re.compile(r'https://document/service/file/[^/]+/content/$'))
+
+        # when (httpretty does not support concurrent requests)
+        self.client.copy('/my_project/data', '/my_project/copy', workers=1)
+
+        # then
+        by_name = dict((entity['name'], entity) for entity in created)
+        assert_that(sorted(by_name),
+                    equal_to(['a.nwb', 'c.nwb', 'copy', 'deep', 'notes.txt']))
+        assert_that(by_name['deep']['parent'], equal_to(by_name['copy']['uuid']))
+        assert_that(by_name['c.nwb']['parent'], equal_to(by_name['deep']['uuid']))
+        assert_that(by_name['a.nwb']['parent'], equal_to(by_name['copy']['uuid']))
+
+def dechunk(body):
+    chunks = []
+    while body:
+        size, body = body.split(b'\r\n', 1)
+        if int(size, 16) == 0:
+            break
+        chunks.append(body[:int(size, 16)])
+        body = body[int(size, 16) + 2:]
+    return chunks
+
+
+def gzip_compress(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_decompress(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
 
 
 def find_sent_request(predicate):
     return next((x for x in httpretty.HTTPretty.latest_requests if predicate(x)), None)
+
+
+PROJECT_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a00'
+PROJECT_TREE = {
+    PROJECT_UUID: [
+        {'name': 'data', 'entity_type': 'folder',
+         'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01'},
+        {'name': 'readme.txt', 'entity_type': 'file', 'content_type': 'text/plain',
+         'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a02'}],
+    'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01': [
+        {'name': 'a.nwb', 'entity_type': 'file', 'content_type': 'application/x-nwb',
+         'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a03'},
+        {'name': 'deep', 'entity_type': 'folder',
+         'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a04'},
+        {'name': 'notes.txt', 'entity_type': 'file', 'content_type': 'text/plain',
+         'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a05'}],
+    'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a04': [
+        {'name': 'c.nwb', 'entity_type': 'file', 'content_type': 'application/x-nwb',
+         'uuid': 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a06'}]
+}
+
+
+def register_tree(tree, project='my_project'):
+    '''Fakes the entity and children endpoints for the given tree, applying the filters'''
+
+    paths = {'/{0}'.format(project): {'uuid': PROJECT_UUID, 'entity_type': 'project'}}
+    for parent_uuid in sorted(tree):
+        parent_path = next(path for path, entity in paths.items()
+                           if entity['uuid'] == parent_uuid)
+        for child in tree[parent_uuid]:
+            paths['{0}/{1}'.format(parent_path, child['name'])] = child
+
+    def entity_callback(request, uri, headers):
+        entity = paths.get(request.querystring['path'][0])
+        if entity is None:
+            return (404, headers, '')
+        return (200, headers, json.dumps(entity))
+
+    def children_callback(request, uri, headers):
+        children = tree.get(request.path.split('?')[0].split('/')[-3], [])
+        for key in ['name', 'entity_type', 'content_type']:
+            if key in request.querystring:
+                children = [child for child in children
+                            if child.get(key) == request.querystring[key][0]]
+        return (200, headers, json.dumps({'next': None, 'count': len(children),
+                                          'results': children}))
+
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'https://document/service/entity/$'),
+        body=entity_callback, content_type='application/json')
+    httpretty.register_uri(
+        httpretty.GET, re.compile(r'https://document/service/folder/[^/]+/children/$'),
+        body=children_callback, content_type='application/json')
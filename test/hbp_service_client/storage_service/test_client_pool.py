@@ -0,0 +1,79 @@
+'''Unit tests for hbp_service_client.storage_service.client_pool'''
+
+import json
+import httpretty
+from hamcrest import assert_that, equal_to, instance_of
+
+from hbp_service_client.storage_service.api import ApiClient
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.client_pool import ClientPool
+
+SERVICES_URL = 'https://collab.humanbrainproject.eu/services.json'
+
+
+class TestClientPool(object):
+
+    def setup_method(self):
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, SERVICES_URL,
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+        httpretty.register_uri(
+            httpretty.GET, 'https://document/service/entity/',
+            body=lambda request, uri, headers: (
+                200, dict(headers, **{'Set-Cookie': 'session=secret; Path=/'}),
+                json.dumps({'authorization': request.headers.get('Authorization'),
+                            'cookie': request.headers.get('Cookie')})),
+            content_type='application/json')
+        self.pool = ClientPool()
+
+    def teardown_method(self):
+        self.pool.close()
+        httpretty.disable()
+        httpretty.reset()
+
+    @staticmethod
+    def locator_calls():
+        return len([request for request in httpretty.latest_requests()
+                    if request.path.endswith('services.json')])
+
+    def test_clients_should_share_the_service_lookup(self):
+        # when
+        clients = [self.pool.client('token_{0}'.format(index)) for index in range(3)]
+
+        # then
+        assert_that(clients[0], instance_of(Client))
+        assert_that(self.locator_calls(), equal_to(1))
+
+    def test_clients_should_send_their_own_token(self):
+        # given
+        api_clients = [self.pool.api_client('token_a'), self.pool.api_client('token_b')]
+
+        # when
+        echoes = [client.get_entity_by_query(path='/my_project') for client in api_clients]
+
+        # then
+        assert_that(api_clients[0], instance_of(ApiClient))
+        assert_that([echo['authorization'] for echo in echoes],
+                    equal_to(['Bearer token_a', 'Bearer token_b']))
+
+    def test_clients_should_not_share_the_cookies(self):
+        # when
+        self.pool.api_client('token_a').get_entity_by_query(path='/my_project')
+        echo = self.pool.api_client('token_b').get_entity_by_query(path='/my_project')
+
+        # then
+        assert_that(echo['cookie'], equal_to(None))
+
+    def test_invalidate_should_look_the_service_up_again(self):
+        # given
+        self.pool.client('token')
+
+        # when
+        self.pool.invalidate()
+        self.pool.client('token')
+
+        # then
+        assert_that(self.locator_calls(), equal_to(2))
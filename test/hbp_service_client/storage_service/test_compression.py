@@ -0,0 +1,53 @@
+'''Unit tests for hbp_service_client.storage_service.compression'''
+
+import pytest
+from hamcrest import assert_that, calling, raises, equal_to, less_than
+
+from hbp_service_client.storage_service import compression
+from hbp_service_client.storage_service.compression import (
+    compress_chunks, decompress_chunks, validate_codec)
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+
+CONTENT = [b'{"id": %d, "species": "mouse"}\n' % i for i in range(1000)]
+
+
+class TestCompression(object):
+
+    def test_validate_codec_should_reject_unknown_codecs(self):
+        assert_that(calling(validate_codec).with_args('rar'),
+                    raises(StorageArgumentException))
+
+    def test_validate_codec_should_reject_zstd_without_zstandard(self, monkeypatch):
+        monkeypatch.setattr(compression, 'zstandard', None)
+        assert_that(calling(validate_codec).with_args('zstd'),
+                    raises(StorageArgumentException))
+
+    def test_gzip_should_roundtrip_the_chunks(self):
+        # when
+        compressed = list(compress_chunks(iter(CONTENT), 'gzip'))
+
+        # then
+        assert_that(len(b''.join(compressed)), less_than(len(b''.join(CONTENT))))
+        assert_that(b''.join(decompress_chunks(iter(compressed), 'gzip')),
+                    equal_to(b''.join(CONTENT)))
+
+    def test_gzip_should_decompress_chunks_split_anywhere(self):
+        # given
+        compressed = b''.join(compress_chunks(iter(CONTENT), 'gzip'))
+
+        # when
+        chunks = [compressed[i:i + 7] for i in range(0, len(compressed), 7)]
+
+        # then
+        assert_that(b''.join(decompress_chunks(iter(chunks), 'gzip')),
+                    equal_to(b''.join(CONTENT)))
+
+    def test_zstd_should_roundtrip_the_chunks(self):
+        pytest.importorskip('zstandard')
+
+        # when
+        compressed = list(compress_chunks(iter(CONTENT), 'zstd'))
+
+        # then
+        assert_that(b''.join(decompress_chunks(iter(compressed), 'zstd')),
+                    equal_to(b''.join(CONTENT)))
@@ -0,0 +1,81 @@
+'''Unit tests for hbp_service_client.storage_service.concurrency'''
+
+import threading
+import mock
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.request.deadline import Deadline, remaining_time
+from hbp_service_client.storage_service.concurrency import (
+    call_with_retries, imap_concurrently, map_concurrently)
+from hbp_service_client.storage_service.exceptions import (
+    StorageChecksumException, StorageException, StorageNotFoundException)
+
+
+def test_map_concurrently_keeps_the_order_of_the_items():
+    assert_that(map_concurrently(lambda x: x * 2, range(20), workers=4),
+                equal_to([x * 2 for x in range(20)]))
+
+
+def test_imap_concurrently_yields_the_results_as_they_complete():
+    released = threading.Event()
+
+    def wait_for_the_release(item):
+        if item == 0:
+            assert released.wait(5)
+        return item * 2
+
+    results = imap_concurrently(wait_for_the_release, range(2), workers=2)
+    first = next(results)
+    released.set()
+
+    assert_that([first] + list(results), equal_to([(1, 2), (0, 0)]))
+
+
+@mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+def test_call_with_retries_retries_transient_errors(mock_sleep):
+    function = mock.Mock(side_effect=[StorageException('500'), StorageException('503'), 'ok'])
+
+    assert_that(call_with_retries(function, retries=2, backoff=1), equal_to('ok'))
+    mock_sleep.assert_has_calls([mock.call(1), mock.call(2)])
+
+
+@mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+def test_call_with_retries_gives_up_after_the_last_retry(mock_sleep):
+    function = mock.Mock(side_effect=StorageException('500'))
+
+    assert_that(calling(call_with_retries).with_args(function, retries=2),
+                raises(StorageException))
+    assert_that(function.call_count, equal_to(3))
+
+
+@mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+def test_call_with_retries_retries_checksum_mismatches(_):
+    function = mock.Mock(side_effect=[StorageChecksumException('mismatch'), 'ok'])
+
+    assert_that(call_with_retries(function, retries=1), equal_to('ok'))
+
+
+def test_call_with_retries_does_not_retry_specific_errors():
+    function = mock.Mock(side_effect=StorageNotFoundException('404'))
+
+    assert_that(calling(call_with_retries).with_args(function),
+                raises(StorageNotFoundException))
+    assert_that(function.call_count, equal_to(1))
+
+
+def test_map_concurrently_propagates_the_deadline():
+    with Deadline(30):
+        remaining = map_concurrently(lambda _: remaining_time(), range(4), workers=4)
+
+    assert_that(all(0 < value <= 30 for value in remaining), equal_to(True))
+
+
+@mock.patch('hbp_service_client.storage_service.concurrency.time.sleep')
+def test_call_with_retries_does_not_retry_past_the_deadline(mock_sleep):
+    function = mock.Mock(side_effect=StorageException('500'))
+
+    with Deadline(1):
+        assert_that(calling(call_with_retries).with_args(function, retries=2, backoff=5),
+                    raises(StorageException))
+    assert_that(function.call_count, equal_to(1))
+    mock_sleep.assert_not_called()
@@ -0,0 +1,82 @@
+'''Unit tests for hbp_service_client.storage_service.content_index'''
+
+import json
+import re
+import httpretty
+from hamcrest import assert_that, equal_to
+
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.content_index import ContentIndex
+
+from .fake_tree import PROJECT, FOLDER, FILE_1, FILE_2, WORKERS, FakeTreeService
+
+MD5_1 = '71e1ed9ee52e565a56aec66bc648a32c'
+MD5_2 = '0e17eaaccb004336b9d7657026844281'
+
+
+class TestContentIndex(object):
+
+    def setup_method(self):
+        self.children = {PROJECT['uuid']: [FOLDER], FOLDER['uuid']: [FILE_1, FILE_2]}
+        self.etags = {FILE_1['uuid']: MD5_1, FILE_2['uuid']: MD5_2}
+        self.fetched = []
+        self.service = FakeTreeService({'/my_project': PROJECT}, self.children)
+        self.service.start()
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r'https://document/service/file/[^/]+/content/secure_link/$'),
+            body=lambda request, uri, headers: (200, headers, json.dumps({
+                'signed_url': '/signed/{0}'.format(request.path.split('/')[-4])})),
+            content_type='application/json')
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/signed/[^/]+$'),
+            body=self.signed_callback)
+        self.index = ContentIndex(Client.new('access_token'), '/my_project', workers=WORKERS)
+
+    def teardown_method(self):
+        self.index.close()
+        self.service.stop()
+
+    def signed_callback(self, request, uri, headers):
+        file_uuid = request.path.split('/')[-1]
+        self.fetched.append(file_uuid)
+        headers['ETag'] = '"{0}"'.format(self.etags[file_uuid])
+        return (206, headers, 'x')
+
+    def test_build_should_index_the_etags_of_the_files(self):
+        # when
+        fetched = self.index.build()
+
+        # then
+        assert_that(fetched, equal_to(2))
+        assert_that(self.index.find(MD5_2), equal_to(FILE_2['uuid']))
+
+    def test_build_should_only_fetch_the_modified_files(self):
+        # given
+        self.index.build()
+        self.children[FOLDER['uuid']] = [
+            FILE_1, dict(FILE_2, modified_on='2018-01-01T00:00:00Z')]
+        del self.fetched[:]
+
+        # when
+        fetched = self.index.build()
+
+        # then
+        assert_that(fetched, equal_to(1))
+        assert_that(self.fetched, equal_to([FILE_2['uuid']]))
+
+    def test_find_should_drop_the_files_whose_content_changed(self):
+        # given
+        self.index.build()
+        self.etags[FILE_1['uuid']] = MD5_2
+
+        # then
+        assert_that(self.index.find(MD5_1), equal_to(None))
+        assert_that(self.index.find(MD5_2), equal_to(FILE_2['uuid']))
+
+    def test_add_should_index_the_written_files(self):
+        # when
+        self.index.add(FILE_1['uuid'], '/my_project/data/a.nwb', '"{0}"'.format(MD5_1))
+
+        # then
+        assert_that(self.index.find(MD5_1), equal_to(FILE_1['uuid']))
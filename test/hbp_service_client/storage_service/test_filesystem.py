@@ -0,0 +1,149 @@
+'''Unit tests for hbp_service_client.storage_service.filesystem'''
+
+import json
+import re
+import pytest
+import httpretty
+from hamcrest import assert_that, calling, raises, equal_to, has_entries
+
+pytest.importorskip('fsspec')
+
+# pylint: disable=wrong-import-position
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.filesystem import StorageFileSystem
+
+from . import fake_tree
+from .fake_tree import PROJECT, WORKERS, FakeTreeService
+
+FILE_1 = dict(fake_tree.FILE_1, name='a.csv', parent=PROJECT['uuid'], content_type='text/csv')
+FILE_2 = dict(fake_tree.FILE_2, name='b.csv', parent=PROJECT['uuid'], content_type='text/csv')
+CONTENTS = {FILE_1['uuid']: b'0123456789', FILE_2['uuid']: b'abcdef'}
+
+
+class TestStorageFileSystem(object):
+
+    def setup_method(self):
+        self.service = FakeTreeService(
+            {'/my_project': PROJECT, '/my_project/a.csv': FILE_1, '/my_project/b.csv': FILE_2},
+            {PROJECT['uuid']: [FILE_1, FILE_2]})
+        self.service.start()
+        self.register_content()
+        self.fs = StorageFileSystem(Client.new('access_token'), workers=WORKERS,
+                                    skip_instance_cache=True)
+
+    def teardown_method(self):
+        self.service.stop()
+
+    @staticmethod
+    def register_content():
+        def content_callback(request, uri, headers):
+            content = CONTENTS[request.path.split('/')[-1]]
+            if 'Range' not in request.headers:
+                return (200, headers, content)
+            start, end = re.match(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()
+            headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, end, len(content))
+            return (206, headers, content[int(start):int(end) + 1])
+
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/file/[^/]+/content/secure_link/$'),
+            body=lambda request, uri, headers: (200, headers, json.dumps(
+                {'signed_url': '/signed/{}'.format(request.path.split('/')[-4])})),
+            content_type='application/json')
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/signed/[^/]+$'),
+            body=content_callback)
+
+    @staticmethod
+    def count_requests(path):
+        return len([req for req in httpretty.HTTPretty.latest_requests
+                    if req.path.split('?')[0] == path])
+
+    def test_ls_should_list_the_folder_once(self):
+        # when
+        self.fs.ls('/my_project')
+        names = self.fs.ls('hbpstorage:///my_project', detail=False)
+
+        # then
+        assert_that(names, equal_to(['/my_project/a.csv', '/my_project/b.csv']))
+        assert_that(
+            self.count_requests('/service/folder/{}/children/'.format(PROJECT['uuid'])),
+            equal_to(1))
+
+    def test_info_should_get_the_size_of_files(self):
+        assert_that(
+            self.fs.info('/my_project/a.csv'),
+            has_entries({'name': '/my_project/a.csv', 'type': 'file', 'size': 10,
+                         'uuid': FILE_1['uuid']}))
+
+    def test_info_should_raise_file_not_found(self):
+        assert_that(calling(self.fs.info).with_args('/my_project/nothing'),
+                    raises(FileNotFoundError))
+
+    def test_open_should_read_byte_ranges(self):
+        # when
+        with self.fs.open('/my_project/a.csv', 'rb', block_size=4, cache_type='none') as data:
+            data.seek(3)
+            content = data.read(4)
+
+        # then
+        assert_that(content, equal_to(b'3456'))
+        assert_that(httpretty.last_request().headers['Range'], equal_to('bytes=3-6'))
+
+    def test_cat_should_fetch_several_files(self):
+        assert_that(
+            self.fs.cat(['/my_project/a.csv', '/my_project/b.csv']),
+            equal_to({'/my_project/a.csv': b'0123456789', '/my_project/b.csv': b'abcdef'}))
+
+    def test_get_should_download_the_files_of_a_folder(self, tmpdir):
+        # when
+        self.fs.get('/my_project', str(tmpdir.join('copy')), recursive=True)
+
+        # then
+        assert_that(tmpdir.join('copy', 'a.csv').read_binary(), equal_to(b'0123456789'))
+        assert_that(tmpdir.join('copy', 'b.csv').read_binary(), equal_to(b'abcdef'))
+
+    def test_open_should_stream_the_written_content(self):
+        # given
+        created_uuid = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9aff'
+        httpretty.register_uri(
+            httpretty.POST, 'https://document/service/file/',
+            body=json.dumps({'uuid': created_uuid, 'entity_type': 'file'}),
+            content_type='application/json')
+        uploads = []
+
+        def upload_callback(request, uri, headers):
+            uploads.append(request.body)
+            headers['ETag'] = '"etag"'
+            return (201, headers, '')
+
+        httpretty.register_uri(
+            httpretty.POST,
+            'https://document/service/file/{}/content/upload/'.format(created_uuid),
+            body=upload_callback)
+
+        # when
+        with self.fs.open('/my_project/new.csv', 'wb', block_size=5) as output:
+            output.write(b'first,')
+            output.write(b'second')
+
+        # then
+        create_request = find_sent_request(lambda req: req.path == '/service/file/')
+        assert_that(json.loads(create_request.body.decode()), has_entries(
+            {'name': 'new.csv', 'content_type': 'text/csv', 'parent': PROJECT['uuid']}))
+        # the content was sent with a chunked transfer encoding, block by block
+        assert_that([dechunk(body) for body in uploads], equal_to([[b'first,', b'second']]))
+
+
+def dechunk(body):
+    chunks = []
+    while body:
+        size, body = body.split(b'\r\n', 1)
+        if int(size, 16) == 0:
+            break
+        chunks.append(body[:int(size, 16)])
+        body = body[int(size, 16) + 2:]
+    return chunks
+
+
+def find_sent_request(predicate):
+    return next((x for x in httpretty.HTTPretty.latest_requests if predicate(x)), None)
@@ -0,0 +1,121 @@
+'''Unit tests for hbp_service_client.storage_service.metadata_index'''
+
+import json
+import re
+import httpretty
+from hamcrest import assert_that, calling, raises, equal_to
+
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+from hbp_service_client.storage_service.metadata_index import MetadataIndex
+
+from .fake_tree import PROJECT, FOLDER, FILE_1, FILE_2, WORKERS, FakeTreeService
+
+
+class TestMetadataIndex(object):
+
+    def setup_method(self):
+        self.children = {PROJECT['uuid']: [FOLDER], FOLDER['uuid']: [FILE_1, FILE_2]}
+        self.metadata = {
+            PROJECT['uuid']: {},
+            FOLDER['uuid']: {'species': 'mouse'},
+            FILE_1['uuid']: {'species': 'mouse', 'age': '12', 'region': 'hippocampus'},
+            FILE_2['uuid']: {'species': 'rat', 'age': '30', 'region': 'hippocampus CA1'}}
+        self.service = FakeTreeService({'/my_project': PROJECT}, self.children)
+        self.service.start()
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/\w+/[^/]+/metadata/$'),
+            body=lambda request, uri, headers: (200, headers, json.dumps(
+                self.metadata[request.path.split('/')[-3]])),
+            content_type='application/json')
+        self.index = MetadataIndex(Client.new('access_token'), '/my_project', workers=WORKERS)
+
+    def teardown_method(self):
+        self.index.close()
+        self.service.stop()
+
+    @staticmethod
+    def metadata_requests():
+        return [req for req in httpretty.HTTPretty.latest_requests
+                if req.path.endswith('/metadata/')]
+
+    def test_build_should_fetch_the_metadata_of_all_the_entities(self):
+        assert_that(self.index.build(), equal_to(4))
+        assert_that(len(self.metadata_requests()), equal_to(4))
+
+    def test_query_should_match_all_the_metadata_conditions(self):
+        # given
+        self.index.build()
+
+        # when
+        entities = self.index.query(metadata={'species': 'mouse', 'region': 'hippocampus'})
+
+        # then
+        assert_that([entity['path'] for entity in entities],
+                    equal_to(['/my_project/data/a.nwb']))
+
+    def test_query_should_compare_numeric_ranges_as_numbers(self):
+        # given
+        self.index.build()
+
+        # when
+        entities = self.index.query(ranges={'age': (5, 20)})
+
+        # then
+        assert_that([entity['uuid'] for entity in entities], equal_to([FILE_1['uuid']]))
+
+    def test_query_should_support_open_ranges_and_prefixes(self):
+        # given
+        self.index.build()
+
+        # when
+        entities = self.index.query(ranges={'age': (20, None)},
+                                    prefixes={'region': 'hippocampus'})
+
+        # then
+        assert_that([entity['uuid'] for entity in entities], equal_to([FILE_2['uuid']]))
+
+    def test_query_should_match_the_prefixes_followed_by_astral_characters(self):
+        # given
+        self.metadata[FILE_1['uuid']]['region'] = u'hippocampus\U0001F42D'
+        self.index.build()
+
+        # when
+        entities = self.index.query(prefixes={'region': u'hippocampus'})
+
+        # then
+        assert_that([entity['uuid'] for entity in entities],
+                    equal_to([FILE_1['uuid'], FILE_2['uuid']]))
+
+    def test_query_needs_a_condition(self):
+        assert_that(calling(self.index.query), raises(StorageArgumentException))
+
+    def test_refresh_should_only_fetch_modified_entities(self):
+        # given
+        self.index.build()
+        httpretty.HTTPretty.latest_requests[:] = []
+        modified = dict(FILE_2, modified_on='2017-04-10T12:50:06Z')
+        self.children[FOLDER['uuid']] = [modified]
+        self.metadata[FILE_2['uuid']] = {'species': 'mouse'}
+
+        # when
+        fetched = self.index.refresh()
+
+        # then
+        assert_that(fetched, equal_to(1))
+        assert_that([entity['uuid'] for entity in self.index.query(metadata={'species': 'mouse'})],
+                    equal_to([FOLDER['uuid'], FILE_2['uuid']]))
+
+    def test_refresh_should_update_the_paths_under_a_renamed_folder(self):
+        # given
+        self.index.build()
+        self.children[PROJECT['uuid']] = [
+            dict(FOLDER, name='renamed', modified_on='2017-04-10T12:50:06Z')]
+
+        # when
+        fetched = self.index.refresh()
+
+        # then
+        assert_that(fetched, equal_to(3))
+        assert_that([entity['path'] for entity in self.index.query(metadata={'species': 'mouse'})],
+                    equal_to(['/my_project/renamed', '/my_project/renamed/a.nwb']))
@@ -0,0 +1,159 @@
+'''Unit tests for hbp_service_client.storage_service.remote_file'''
+
+import array
+import io
+import json
+import re
+import sys
+import httpretty
+import pytest
+from hamcrest import assert_that, equal_to
+
+from hbp_service_client.storage_service.api import ApiClient
+from hbp_service_client.storage_service.remote_file import RangeReader, RemoteFile, byte_view
+
+FILE_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a01'
+CONTENT = bytes(bytearray(range(256))) * 4
+
+
+@pytest.mark.skipif(sys.version_info < (3, 3), reason='the views cannot be cast')
+def test_byte_view_should_view_the_bytes_of_the_items():
+    view = byte_view(array.array('i', [0, 0]))
+    assert_that((view.format, len(view)), equal_to(('B', 2 * array.array('i').itemsize)))
+
+
+def test_byte_view_should_view_a_bytearray():
+    buffer = bytearray(4)
+    byte_view(buffer)[1:3] = b'ab'
+    assert_that(bytes(buffer), equal_to(b'\x00ab\x00'))
+
+
+class TestRemoteFile(object):
+
+    def setup_method(self):
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, 'https://collab.humanbrainproject.eu/services.json',
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+        self.ranges = []
+        self.content = CONTENT
+        self.served = None
+        self.signed_urls = 0
+        self.expired = set()
+        httpretty.register_uri(
+            httpretty.GET,
+            'https://document/service/file/{}/content/secure_link/'.format(FILE_UUID),
+            body=self.signed_url_callback, content_type='application/json')
+        httpretty.register_uri(
+            httpretty.GET, re.compile(r'https://document/service/signed/\d+$'),
+            body=self.content_callback)
+        self.api_client = ApiClient.new('access_token')
+
+    @staticmethod
+    def teardown_method():
+        httpretty.disable()
+        httpretty.reset()
+
+    def signed_url_callback(self, request, uri, headers):
+        self.signed_urls += 1
+        return (200, headers, json.dumps({'signed_url': '/signed/{}'.format(self.signed_urls)}))
+
+    def content_callback(self, request, uri, headers):
+        if any(request.path.endswith(url) for url in self.expired):
+            return (403, headers, '')
+        start, end = [int(offset) for offset in re.match(
+            r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()]
+        self.ranges.append((start, end + 1))
+        if start >= len(self.content):
+            headers['Content-Range'] = 'bytes */{0}'.format(len(self.content))
+            return (416, headers, '')
+        end = min(end, len(self.content) - 1)
+        headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, end, len(self.content))
+        # the bytes after the served ones are missing from the response
+        return (206, headers, self.content[start:min(end + 1, self.served or end + 1)])
+
+    def test_read_should_only_fetch_the_needed_blocks(self):
+        # given
+        remote = RemoteFile(self.api_client, FILE_UUID, block_size=100)
+
+        # when
+        remote.seek(250)
+        data = remote.read(20)
+
+        # then
+        assert_that(data, equal_to(CONTENT[250:270]))
+        assert_that(self.ranges, equal_to([(200, 300)]))
+
+    def test_seek_from_the_end_uses_the_file_size(self):
+        # given
+        remote = RemoteFile(self.api_client, FILE_UUID, block_size=100)
+
+        # when
+        remote.seek(-10, io.SEEK_END)
+
+        # then
+        assert_that(remote.tell(), equal_to(len(CONTENT) - 10))
+        assert_that(remote.read(), equal_to(CONTENT[-10:]))
+
+    def test_sequential_reads_should_fetch_ahead(self):
+        # given
+        remote = RemoteFile(self.api_client, FILE_UUID, block_size=100, read_ahead=4)
+
+        # when
+        data = b''.join(iter(lambda: remote.read(100), b''))
+
+        # then
+        assert_that(data, equal_to(CONTENT))
+        assert_that(self.ranges, equal_to([(0, 100), (100, 300), (300, 700), (700, 1024)]))
+
+    def test_read_should_reuse_cached_blocks(self):
+        # given
+        remote = RemoteFile(self.api_client, FILE_UUID, block_size=100)
+        remote.read(10)
+
+        # when
+        remote.seek(50)
+        remote.read(10)
+
+        # then
+        assert_that(len(self.ranges), equal_to(1))
+        assert_that(self.signed_urls, equal_to(1))
+
+    def test_read_should_refresh_expired_signed_urls(self):
+        # given
+        remote = RemoteFile(self.api_client, FILE_UUID, block_size=100)
+        remote.read(10)
+        self.expired.add('/signed/1')
+
+        # when
+        remote.seek(500)
+        data = remote.read(10)
+
+        # then
+        assert_that(data, equal_to(CONTENT[500:510]))
+        assert_that(self.signed_urls, equal_to(2))
+
+    def test_read_should_return_the_empty_content(self):
+        # given
+        self.content = b''
+        remote = RemoteFile(self.api_client, FILE_UUID)
+
+        # when
+        data = remote.read()
+
+        # then
+        assert_that((data, remote.size), equal_to((b'', 0)))
+        assert_that(RangeReader(self.api_client, FILE_UUID).size, equal_to(0))
+
+    def test_read_should_stop_at_the_end_of_a_truncated_content(self):
+        # given
+        self.served = 150
+        remote = RemoteFile(self.api_client, FILE_UUID, block_size=100)
+
+        # when
+        data = remote.read()
+
+        # then
+        assert_that(data, equal_to(CONTENT[:150]))
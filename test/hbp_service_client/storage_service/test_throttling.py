@@ -0,0 +1,111 @@
+'''Unit tests for hbp_service_client.storage_service.throttling'''
+
+import mock
+import pytest
+from hamcrest import assert_that, calling, raises, equal_to, close_to
+
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+from hbp_service_client.storage_service.throttling import BandwidthLimiter, QUANTUM
+
+
+class FakeClock(object):
+    '''A clock advanced by the sleeps'''
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with mock.patch('hbp_service_client.storage_service.throttling.time', fake):
+        yield fake
+
+
+class TestBandwidthLimiter(object):
+
+    def test_transfer_should_not_wait_without_limits(self, clock):
+        # given
+        acquire = BandwidthLimiter().transfer()
+
+        # when
+        acquire(100 * QUANTUM)
+
+        # then
+        assert_that(clock.sleeps, equal_to([]))
+
+    def test_transfer_should_wait_for_the_global_rate(self, clock):
+        # given
+        acquire = BandwidthLimiter(rate=QUANTUM).transfer()
+
+        # when
+        acquire(4 * QUANTUM)
+
+        # then
+        assert_that(sum(clock.sleeps), close_to(3, 1e-6))
+
+    def test_transfer_should_wait_for_the_per_transfer_rate(self, clock):
+        # given
+        limiter = BandwidthLimiter(rate=10 * QUANTUM, per_transfer_rate=QUANTUM)
+
+        # when
+        limiter.transfer()(3 * QUANTUM)
+
+        # then
+        assert_that(sum(clock.sleeps), close_to(2, 1e-6))
+
+    def test_rate_should_be_adjustable_during_a_transfer(self, clock):
+        # given
+        limiter = BandwidthLimiter(rate=QUANTUM)
+        acquire = limiter.transfer()
+        acquire(2 * QUANTUM)
+
+        # when
+        limiter.rate = 4 * QUANTUM
+        acquire(4 * QUANTUM)
+
+        # then
+        assert_that(clock.sleeps[:1], equal_to([1.0]))
+        assert_that(sum(clock.sleeps[1:]), close_to(0.75, 1e-6))
+
+    def test_concurrent_transfers_should_take_the_bandwidth_in_turn(self, clock):
+        # given
+        limiter = BandwidthLimiter(rate=QUANTUM)
+        first, second = limiter.transfer(), limiter.transfer()
+        clock.sleep = clock.sleeps.append  # the transfers interleave while they wait
+
+        # when
+        first(QUANTUM)
+        second(QUANTUM)
+        first(QUANTUM)
+        second(QUANTUM)
+
+        # then
+        assert_that(clock.sleeps, equal_to([1.0, 2.0, 3.0]))
+
+    def test_throttle_should_produce_the_chunks_within_the_rate(self, clock):
+        # given
+        limiter = BandwidthLimiter(rate=QUANTUM)
+
+        # when
+        chunks = list(limiter.throttle([b'a' * QUANTUM] * 3))
+
+        # then
+        assert_that(chunks, equal_to([b'a' * QUANTUM] * 3))
+        assert_that(sum(clock.sleeps), close_to(2, 1e-6))
+
+    def test_the_rates_should_be_positive(self):
+        limiter = BandwidthLimiter(rate=QUANTUM)
+        assert_that(calling(setattr).with_args(limiter, 'rate', 0),
+                    raises(StorageArgumentException))
+        assert_that(limiter.rate, equal_to(QUANTUM))
+        assert_that(calling(BandwidthLimiter).with_args(per_transfer_rate=0),
+                    raises(StorageArgumentException))
@@ -0,0 +1,194 @@
+'''Unit tests for hbp_service_client.storage_service.zarr_store'''
+
+import json
+import re
+import uuid
+import pytest
+import httpretty
+from hamcrest import assert_that, calling, raises, equal_to, has_entries
+
+from hbp_service_client.storage_service.client import Client
+from hbp_service_client.storage_service.exceptions import StorageArgumentException
+from hbp_service_client.storage_service.zarr_store import ZarrStore
+
+ROOT_UUID = 'e2c25c1b-f6a9-4cf6-b8d2-271e628a9a00'
+
+
+class FakeService(object):
+    '''An in-memory tree of entities served through httpretty'''
+
+    def __init__(self):
+        self.entities = {ROOT_UUID: {'uuid': ROOT_UUID, 'name': 'images.zarr',
+                                     'entity_type': 'folder', 'parent': None}}
+        self.contents = {}
+        self.requests = []
+        routes = [
+            (httpretty.GET, r'entity/$', self.get_entity),
+            (httpretty.GET, r'folder/([^/]+)/children/$', self.get_children),
+            (httpretty.GET, r'file/([^/]+)/content/$', self.get_content),
+            (httpretty.POST, r'(folder|file)/$', self.create),
+            (httpretty.POST, r'file/([^/]+)/content/upload/$', self.upload),
+            (httpretty.DELETE, r'file/([^/]+)/$', self.delete),
+        ]
+        for method, pattern, callback in routes:
+            httpretty.register_uri(
+                method, re.compile('https://document/service/' + pattern),
+                body=self.recorded(callback), content_type='application/json')
+
+    def recorded(self, callback):
+        def record(request, uri, headers):
+            self.requests.append((request.method, request.path.split('?')[0]))
+            return callback(request, request.path.split('?')[0].split('/'), headers)
+        return record
+
+    def add(self, name, entity_type, parent, content=None):
+        entity_uuid = str(uuid.uuid4())
+        self.entities[entity_uuid] = {'uuid': entity_uuid, 'name': name,
+                                      'entity_type': entity_type, 'parent': parent}
+        if content is not None:
+            self.contents[entity_uuid] = content
+        return entity_uuid
+
+    def path(self, entity):
+        if entity['parent'] is None:
+            return '/my_project/images.zarr'
+        return '{0}/{1}'.format(self.path(self.entities[entity['parent']]), entity['name'])
+
+    def get_entity(self, request, parts, headers):
+        path = request.querystring['path'][0]
+        for entity in self.entities.values():
+            if self.path(entity) == path:
+                return (200, headers, json.dumps(entity))
+        return (404, headers, '')
+
+    def get_children(self, request, parts, headers):
+        children = sorted((entity for entity in self.entities.values()
+                           if entity['parent'] == parts[-3]), key=lambda e: e['name'])
+        return (200, headers, json.dumps({'next': None, 'results': children}))
+
+    def get_content(self, request, parts, headers):
+        headers['ETag'] = '"etag"'
+        return (200, headers, self.contents[parts[-3]])
+
+    def create(self, request, parts, headers):
+        body = json.loads(request.body.decode('utf-8'))
+        entity_uuid = self.add(body['name'], parts[-2], body['parent'])
+        return (201, headers, json.dumps(self.entities[entity_uuid]))
+
+    def upload(self, request, parts, headers):
+        self.contents[parts[-4]] = request.body
+        headers['ETag'] = '"etag"'
+        return (201, headers, '')
+
+    def delete(self, request, parts, headers):
+        del self.entities[parts[-2]]
+        self.contents.pop(parts[-2], None)
+        return (204, headers, '')
+
+    def content_of(self, path):
+        return next(self.contents.get(entity['uuid']) for entity in self.entities.values()
+                    if self.path(entity) == path)
+
+
+class TestZarrStore(object):
+
+    def setup_method(self):
+        httpretty.enable()
+        # Fakes the service locator call to the services.json file
+        httpretty.register_uri(
+            httpretty.GET, 'https://collab.humanbrainproject.eu/services.json',
+            body=json.dumps({'document': {'v1': 'https://document/service'}})
+        )
+        self.service = FakeService()
+        self.service.add('.zgroup', 'file', ROOT_UUID, b'{"zarr_format": 2}')
+        array_uuid = self.service.add('array', 'folder', ROOT_UUID)
+        self.service.add('.zarray', 'file', array_uuid, b'{}')
+        self.service.add('0.0', 'file', array_uuid, b'chunk 0.0')
+        self.service.add('0.1', 'file', array_uuid, b'chunk 0.1')
+        # httpretty is not thread-safe, the requests are sent sequentially
+        self.store = ZarrStore(Client.new('access_token'), '/my_project/images.zarr', workers=1)
+
+    @staticmethod
+    def teardown_method():
+        httpretty.disable()
+        httpretty.reset()
+
+    def test_keys_should_list_the_files_recursively(self):
+        assert_that(list(self.store),
+                    equal_to(['.zgroup', 'array/.zarray', 'array/0.0', 'array/0.1']))
+
+    def test_getitem_should_only_download_the_content_once_listed(self):
+        # given
+        list(self.store)
+        del self.service.requests[:]
+
+        # when
+        content = self.store['array/0.1']
+
+        # then
+        assert_that(content, equal_to(b'chunk 0.1'))
+        assert_that(len(self.service.requests), equal_to(1))
+
+    def test_getitem_should_raise_key_error_for_missing_keys(self):
+        assert_that(calling(self.store.__getitem__).with_args('array/9.9'), raises(KeyError))
+
+    @pytest.mark.parametrize('key', ['', '/', 'array//0.0'])
+    def test_getitem_should_reject_invalid_keys(self, key):
+        assert_that(calling(self.store.__getitem__).with_args(key),
+                    raises(StorageArgumentException))
+
+    def test_contains_should_not_download_the_content(self):
+        # when
+        found = 'array/0.0' in self.store
+
+        # then
+        assert_that(found, equal_to(True))
+        assert_that([path for _, path in self.service.requests if 'content' in path],
+                    equal_to([]))
+
+    def test_listdir_should_list_the_direct_children(self):
+        assert_that(self.store.listdir(), equal_to(['.zgroup', 'array']))
+        assert_that(self.store.listdir('array'), equal_to(['.zarray', '0.0', '0.1']))
+
+    def test_getitems_should_skip_the_missing_keys(self):
+        assert_that(self.store.getitems(['array/0.0', 'array/0.1', 'array/1.0']),
+                    equal_to({'array/0.0': b'chunk 0.0', 'array/0.1': b'chunk 0.1'}))
+
+    def test_setitems_should_create_the_missing_files_and_folders(self):
+        # when
+        self.store.setitems({'array/0.0': b'new 0.0', 'other/nested/.zarray': b'{}'})
+
+        # then
+        assert_that(self.service.content_of('/my_project/images.zarr/array/0.0'),
+                    equal_to(b'new 0.0'))
+        assert_that(self.service.content_of('/my_project/images.zarr/other/nested/.zarray'),
+                    equal_to(b'{}'))
+        assert_that(list(self.store), equal_to(
+            ['.zgroup', 'array/.zarray', 'array/0.0', 'array/0.1', 'other/nested/.zarray']))
+
+    def test_setitem_should_accept_buffers(self):
+        # when
+        self.store['array/1.0'] = bytearray(b'chunk 1.0')
+
+        # then
+        assert_that(self.store.getitems(['array/1.0']), has_entries({'array/1.0': b'chunk 1.0'}))
+
+    def test_delitems_should_delete_the_existing_keys(self):
+        # when
+        self.store.delitems(['array/0.0', 'array/9.9'])
+
+        # then
+        assert_that(list(self.store), equal_to(['.zgroup', 'array/.zarray', 'array/0.1']))
+        assert_that([method for method, _ in self.service.requests].count('DELETE'),
+                    equal_to(1))
+
+    def test_invalidate_should_list_the_folder_again(self):
+        # given
+        list(self.store)
+        self.service.add('0.2', 'file', ROOT_UUID, b'')
+
+        # when
+        self.store.invalidate()
+
+        # then
+        assert_that('0.2' in self.store, equal_to(True))